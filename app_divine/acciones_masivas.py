@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Now, Round
+
+from . import inventario
+from .models import MovimientoInventario
+from .signals import lote_productos
+
+TAMANO_LOTE = 500
+
+ACCIONES = [
+    ("precio_porcentaje", "Cambiar precio (%)"),
+    ("precio_sumar", "Sumar al precio ($)"),
+    ("stock_fijar", "Fijar stock"),
+    ("stock_sumar", "Sumar al stock"),
+    ("categoria", "Cambiar categoría"),
+    ("eliminar", "Eliminar"),
+]
+
+
+def decimal(valor):
+    return Value(Decimal(valor), output_field=DecimalField(max_digits=12, decimal_places=4))
+
+
+def tramos(consulta, tamano):
+    # Recorre por id en vez de OFFSET: cada tramo es un rango (desde, hasta]
+    # de la misma consulta, así el UPDATE lleva el filtro y no una lista de ids.
+    ultimo = 0
+    while True:
+        filas = list(
+            consulta.filter(id__gt=ultimo).order_by("id").values_list("id", "tipo")[:tamano]
+        )
+        if not filas:
+            return
+        yield consulta.filter(id__gt=ultimo, id__lte=filas[-1][0]), filas
+        ultimo = filas[-1][0]
+
+
+def cambios(accion, valor, categoria):
+    if accion == "precio_porcentaje":
+        factor = decimal((100 + Decimal(valor)) / 100)
+        return {"precio": Round(F("precio") * factor, 2)}
+    if accion == "precio_sumar":
+        return {"precio": Greatest(F("precio") + decimal(valor), decimal(0))}
+    return {"categoria": categoria}
+
+
+def ajustar_stock(tramo, accion, valor):
+    # El stock visible es `stock` más el libro de inventario, así que fijar o
+    # sumar se registra como ajustes (un solo INSERT por tramo) igual que al
+    # editar un producto; las filas se bloquean como en inventario.vender.
+    list(tramo.select_for_update().order_by("id").values_list("id", flat=True))
+    movimientos = []
+    for pk, actual in inventario.con_existencias(tramo).values_list("id", "existencias"):
+        deseado = valor if accion == "stock_fijar" else max(actual + valor, 0)
+        if deseado != actual:
+            movimientos.append(MovimientoInventario(producto_id=pk, cantidad=deseado - actual, motivo="ajuste"))
+    MovimientoInventario.objects.bulk_create(movimientos)
+    # Así /api/catalogo/cambios publica las nuevas existencias.
+    tramo.update(actualizado=Now())
+
+
+def aplicar(consulta, accion, valor=None, categoria=None, tamano_lote=TAMANO_LOTE):
+    # Cada tramo es su propia transacción; la versión del catálogo sube una
+    # sola vez al terminar (signals.lote_productos).
+    afectados = 0
+    with lote_productos() as lote:
+        for tramo, filas in tramos(consulta, tamano_lote):
+            with transaction.atomic():
+                if accion == "eliminar":
+                    lote.marcar_recomendadores([pk for pk, _ in filas])
+                    tramo.delete()
+                else:
+                    if accion in ("stock_fijar", "stock_sumar"):
+                        ajustar_stock(tramo, accion, int(valor))
+                    else:
+                        tramo.update(actualizado=Now(), **cambios(accion, valor, categoria))
+                    lote.marcar(filas)
+                lote.guardar()
+            afectados += len(filas)
+    return afectados
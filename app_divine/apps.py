@@ -4,4 +4,10 @@ from django.apps import AppConfig
 class AppDivineConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_divine'
-    verbose_name = "Aplicación DivineBeauty"
\ No newline at end of file
+    verbose_name = "Aplicación DivineBeauty"
+
+    def ready(self):
+        from . import consultas_lentas, metricas, signals  # noqa: F401
+
+        metricas.instalar()
+        consultas_lentas.instalar()
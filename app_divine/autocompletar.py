@@ -0,0 +1,160 @@
+import heapq
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+from django.db import connection
+from django.db.models import Sum
+
+from .cache_catalogo import version_catalogo
+from .models import LineaPedido, Producto
+
+PALABRA = re.compile(r"\w+")
+LONGITUD_PRECALCULADA = 2
+MAXIMO_RESULTADOS = 10
+MAXIMO_REVISADOS = 500
+
+_candado = threading.Lock()
+_indice = None
+_hilo = None
+
+
+def normalizar(texto):
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+
+
+class IndicePrefijos:
+    # Los productos se numeran por popularidad (0 = el más vendido), así cada
+    # lista de apariciones ya está ordenada y los mejores resultados son los
+    # números más bajos de la mezcla de listas.
+    def __init__(self, filas, version=None):
+        filas = sorted(filas, key=lambda fila: (-fila[4], fila[0]))
+        self.version = version
+        self.productos = [(pk, nombre, categoria, tipo) for pk, nombre, categoria, tipo, _ in filas]
+        palabras_por_producto = [
+            set(PALABRA.findall(normalizar(f"{nombre} {categoria}")))
+            for _, nombre, categoria, _, _ in filas
+        ]
+        self.terminos = sorted(set().union(*palabras_por_producto))
+        numero = {termino: posicion for posicion, termino in enumerate(self.terminos)}
+        self.apariciones = [array("I") for _ in self.terminos]
+        # Términos de cada producto en un solo arreglo plano: los del producto
+        # p están entre desplazamientos[p] y desplazamientos[p + 1].
+        self.terminos_producto = array("I")
+        self.desplazamientos = array("I", [0])
+        for posicion, palabras in enumerate(palabras_por_producto):
+            for palabra in palabras:
+                self.apariciones[numero[palabra]].append(posicion)
+                self.terminos_producto.append(numero[palabra])
+            self.desplazamientos.append(len(self.terminos_producto))
+        self.acumulado = array("I", [0])
+        for lista in self.apariciones:
+            self.acumulado.append(self.acumulado[-1] + len(lista))
+        # Con uno o dos caracteres el rango de términos es enorme; esas
+        # respuestas se calculan una sola vez al construir.
+        self.precalculadas = {}
+        for termino in self.terminos:
+            for longitud in range(1, LONGITUD_PRECALCULADA + 1):
+                prefijo = termino[:longitud]
+                if prefijo not in self.precalculadas:
+                    self.precalculadas[prefijo] = tuple(
+                        islice(self.posiciones(self.rango(prefijo)), MAXIMO_RESULTADOS)
+                    )
+
+    def rango(self, prefijo):
+        inicio = bisect_left(self.terminos, prefijo)
+        return inicio, bisect_left(self.terminos, prefijo + "\uffff", inicio)
+
+    def posiciones(self, rango):
+        anterior = None
+        for posicion in heapq.merge(*self.apariciones[rango[0]:rango[1]]):
+            if posicion != anterior:
+                anterior = posicion
+                yield posicion
+
+    def contiene(self, posicion, rango):
+        inicio, fin = rango
+        return any(
+            inicio <= termino < fin
+            for termino in self.terminos_producto[self.desplazamientos[posicion]:self.desplazamientos[posicion + 1]]
+        )
+
+    def buscar(self, consulta, limite=MAXIMO_RESULTADOS):
+        palabras = PALABRA.findall(normalizar(consulta))
+        if not palabras:
+            return []
+        if len(palabras) == 1 and len(palabras[0]) <= LONGITUD_PRECALCULADA and limite <= MAXIMO_RESULTADOS:
+            posiciones = self.precalculadas.get(palabras[0], ())[:limite]
+            return [self.productos[posicion] for posicion in posiciones]
+        rangos = [self.rango(palabra) for palabra in palabras]
+        if any(inicio == fin for inicio, fin in rangos):
+            return []
+        # Se recorre la palabra con menos apariciones y se filtra por las demás.
+        rangos.sort(key=lambda rango: self.acumulado[rango[1]] - self.acumulado[rango[0]])
+        principal, resto = rangos[0], rangos[1:]
+        posiciones = []
+        for posicion in islice(self.posiciones(principal), MAXIMO_REVISADOS):
+            if all(self.contiene(posicion, rango) for rango in resto):
+                posiciones.append(posicion)
+                if len(posiciones) == limite:
+                    break
+        return [self.productos[posicion] for posicion in posiciones]
+
+
+def leer_catalogo():
+    popularidad = dict(
+        LineaPedido.objects.filter(producto__isnull=False)
+        .values_list("producto")
+        .annotate(total=Sum("cantidad"))
+        .values_list("producto", "total")
+    )
+    return [
+        (pk, nombre, categoria, tipo, popularidad.get(pk, 0))
+        for pk, nombre, categoria, tipo in Producto.objects.values_list("id", "nombre", "categoria", "tipo")
+    ]
+
+
+def construir(version):
+    global _indice
+    indice = IndicePrefijos(leer_catalogo(), version)
+    with _candado:
+        if _indice is None or _indice.version != version:
+            _indice = indice
+    return indice
+
+
+def _reconstruir(version):
+    global _hilo
+    try:
+        construir(version)
+    finally:
+        connection.close()
+        with _candado:
+            _hilo = None
+
+
+def indice_actual():
+    # La primera solicitud del proceso construye el índice; después, si cambia
+    # la versión del catálogo, se sigue respondiendo con el índice anterior
+    # mientras un hilo arma el nuevo.
+    global _hilo
+    version = version_catalogo()
+    with _candado:
+        indice = _indice
+        if indice is not None and (indice.version == version or _hilo is not None):
+            return indice
+        if indice is not None:
+            _hilo = threading.Thread(target=_reconstruir, args=(version,), daemon=True)
+            _hilo.start()
+            return indice
+    return construir(version)
+
+
+def descartar():
+    global _indice
+    with _candado:
+        _indice = None
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CLAVE_VERSION = "catalogo:version"
+CLAVE_MODIFICADO = "catalogo:modificado"
+
+
+def version_catalogo():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def invalidar_catalogo():
+    # Mientras la réplica pueda ir atrasada, las lecturas del catálogo van al
+    # primario para no volver a cachear datos viejos bajo la versión nueva.
+    cache.set(CLAVE_MODIFICADO, 1, settings.REPLICA_VENTANA_PRIMARIA)
+    try:
+        return cache.incr(CLAVE_VERSION)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(CLAVE_VERSION, version, None)
+        return version
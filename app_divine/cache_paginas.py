@@ -0,0 +1,71 @@
+import hashlib
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from .cache_catalogo import version_catalogo
+
+
+def es_cacheable(request):
+    if request.method not in ("GET", "HEAD"):
+        return False
+    try:
+        coincidencia = resolve(request.path_info)
+    except Resolver404:
+        return False
+    if coincidencia.url_name not in settings.CACHE_PAGINAS_VISTAS:
+        return False
+    request.resolver_match = coincidencia
+    if "_profile=" in request.META.get("QUERY_STRING", ""):
+        return False
+    if "messages" in request.COOKIES:
+        return False
+    sesion = request.session
+    return "usuario_id" not in sesion and "_messages" not in sesion
+
+
+def claves(request):
+    ruta = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    return f"pagina:{version_catalogo()}:{ruta}", f"pagina:ultima:{ruta}"
+
+
+def debe_refrescar(entrada, ahora):
+    # Refresco anticipado probabilístico (XFetch): mientras más cara la página
+    # y más cerca su expiración, más probable que una solicitud la regenere antes.
+    azar = math.log(1.0 - random.random())
+    return ahora - entrada["costo"] * settings.CACHE_PAGINAS_BETA * azar >= entrada["expira"]
+
+
+def respuesta_desde(entrada, estado):
+    respuesta = HttpResponse(entrada["contenido"], content_type=entrada["tipo"])
+    respuesta["X-Cache"] = estado
+    return respuesta
+
+
+def es_guardable(request, respuesta):
+    return (
+        respuesta.status_code == 200
+        and not respuesta.streaming
+        and not respuesta.cookies
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        and "private" not in respuesta.get("Cache-Control", "")
+    )
+
+
+def guardar(clave, clave_ultima, respuesta, costo):
+    ahora = time.time()
+    entrada = {
+        "contenido": respuesta.content,
+        "tipo": respuesta["Content-Type"],
+        "costo": costo,
+        "expira": ahora + settings.CACHE_PAGINAS_TTL,
+    }
+    cache.set_many(
+        {clave: entrada, clave_ultima: entrada},
+        settings.CACHE_PAGINAS_TTL + settings.CACHE_PAGINAS_OBSOLETA,
+    )
@@ -0,0 +1,77 @@
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.db import connections
+from django.template import engines
+from django.urls import (
+    NoReverseMatch,
+    Resolver404,
+    URLPattern,
+    URLResolver,
+    get_resolver,
+    resolve,
+    reverse,
+)
+
+from . import autocompletar
+
+VALORES_EJEMPLO = {"IntConverter": 1, "UUIDConverter": "00000000-0000-0000-0000-000000000000"}
+
+
+def compilar_plantillas():
+    directorio = Path(apps.get_app_config("app_divine").path) / "templates"
+    motor = engines["django"]
+    total = 0
+    for archivo in sorted(directorio.rglob("*.html")):
+        motor.get_template(archivo.relative_to(directorio).as_posix())
+        total += 1
+    return total
+
+
+def recorrer_patrones(patrones, prefijo=""):
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            espacio = f"{prefijo}{patron.namespace}:" if patron.namespace else prefijo
+            yield from recorrer_patrones(patron.url_patterns, espacio)
+        elif isinstance(patron, URLPattern) and patron.name:
+            yield f"{prefijo}{patron.name}", patron
+
+
+def resolver_rutas():
+    total = 0
+    for nombre, patron in recorrer_patrones(get_resolver().url_patterns):
+        argumentos = {
+            clave: VALORES_EJEMPLO.get(type(conversor).__name__, "ejemplo")
+            for clave, conversor in patron.pattern.converters.items()
+        }
+        try:
+            resolve(reverse(nombre, kwargs=argumentos))
+        except (NoReverseMatch, Resolver404):
+            continue
+        total += 1
+    return total
+
+
+def abrir_conexiones():
+    for conexion in connections.all():
+        conexion.ensure_connection()
+    return len(connections.all())
+
+
+def construir_autocompletar():
+    return len(autocompletar.indice_actual().productos)
+
+
+def calentar():
+    resultados = {}
+    for etapa, funcion in (
+        ("plantillas", compilar_plantillas),
+        ("rutas", resolver_rutas),
+        ("conexiones", abrir_conexiones),
+        ("autocompletar", construir_autocompletar),
+    ):
+        inicio = time.perf_counter()
+        cantidad = funcion()
+        resultados[etapa] = (cantidad, time.perf_counter() - inicio)
+    return resultados
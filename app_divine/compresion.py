@@ -0,0 +1,146 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # opcional
+    zstandard = None
+
+_ACEPTADA = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$")
+_CONTROL_NO_TRANSFORMAR = re.compile(r"\bno-transform\b")
+BYTES_ALEATORIOS = 100
+
+
+def codificaciones_disponibles():
+    disponibles = []
+    if brotli is not None:
+        disponibles.append("br")
+    if zstandard is not None:
+        disponibles.append("zstd")
+    disponibles.append("gzip")
+    return disponibles
+
+
+def elegir_codificacion(aceptadas, disponibles):
+    calidades = {}
+    for parte in aceptadas.split(","):
+        coincidencia = _ACEPTADA.match(parte)
+        if coincidencia:
+            nombre, calidad = coincidencia.groups()
+            try:
+                calidades[nombre.lower()] = float(calidad) if calidad else 1.0
+            except ValueError:
+                continue
+    comodin = calidades.get("*", 0.0)
+    mejor, mejor_calidad = None, 0.0
+    for codificacion in disponibles:
+        calidad = calidades.get(codificacion, comodin)
+        if calidad > mejor_calidad:
+            mejor, mejor_calidad = codificacion, calidad
+    return mejor
+
+
+def es_comprimible(respuesta):
+    if respuesta.has_header("Content-Encoding") or respuesta.status_code == 206:
+        return False
+    if _CONTROL_NO_TRANSFORMAR.search(respuesta.get("Cache-Control", "")):
+        return False
+    tipo = respuesta.get("Content-Type", "").split(";")[0].strip().lower()
+    if tipo not in settings.COMPRESION_TIPOS:
+        return False
+    return respuesta.streaming or len(respuesta.content) >= settings.COMPRESION_TAMANO_MINIMO
+
+
+def comprimir(datos, codificacion, aleatorizar=False):
+    if codificacion == "br":
+        return brotli.compress(datos, quality=settings.COMPRESION_NIVEL_BROTLI)
+    if codificacion == "zstd":
+        return zstandard.ZstdCompressor(level=settings.COMPRESION_NIVEL_ZSTD).compress(datos)
+    return compress_string(datos, max_random_bytes=BYTES_ALEATORIOS if aleatorizar else None)
+
+
+def compresor(codificacion):
+    # Devuelve (comprimir_bloque, cerrar): cada bloque sale en cuanto llega para
+    # no retener la respuesta en streaming.
+    if codificacion == "br":
+        objeto = brotli.Compressor(quality=settings.COMPRESION_NIVEL_BROTLI)
+        return (lambda bloque: objeto.process(bloque) + objeto.flush()), objeto.finish
+    if codificacion == "zstd":
+        objeto = zstandard.ZstdCompressor(level=settings.COMPRESION_NIVEL_ZSTD).compressobj()
+        return (
+            lambda bloque: objeto.compress(bloque) + objeto.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        ), objeto.flush
+    objeto = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return (lambda bloque: objeto.compress(bloque) + objeto.flush(zlib.Z_SYNC_FLUSH)), objeto.flush
+
+
+def comprimir_secuencia(secuencia, codificacion, aleatorizar=False):
+    if codificacion == "gzip":
+        yield from compress_sequence(
+            secuencia, max_random_bytes=BYTES_ALEATORIOS if aleatorizar else None
+        )
+        return
+    bloque_comprimido, cerrar = compresor(codificacion)
+    for bloque in secuencia:
+        if bloque:
+            yield bloque_comprimido(bloque)
+    yield cerrar()
+
+
+async def comprimir_secuencia_async(secuencia, codificacion):
+    bloque_comprimido, cerrar = compresor(codificacion)
+    async for bloque in secuencia:
+        if bloque:
+            yield bloque_comprimido(bloque)
+    yield cerrar()
+
+
+def aplicar(request, respuesta):
+    patch_vary_headers(respuesta, ("Accept-Encoding",))
+    if not es_comprimible(respuesta):
+        return respuesta
+    codificacion = elegir_codificacion(
+        request.META.get("HTTP_ACCEPT_ENCODING", ""), codificaciones_disponibles()
+    )
+    if codificacion is None:
+        return respuesta
+
+    # BREACH: en una página con token CSRF el tamaño comprimido delata el
+    # token. Django ya lo enmascara por respuesta; además esas páginas van con
+    # gzip y bytes aleatorios en la cabecera para que la longitud varíe. Que
+    # la respuesta renueve la cookie CSRF indica que la plantilla usó el token.
+    con_token = settings.CSRF_COOKIE_NAME in respuesta.cookies
+    if con_token:
+        codificacion = "gzip"
+
+    if respuesta.streaming:
+        if respuesta.is_async:
+            respuesta.streaming_content = comprimir_secuencia_async(
+                respuesta.streaming_content, codificacion
+            )
+        else:
+            respuesta.streaming_content = comprimir_secuencia(
+                respuesta.streaming_content, codificacion, con_token
+            )
+        del respuesta["Content-Length"]
+    else:
+        comprimido = comprimir(respuesta.content, codificacion, con_token)
+        if len(comprimido) >= len(respuesta.content):
+            return respuesta
+        respuesta.content = comprimido
+        respuesta["Content-Length"] = str(len(comprimido))
+
+    etiqueta = respuesta.get("ETag")
+    if etiqueta and etiqueta.startswith('"'):
+        respuesta["ETag"] = "W/" + etiqueta
+    respuesta["Content-Encoding"] = codificacion
+    return respuesta
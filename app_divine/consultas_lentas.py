@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import re
+import sys
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger("app_divine.consultas_lentas")
+
+_vista_actual = ContextVar("vista_actual", default=None)
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_MARCADORES = re.compile(r"%s|\?")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+_INSTRUMENTACION = {
+    Path(__file__).resolve().with_name(nombre)
+    for nombre in ("consultas_lentas.py", "metricas.py", "middleware.py")
+}
+
+
+def normalizar(sql):
+    sql = _CADENAS.sub("?", sql)
+    sql = _NUMEROS.sub("?", sql)
+    sql = _MARCADORES.sub("?", sql)
+    sql = _LISTAS.sub("(...)", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def huella(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()[:16]
+
+
+def es_del_proyecto(marco, base):
+    archivo = marco.f_code.co_filename
+    return (
+        archivo.startswith(base)
+        and "site-packages" not in archivo
+        and Path(archivo).resolve() not in _INSTRUMENTACION
+    )
+
+
+def ubicacion(marco, base):
+    return f"{Path(marco.f_code.co_filename).relative_to(base)}:{marco.f_lineno}"
+
+
+def marco_de_tarea(tarea, base):
+    # La tarea está suspendida esperando el hilo de la consulta: su cadena de
+    # corrutinas (cr_await) llega hasta la línea de la vista que la pidió.
+    encontrado = None
+    pendiente = tarea.get_coro()
+    while pendiente is not None:
+        marco = getattr(pendiente, "cr_frame", None) or getattr(pendiente, "ag_frame", None)
+        if marco is None:
+            break
+        if es_del_proyecto(marco, base):
+            encontrado = marco
+        pendiente = getattr(pendiente, "cr_await", None) or getattr(pendiente, "ag_await", None)
+    return encontrado
+
+
+def primer_marco_proyecto(tarea=None):
+    # Las consultas del ORM asíncrono corren en un hilo de sync_to_async: más
+    # allá del primer marco de asgiref solo está quien arrancó el hilo o el
+    # bucle (manage.py, el servidor), no quien hizo la consulta. En ese caso
+    # se busca en la tarea de la solicitud y, si no hay, el origen es None.
+    base = str(Path(settings.BASE_DIR).resolve())
+    marco = sys._getframe(2)
+    while marco is not None:
+        if marco.f_globals.get("__name__", "").startswith("asgiref."):
+            if tarea is None:
+                return None
+            marco = marco_de_tarea(tarea, base)
+            return ubicacion(marco, base) if marco is not None else None
+        if es_del_proyecto(marco, base):
+            return ubicacion(marco, base)
+        marco = marco.f_back
+    return None
+
+
+def iniciar_solicitud(tarea=None):
+    solicitud = {"vista": None, "tarea": tarea}
+    return solicitud, _vista_actual.set(solicitud)
+
+
+def terminar_solicitud(token):
+    _vista_actual.reset(token)
+
+
+def registrar_si_lenta(execute, sql, params, many, context):
+    solicitud = _vista_actual.get()
+    if solicitud is None or settings.CONSULTAS_LENTAS_UMBRAL_MS is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        if duracion_ms >= settings.CONSULTAS_LENTAS_UMBRAL_MS:
+            normalizado = normalizar(sql)
+            logger.warning(
+                json.dumps(
+                    {
+                        "fecha": timezone.now().isoformat(),
+                        "huella": huella(normalizado),
+                        "sql": normalizado,
+                        "parametros": len(params or ()),
+                        "muchos": many,
+                        "duracion_ms": round(duracion_ms, 3),
+                        "vista": solicitud["vista"],
+                        "origen": primer_marco_proyecto(solicitud["tarea"]),
+                    },
+                    ensure_ascii=False,
+                )
+            )
+
+
+def envolver_conexion(sender, connection, **kwargs):
+    if registrar_si_lenta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar_si_lenta)
+
+
+def instalar():
+    connection_created.connect(envolver_conexion, dispatch_uid="consultas_lentas_envolver_conexion")
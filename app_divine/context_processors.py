@@ -1,3 +1,4 @@
+from .cache_catalogo import version_catalogo as version_actual
 from .models import Usuario
 
 def usuario_en_sesion(request):
@@ -8,4 +9,8 @@ def usuario_en_sesion(request):
             usuario = Usuario.objects.get(pk=usuario_id)
         except Usuario.DoesNotExist:
             request.session.flush()
-    return {"usuario_en_sesion": usuario}
\ No newline at end of file
+    return {"usuario_en_sesion": usuario}
+
+
+def version_catalogo(request):
+    return {"version_catalogo": version_actual()}
@@ -0,0 +1,76 @@
+import gzip
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan variantes .gz
+    brotli = None
+
+EXTENSIONES_TEXTO = {".css", ".js", ".svg", ".txt", ".json", ".map", ".html"}
+EXTENSIONES_WEBP = {".jpg", ".jpeg", ".png"}
+DIRECTORIO_WEBP = "imagenes/"
+CALIDAD_WEBP = 80
+TAMANO_MINIMO_COMPRESION = 512
+
+
+class AlmacenamientoEstaticoComprimido(ManifestStaticFilesStorage):
+    # Además de los nombres con hash, collectstatic deja junto a cada archivo
+    # de texto sus variantes .gz/.br para gzip_static/brotli_static, y apunta
+    # las imágenes de imagenes/ a una copia WebP. Las plantillas siguen
+    # pidiendo {% static 'imagenes/cabello.jpg' %}.
+    # Una referencia a un archivo ausente cae al nombre sin hash en lugar de
+    # romper la página con ValueError.
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for original in sorted(paths):
+            if self.recomprimible(original):
+                clave = self.hash_key(self.clean_name(original))
+                webp = self.guardar_webp(self.hashed_files[clave])
+                self.hashed_files[clave] = webp
+                yield original, webp, True
+        for nombre in sorted(set(self.hashed_files.values())):
+            self.precomprimir(nombre)
+        self.save_manifest()
+
+    def recomprimible(self, nombre):
+        ruta = PurePosixPath(nombre)
+        return nombre.startswith(DIRECTORIO_WEBP) and ruta.suffix.lower() in EXTENSIONES_WEBP
+
+    def guardar_webp(self, nombre_con_hash):
+        destino = str(PurePosixPath(nombre_con_hash).with_suffix(".webp"))
+        with self.open(nombre_con_hash) as archivo, Image.open(archivo) as imagen:
+            if imagen.mode not in ("RGB", "RGBA"):
+                imagen = imagen.convert("RGBA")
+            salida = BytesIO()
+            imagen.save(salida, "WEBP", quality=CALIDAD_WEBP)
+        if self.exists(destino):
+            self.delete(destino)
+        self._save(destino, ContentFile(salida.getvalue()))
+        return destino
+
+    def precomprimir(self, nombre):
+        if PurePosixPath(nombre).suffix.lower() not in EXTENSIONES_TEXTO:
+            return
+        with self.open(nombre) as archivo:
+            contenido = archivo.read()
+        if len(contenido) < TAMANO_MINIMO_COMPRESION:
+            return
+        variantes = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes[".br"] = brotli.compress(contenido, quality=11)
+        for extension, comprimido in variantes.items():
+            if len(comprimido) >= len(contenido):
+                continue
+            destino = nombre + extension
+            if self.exists(destino):
+                self.delete(destino)
+            self._save(destino, ContentFile(comprimido))
@@ -1,5 +1,9 @@
 from django import forms
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from . import inventario
+from .acciones_masivas import ACCIONES
 
 from .models import (
     Cabello,
@@ -65,7 +69,35 @@ class FormularioInicioSesion(forms.Form):
     )
 
 
-class FormularioCabello(forms.ModelForm):
+class FormularioProducto(forms.ModelForm):
+    # El campo stock muestra y recibe las existencias; la diferencia se
+    # guarda como movimiento de inventario en lugar de sobrescribir la fila.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stock_compactado = self.instance.stock
+        if self.instance.pk:
+            self.initial["stock"] = inventario.existencias(self.instance)
+
+    def save(self, commit=True):
+        producto = super().save(commit=False)
+        deseado = producto.stock
+        producto.stock = self.stock_compactado if producto.pk else 0
+        if not commit:
+            return producto
+        with transaction.atomic():
+            nuevo = producto.pk is None
+            if not nuevo:
+                inventario.bloquear([producto.pk])
+            producto.save()
+            if nuevo:
+                inventario.abrir(producto)
+            inventario.registrar(
+                producto, deseado - inventario.existencias(producto), "entrada" if nuevo else "ajuste"
+            )
+        return producto
+
+
+class FormularioCabello(FormularioProducto):
     class Meta:
         model = Cabello
         fields = ["nombre", "descripcion", "precio", "stock", "categoria", "foto"]
@@ -79,7 +111,7 @@ class FormularioCabello(forms.ModelForm):
         }
 
 
-class FormularioMaquillaje(forms.ModelForm):
+class FormularioMaquillaje(FormularioProducto):
     class Meta:
         model = Maquillaje
         fields = ["nombre", "descripcion", "precio", "stock", "categoria", "foto"]
@@ -93,7 +125,7 @@ class FormularioMaquillaje(forms.ModelForm):
         }
 
 
-class FormularioCuidadoPiel(forms.ModelForm):
+class FormularioCuidadoPiel(FormularioProducto):
     class Meta:
         model = CuidadoPiel
         fields = ["nombre", "descripcion", "precio", "stock", "categoria", "foto"]
@@ -107,7 +139,7 @@ class FormularioCuidadoPiel(forms.ModelForm):
         }
 
 
-class FormularioPerfume(forms.ModelForm):
+class FormularioPerfume(FormularioProducto):
     class Meta:
         model = Perfume
         fields = ["nombre", "descripcion", "precio", "stock", "categoria", "foto"]
@@ -188,4 +220,48 @@ class FormularioPago(forms.Form):
     )
     domicilio = forms.CharField(
         widget=forms.Textarea(attrs={"class": "campo-texto", "rows": 3})
-    )
\ No newline at end of file
+    )
+    clave = forms.CharField(max_length=32, widget=forms.HiddenInput)
+
+
+class CampoIds(forms.Field):
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, valor):
+        try:
+            return [int(pk) for pk in valor or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Selección inválida.")
+
+
+class FormularioAccionMasiva(forms.Form):
+    ALCANCES = (
+        ("seleccionados", "Productos seleccionados"),
+        ("filtro", "Todos los del filtro actual"),
+    )
+    # Las listas de productos dibujan estos campos a mano (admin/*_lista.html).
+    accion = forms.ChoiceField(choices=ACCIONES)
+    valor = forms.DecimalField(required=False, max_digits=12, decimal_places=2)
+    categoria_nueva = forms.CharField(required=False, max_length=80)
+    alcance = forms.ChoiceField(choices=ALCANCES)
+    seleccionados = CampoIds(required=False)
+    filtro_categoria = forms.CharField(required=False, max_length=80)
+
+    def clean(self):
+        datos = super().clean()
+        accion = datos.get("accion")
+        valor = datos.get("valor")
+        if accion in ("precio_porcentaje", "precio_sumar", "stock_fijar", "stock_sumar"):
+            if valor is None:
+                self.add_error("valor", "Indica un valor para esta acción.")
+            elif accion.startswith("stock") and valor != valor.to_integral_value():
+                self.add_error("valor", "El stock se ajusta en unidades enteras.")
+            elif accion == "stock_fijar" and valor < 0:
+                self.add_error("valor", "El stock no puede ser negativo.")
+            elif accion == "precio_porcentaje" and valor <= -100:
+                self.add_error("valor", "El precio no puede bajar 100% o más.")
+        if accion == "categoria" and not datos.get("categoria_nueva"):
+            self.add_error("categoria_nueva", "Indica la nueva categoría.")
+        if datos.get("alcance") == "seleccionados" and not datos.get("seleccionados"):
+            self.add_error(None, "Selecciona al menos un producto.")
+        return datos
@@ -0,0 +1,167 @@
+from django.db import router, transaction
+from django.db.models import Exists, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CorteInventario, MovimientoInventario, Producto
+
+TAMANO_LOTE = 500
+
+
+def pendiente(producto_ref="pk", hasta_ref="inventario_hasta", **filtros):
+    movimientos = (
+        MovimientoInventario.objects.filter(
+            producto=OuterRef(producto_ref), id__gt=OuterRef(hasta_ref), **filtros
+        )
+        .order_by()
+        .values("producto")
+        .annotate(total=Sum("cantidad"))
+        .values("total")
+    )
+    return Coalesce(Subquery(movimientos), 0)
+
+
+def con_existencias(consulta):
+    return consulta.annotate(existencias=F("stock") + pendiente())
+
+
+def existencias(producto):
+    return con_existencias(Producto.objects.filter(pk=producto.pk)).values_list(
+        "existencias", flat=True
+    ).get()
+
+
+def abrir(producto):
+    return CorteInventario.objects.create(producto=producto, stock=producto.stock, hasta_movimiento=0)
+
+
+def registrar(producto, cantidad, motivo, pedido=None):
+    if cantidad:
+        return MovimientoInventario.objects.create(
+            producto=producto, cantidad=cantidad, motivo=motivo, pedido=pedido
+        )
+    return None
+
+
+def bloquear(ids):
+    # Bloquea las filas de los productos antes de escribir en el libro (ver
+    # compactar); en orden de id para no cruzarse con otro escritor. Devuelve
+    # los ids que existen.
+    return set(
+        Producto.objects.select_for_update().filter(pk__in=ids).order_by("id").values_list("id", flat=True)
+    )
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, productos):
+        super().__init__(productos)
+        self.productos = productos
+
+
+def vender(cantidades, pedido):
+    # `cantidades` es {producto_id: unidades}. Va dentro de la transacción del
+    # pedido: en PostgreSQL bloquea las filas de los productos (en orden de id
+    # para no cruzarse con otro pago) y en SQLite BEGIN IMMEDIATE ya
+    # serializa a los escritores. Los productos borrados se omiten; devuelve
+    # los que existen.
+    existentes = bloquear(cantidades)
+    disponibles = dict(
+        con_existencias(Producto.objects.filter(pk__in=existentes)).values_list("id", "existencias")
+    )
+    faltantes = sorted(pk for pk in existentes if disponibles[pk] < cantidades[pk])
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+    MovimientoInventario.objects.bulk_create(
+        MovimientoInventario(producto_id=pk, cantidad=-cantidades[pk], motivo="venta", pedido=pedido)
+        for pk in sorted(existentes)
+    )
+    return existentes
+
+
+def ultimo_movimiento(producto_ref="pk"):
+    movimientos = (
+        MovimientoInventario.objects.filter(producto=OuterRef(producto_ref))
+        .order_by()
+        .values("producto")
+        .annotate(ultimo=Max("id"))
+        .values("ultimo")
+    )
+    return Subquery(movimientos)
+
+
+def compactar(tamano_lote=TAMANO_LOTE):
+    # Suma los movimientos en `stock` por lotes de productos; cada lote es su
+    # propia transacción y deja un corte para el reporte histórico. Como
+    # inventario_hasta avanza junto con stock, las existencias son exactas
+    # aunque el proceso se interrumpa a la mitad.
+    # Todo se lee del primario: fuera de una solicitud el router mandaría la
+    # suma a la réplica, que puede ir detrás del candado.
+    base = router.db_for_write(Producto)
+    compactados = 0
+    ultimo_producto = 0
+    while True:
+        with transaction.atomic(using=base):
+            # Primero se bloquean las filas: quien escribe en el libro bloquea
+            # antes el producto (vender, FormularioProducto, importar_inventario),
+            # así que al tener el candado no queda ningún movimiento suyo sin
+            # confirmar. Los ids se reparten antes del commit, por eso la suma y
+            # el tope se leen después, en otra consulta, y el tope es el último
+            # movimiento de cada producto y no el máximo global.
+            ids = list(
+                Producto.objects.using(base)
+                .select_for_update()
+                .filter(id__gt=ultimo_producto)
+                .filter(
+                    Exists(
+                        MovimientoInventario.objects.filter(
+                            producto=OuterRef("pk"), id__gt=OuterRef("inventario_hasta")
+                        )
+                    )
+                )
+                .order_by("id")
+                .values_list("id", flat=True)[:tamano_lote]
+            )
+            if not ids:
+                break
+            lote = list(
+                Producto.objects.using(base)
+                .filter(pk__in=ids)
+                .annotate(movido=pendiente(), hasta=ultimo_movimiento())
+                .order_by("id")
+            )
+            ahora = timezone.now()
+            for producto in lote:
+                # Ajustes antiguos pudieron dejar existencias negativas; el
+                # campo no las admite.
+                producto.stock = max(producto.stock + producto.movido, 0)
+                producto.inventario_hasta = producto.hasta
+                # Así /api/catalogo/cambios publica el stock tras cada compactación.
+                producto.actualizado = ahora
+            Producto.objects.using(base).bulk_update(lote, ["stock", "inventario_hasta", "actualizado"])
+            CorteInventario.objects.using(base).bulk_create(
+                CorteInventario(producto=producto, stock=producto.stock, hasta_movimiento=producto.hasta)
+                for producto in lote
+            )
+        compactados += len(ids)
+        ultimo_producto = ids[-1]
+    return compactados
+
+
+def stock_en(momento, consulta=None):
+    # Parte del último corte anterior a `momento` y suma los movimientos
+    # posteriores a ese corte creados hasta `momento`. Sin corte previo el
+    # stock es desconocido (None): el producto no existía o es anterior al libro.
+    corte = CorteInventario.objects.filter(producto=OuterRef("pk"), fecha__lte=momento).order_by(
+        "-fecha", "-id"
+    )
+    consulta = Producto.objects.all() if consulta is None else consulta
+    return (
+        consulta.annotate(
+            corte_stock=Subquery(corte.values("stock")[:1]),
+            corte_hasta=Coalesce(Subquery(corte.values("hasta_movimiento")[:1]), 0),
+        )
+        .annotate(
+            stock_historico=F("corte_stock") + pendiente(hasta_ref="corte_hasta", creado__lte=momento)
+        )
+        .order_by("id")
+    )
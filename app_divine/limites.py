@@ -0,0 +1,139 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+def limitar(**limites):
+    # limitar(ip=(20, 60), correo=(5, 300)): hasta n solicitudes cada s
+    # segundos por clave. Solo marca la vista; MiddlewareLimites aplica el
+    # límite y LIMITES_RUTAS puede reemplazarlo por nombre de ruta.
+    def decorador(funcion):
+        funcion.limites = limites
+        return funcion
+
+    return decorador
+
+
+class MemoriaLocal:
+    # Por clave guarda (número de ventana, cuenta actual, cuenta anterior). Es
+    # un LRU acotado: al pasar la capacidad se descarta la clave más antigua.
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self.contadores = OrderedDict()
+        self.candado = threading.Lock()
+
+    def registrar(self, clave, ventana, ahora):
+        numero = int(ahora // ventana)
+        with self.candado:
+            guardado = self.contadores.pop(clave, None)
+            if guardado is None or guardado[0] < numero - 1:
+                actual, previo = 1, 0
+            elif guardado[0] == numero - 1:
+                actual, previo = 1, guardado[1]
+            else:
+                actual, previo = guardado[1] + 1, guardado[2]
+            self.contadores[clave] = (numero, actual, previo)
+            if len(self.contadores) > self.capacidad:
+                self.contadores.popitem(last=False)
+        return actual, previo
+
+
+class CacheCompartida:
+    # Un contador por ventana en la cache de Django (Redis en producción) para
+    # que todos los workers sumen sobre la misma clave.
+    def registrar(self, clave, ventana, ahora):
+        numero = int(ahora // ventana)
+        actual_clave = f"limite:{clave}:{numero}"
+        cache.add(actual_clave, 0, timeout=ventana * 2)
+        try:
+            actual = cache.incr(actual_clave)
+        except ValueError:
+            # La clave venció entre add e incr.
+            cache.set(actual_clave, 1, timeout=ventana * 2)
+            actual = 1
+        return actual, cache.get(f"limite:{clave}:{numero - 1}", 0)
+
+
+_memoria = None
+
+
+def backend():
+    global _memoria
+    if settings.LIMITES_BACKEND == "cache":
+        return CacheCompartida()
+    if _memoria is None:
+        _memoria = MemoriaLocal(settings.LIMITES_CAPACIDAD)
+    return _memoria
+
+
+def descartar():
+    global _memoria
+    _memoria = None
+
+
+def estimar(actual, previo, transcurrido, ventana):
+    # Ventana deslizante aproximada: la ventana anterior pesa según cuánto de
+    # ella sigue dentro de los últimos `ventana` segundos.
+    return actual + previo * (1 - transcurrido / ventana)
+
+
+def espera(actual, previo, transcurrido, ventana, limite):
+    # Segundos hasta que la estimación baje del límite sin más solicitudes.
+    if actual < limite:
+        momento = ventana * (1 - (limite - actual) / previo)
+    else:
+        momento = ventana + ventana * (1 - limite / actual)
+    return max(1, math.ceil(momento - transcurrido))
+
+
+def direccion_cliente(request):
+    # Detrás de LIMITES_PROXIES proxies de confianza la IP real es la que
+    # añadió el más externo de ellos en X-Forwarded-For.
+    proxies = settings.LIMITES_PROXIES
+    if proxies:
+        reenviadas = [
+            parte.strip() for parte in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+            if parte.strip()
+        ]
+        if len(reenviadas) >= proxies:
+            return reenviadas[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def claves(request, limites):
+    for tipo, (limite, ventana) in limites.items():
+        if tipo == "ip":
+            valor = direccion_cliente(request)
+        elif tipo == "correo":
+            valor = request.POST.get("correo_electronico", "").strip().lower()
+        else:
+            continue
+        if valor:
+            yield f"{tipo}:{valor}", limite, ventana
+
+
+def comprobar(request, nombre, limites):
+    # Cada intento cuenta, también los rechazados: quien insiste sin esperar
+    # el Retry-After sigue bloqueado.
+    destino = backend()
+    ahora = time.time()
+    retraso = 0
+    for clave, limite, ventana in claves(request, limites):
+        actual, previo = destino.registrar(f"{nombre}:{clave}", ventana, ahora)
+        transcurrido = ahora % ventana
+        if estimar(actual, previo, transcurrido, ventana) > limite:
+            retraso = max(retraso, espera(actual, previo, transcurrido, ventana, limite))
+    if not retraso:
+        return None
+    respuesta = HttpResponse(
+        "Demasiados intentos. Espera un momento e inténtalo de nuevo.",
+        status=429,
+        content_type="text/plain; charset=utf-8",
+    )
+    respuesta["Retry-After"] = str(retraso)
+    return respuesta
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import resolve, reverse
+
+from app_divine.metricas import percentil
+from app_divine.models import Producto, Usuario
+from app_divine.views import ETIQUETAS_TIPO
+
+CORREO_BENCHMARK = "benchmark@divine.test"
+
+
+def usuario_benchmark():
+    usuario, _ = Usuario.objects.get_or_create(
+        correo_electronico=CORREO_BENCHMARK,
+        defaults={
+            "nombre": "Benchmark",
+            "apellido": "Divine",
+            "fecha_nacimiento": date(1990, 1, 1),
+            "contrasena": make_password(None),
+            "direccion": "Calle Benchmark 1",
+        },
+    )
+    return usuario
+
+
+def crear_sesion(usuario):
+    sesion = SessionStore()
+    sesion["usuario_id"] = usuario.pk
+    sesion.create()
+    return sesion.session_key
+
+
+class ClienteAsincrono(AsyncClient):
+    # AsyncClient fija siempre la cabecera host en "testserver"; se reemplaza
+    # para que el benchmark funcione con ALLOWED_HOSTS de producción.
+    def __init__(self, host, **kwargs):
+        super().__init__(**kwargs)
+        self.host = host.encode("ascii")
+
+    async def request(self, **solicitud):
+        cabeceras = [(nombre, valor) for nombre, valor in solicitud["headers"] if nombre != b"host"]
+        solicitud["headers"] = [(b"host", self.host), *cabeceras]
+        return await super().request(**solicitud)
+
+
+class Command(BaseCommand):
+    help = "Mide throughput y latencia por ruta de los flujos de tienda y pago."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8, help="Clientes concurrentes.")
+        parser.add_argument("--interfaz", choices=["wsgi", "asgi"], default="wsgi")
+        parser.add_argument("--iteraciones", type=int, default=25)
+        parser.add_argument("--flujo", choices=["tienda", "pago", "todos"], default="todos")
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--host", default="localhost")
+        parser.add_argument("--salida", help="Archivo donde guardar el JSON.")
+
+    def handle(self, *args, **opciones):
+        productos = list(Producto.objects.values_list("pk", flat=True))
+        if not productos:
+            raise CommandError("No hay productos; ejecuta primero `manage.py sembrar`.")
+        usuario = usuario_benchmark()
+        sesiones = [crear_sesion(usuario) for _ in range(opciones["hilos"])]
+        self.tiempos = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.candado = threading.Lock()
+
+        inicio = time.perf_counter()
+        if opciones["interfaz"] == "asgi":
+            asyncio.run(self.ejecutar_asgi(opciones, productos, usuario, sesiones))
+        else:
+            self.ejecutar_wsgi(opciones, productos, usuario, sesiones)
+        duracion = time.perf_counter() - inicio
+
+        resultado = self.resumir(opciones, duracion)
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if opciones["salida"]:
+            with open(opciones["salida"], "w", encoding="utf-8") as archivo:
+                archivo.write(texto)
+        self.stdout.write(texto)
+
+    def pasos(self, numero, opciones, productos, usuario):
+        rng = random.Random(opciones["semilla"] + numero)
+        categorias = ["todos", *ETIQUETAS_TIPO]
+        for _ in range(opciones["iteraciones"]):
+            if opciones["flujo"] in ("tienda", "todos"):
+                pk = rng.choice(productos)
+                yield "anonimo", "get", reverse("inicio"), None
+                yield "anonimo", "get", reverse("novedades"), None
+                yield "anonimo", "get", f"{reverse('productos')}?categoria={rng.choice(categorias)}", None
+                yield "anonimo", "get", reverse("detalle_producto", args=[pk]), None
+            if opciones["flujo"] in ("pago", "todos"):
+                pk = rng.choice(productos)
+                yield (
+                    "comprador",
+                    "post",
+                    reverse("agregar_carrito", args=[pk]),
+                    {"cantidad": rng.randint(1, 3)},
+                )
+                yield "comprador", "get", reverse("carrito"), None
+                yield "comprador", "get", reverse("procesar_pago"), None
+                yield (
+                    "comprador",
+                    "post",
+                    reverse("procesar_pago"),
+                    {
+                        "metodo": "paypal",
+                        "correo_paypal": CORREO_BENCHMARK,
+                        "domicilio": usuario.direccion,
+                        "clave": uuid4().hex,
+                    },
+                )
+
+    def anotar(self, metodo, url, duracion, respuesta):
+        nombre = resolve(url.split("?")[0]).url_name
+        with self.candado:
+            self.tiempos[nombre].append(duracion)
+            # Los POST del flujo redirigen; un 200 es el formulario devuelto
+            # con errores y no lo que se quería medir.
+            if respuesta.status_code >= 400 or (metodo == "post" and respuesta.status_code == 200):
+                self.errores[nombre] += 1
+
+    def ejecutar_wsgi(self, opciones, productos, usuario, sesiones):
+        hilos = [
+            threading.Thread(
+                target=self.trabajador,
+                args=(numero, opciones, productos, usuario, sesion),
+            )
+            for numero, sesion in enumerate(sesiones)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+    def trabajador(self, numero, opciones, productos, usuario, sesion):
+        clientes = {
+            "anonimo": Client(HTTP_HOST=opciones["host"]),
+            "comprador": Client(HTTP_HOST=opciones["host"]),
+        }
+        clientes["comprador"].cookies[settings.SESSION_COOKIE_NAME] = sesion
+        try:
+            for rol, metodo, url, datos in self.pasos(numero, opciones, productos, usuario):
+                inicio = time.perf_counter()
+                respuesta = getattr(clientes[rol], metodo)(url, datos or {})
+                self.anotar(metodo, url, time.perf_counter() - inicio, respuesta)
+        finally:
+            connection.close()
+
+    async def ejecutar_asgi(self, opciones, productos, usuario, sesiones):
+        await asyncio.gather(
+            *(
+                self.trabajador_asgi(numero, opciones, productos, usuario, sesion)
+                for numero, sesion in enumerate(sesiones)
+            )
+        )
+
+    async def trabajador_asgi(self, numero, opciones, productos, usuario, sesion):
+        clientes = {
+            "anonimo": ClienteAsincrono(opciones["host"]),
+            "comprador": ClienteAsincrono(opciones["host"]),
+        }
+        clientes["comprador"].cookies[settings.SESSION_COOKIE_NAME] = sesion
+        for rol, metodo, url, datos in self.pasos(numero, opciones, productos, usuario):
+            inicio = time.perf_counter()
+            respuesta = await getattr(clientes[rol], metodo)(url, datos or {})
+            self.anotar(metodo, url, time.perf_counter() - inicio, respuesta)
+
+    def resumir(self, opciones, duracion):
+        rutas = {}
+        for nombre, tiempos in sorted(self.tiempos.items()):
+            rutas[nombre] = {
+                "solicitudes": len(tiempos),
+                "errores": self.errores[nombre],
+                "rps": round(len(tiempos) / duracion, 2),
+                "p50_ms": round(percentil(tiempos, 50) * 1000, 2),
+                "p95_ms": round(percentil(tiempos, 95) * 1000, 2),
+                "p99_ms": round(percentil(tiempos, 99) * 1000, 2),
+            }
+        total = sum(len(tiempos) for tiempos in self.tiempos.values())
+        return {
+            "interfaz": opciones["interfaz"],
+            "flujo": opciones["flujo"],
+            "hilos": opciones["hilos"],
+            "iteraciones": opciones["iteraciones"],
+            "semilla": opciones["semilla"],
+            "duracion_s": round(duracion, 3),
+            "solicitudes": total,
+            "rps": round(total / duracion, 2) if duracion else 0.0,
+            "rutas": rutas,
+        }
@@ -0,0 +1,76 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from app_divine import compresion
+from app_divine.management.commands.benchmark import crear_sesion, usuario_benchmark
+from app_divine.models import Producto, Usuario
+
+
+class Command(BaseCommand):
+    help = "Mide bytes enviados y costo de CPU de comprimir las páginas más grandes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=20)
+        parser.add_argument("--host", default="localhost")
+        parser.add_argument("--salida", help="Archivo donde guardar el JSON.")
+
+    def handle(self, *args, **opciones):
+        producto = Producto.objects.order_by("id").first()
+        administrador = Usuario.objects.filter(es_admin=True).first()
+        if producto is None or administrador is None:
+            raise CommandError("Hace falta catálogo y un administrador; ejecuta `manage.py sembrar`.")
+        comprador = usuario_benchmark()
+
+        anonimo = Client(HTTP_HOST=opciones["host"])
+        cliente = self.cliente_con_sesion(opciones["host"], comprador)
+        cliente.post(reverse("agregar_carrito", args=[producto.pk]), {"cantidad": 1})
+        admin = self.cliente_con_sesion(opciones["host"], administrador)
+        paginas = {
+            "productos": (anonimo, f"{reverse('productos')}?categoria=todos"),
+            "novedades": (anonimo, reverse("novedades")),
+            "procesar_pago": (cliente, reverse("procesar_pago")),
+            "admin_pedidos_lista": (admin, reverse("admin_pedidos_lista")),
+            "admin_usuarios_lista": (admin, reverse("admin_usuarios_lista")),
+            "admin_cabello_lista": (admin, reverse("admin_cabello_lista")),
+        }
+
+        resultado = {}
+        for nombre, (cliente_http, url) in paginas.items():
+            contenido = cliente_http.get(url).content
+            resultado[nombre] = {"original_bytes": len(contenido)}
+            for codificacion in compresion.codificaciones_disponibles():
+                resultado[nombre][codificacion] = self.medir(
+                    contenido, codificacion, opciones["repeticiones"]
+                )
+            resultado[nombre]["gzip_anti_breach"] = self.medir(
+                contenido, "gzip", opciones["repeticiones"], aleatorizar=True
+            )
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if opciones["salida"]:
+            with open(opciones["salida"], "w", encoding="utf-8") as archivo:
+                archivo.write(texto)
+        self.stdout.write(texto)
+
+    def cliente_con_sesion(self, host, usuario):
+        cliente = Client(HTTP_HOST=host)
+        cliente.cookies[settings.SESSION_COOKIE_NAME] = crear_sesion(usuario)
+        return cliente
+
+    def medir(self, contenido, codificacion, repeticiones, aleatorizar=False):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.process_time()
+            comprimido = compresion.comprimir(contenido, codificacion, aleatorizar)
+            tiempos.append(time.process_time() - inicio)
+        return {
+            "bytes": len(comprimido),
+            "proporcion": round(len(comprimido) / len(contenido), 3) if contenido else 0.0,
+            "cpu_ms": round(statistics.median(tiempos) * 1000, 3),
+        }
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_divine.inventario import TAMANO_LOTE, compactar
+
+
+class Command(BaseCommand):
+    help = "Suma los movimientos de inventario pendientes en el stock de cada producto."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **opciones):
+        inicio = time.perf_counter()
+        compactados = compactar(opciones["lote"])
+        self.stdout.write(
+            f"{compactados} productos compactados en {(time.perf_counter() - inicio) * 1000:.1f} ms"
+        )
@@ -0,0 +1,231 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from uuid import uuid4
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.test import Client
+from django.urls import reverse
+
+from app_divine import inventario
+from app_divine.calentamiento import compilar_plantillas, resolver_rutas
+from app_divine.metricas import percentil
+from app_divine.models import Cabello, MovimientoInventario, Pedido, Usuario
+
+
+def pagar(sesion, ip, clave, host, arranque):
+    # Un comprador: espera la hora de arranque común y envía el formulario de
+    # pago. La espera por candados es lo que tardan BEGIN (SQLite toma ahí el
+    # candado de escritura) y SELECT ... FOR UPDATE (PostgreSQL).
+    cliente = Client(HTTP_HOST=host, REMOTE_ADDR=ip)
+    cliente.cookies[settings.SESSION_COOKIE_NAME] = sesion
+    esperas = []
+
+    def medir(ejecutar, sql, parametros, varios, contexto):
+        if not sql.startswith("BEGIN") and "FOR UPDATE" not in sql:
+            return ejecutar(sql, parametros, varios, contexto)
+        inicio = time.perf_counter()
+        try:
+            return ejecutar(sql, parametros, varios, contexto)
+        finally:
+            esperas.append(time.perf_counter() - inicio)
+
+    datos = {"metodo": "paypal", "correo_paypal": "estres@divine.test", "domicilio": "Calle Estrés 1", "clave": clave}
+    time.sleep(max(0.0, arranque - time.time()))
+    inicio = time.perf_counter()
+    try:
+        with connection.execute_wrapper(medir):
+            respuesta = cliente.post(reverse("procesar_pago"), datos)
+        resultado = clasificar(respuesta)
+    except Exception as error:  # p. ej. OperationalError: database is locked
+        resultado = type(error).__name__
+    finally:
+        connection.close()
+    return {
+        "resultado": resultado,
+        "latencia": time.perf_counter() - inicio,
+        "espera": sum(esperas),
+        "fin": time.time(),
+    }
+
+
+def clasificar(respuesta):
+    destino = respuesta.get("Location")
+    if respuesta.status_code == 302 and destino == reverse("perfil_usuario"):
+        return "pedido"
+    if respuesta.status_code == 302 and destino == reverse("carrito"):
+        return "sin_stock"
+    return f"http_{respuesta.status_code}"
+
+
+def iniciar_proceso():
+    # Cada proceso llega al arranque con plantillas y rutas ya cargadas, así
+    # la latencia medida es la del pago y no la del primer uso.
+    django.setup()
+    compilar_plantillas()
+    resolver_rutas()
+
+
+class Command(BaseCommand):
+    help = (
+        "Lanza pagos concurrentes del mismo producto con poco stock y verifica que no "
+        "quede stock negativo ni pedidos duplicados. Crea sus propios datos; úsalo con "
+        "una copia de la base (DIVINE_SQLITE_NOMBRE) o con PostgreSQL local (DIVINE_PG_NOMBRE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=100, help="Compradores, cada uno con su sesión.")
+        parser.add_argument("--stock", type=int, default=10)
+        parser.add_argument("--cantidad", type=int, default=1, help="Unidades en cada carrito.")
+        parser.add_argument("--modo", choices=["hilos", "procesos"], default="hilos")
+        parser.add_argument(
+            "--duplicados", action="store_true", help="Cada comprador envía el formulario dos veces a la vez."
+        )
+        parser.add_argument("--host", default="localhost")
+        parser.add_argument("--salida", help="Archivo donde guardar el JSON.")
+        parser.add_argument("--conservar", action="store_true", help="No borra los datos creados.")
+
+    def handle(self, *args, **opciones):
+        marca = uuid4().hex[:8]
+        producto = Cabello.objects.create(
+            nombre=f"Estrés {marca}",
+            descripcion="Producto de la prueba de estrés del pago.",
+            categoria="Shampoo",
+            precio=Decimal("100.00"),
+            stock=opciones["stock"],
+        )
+        Usuario.objects.bulk_create(
+            Usuario(
+                nombre="Estrés",
+                apellido=str(numero),
+                fecha_nacimiento="1990-01-01",
+                correo_electronico=f"estres-{marca}-{numero}@divine.test",
+                contrasena=make_password(None),
+                direccion="Calle Estrés 1",
+            )
+            for numero in range(opciones["usuarios"])
+        )
+        # bulk_create no devuelve claves en todos los motores.
+        usuarios = list(Usuario.objects.filter(correo_electronico__startswith=f"estres-{marca}-").order_by("id"))
+        trabajos = []
+        for numero, usuario in enumerate(usuarios):
+            sesion = SessionStore()
+            sesion["usuario_id"] = usuario.pk
+            sesion["carrito"] = {
+                str(producto.pk): {
+                    "nombre": producto.nombre,
+                    "precio": str(producto.precio),
+                    "cantidad": opciones["cantidad"],
+                    "tipo": producto.tipo,
+                    "producto_id": producto.pk,
+                }
+            }
+            sesion.create()
+            ip = f"10.{numero // 65536 % 256}.{numero // 256 % 256}.{numero % 256}"
+            clave = uuid4().hex
+            trabajos += [(sesion.session_key, ip, clave)] * (2 if opciones["duplicados"] else 1)
+
+        try:
+            arranque, resultados = self.ejecutar(trabajos, opciones)
+            duracion = max(resultado["fin"] for resultado in resultados) - arranque
+            verificacion = self.verificar(producto, usuarios, opciones)
+            resultado = self.resumir(resultados, duracion, verificacion, opciones)
+        finally:
+            if not opciones["conservar"]:
+                SessionStore.get_model_class().objects.filter(pk__in={sesion for sesion, _, _ in trabajos}).delete()
+                Usuario.objects.filter(pk__in=[usuario.pk for usuario in usuarios]).delete()
+                producto.delete()
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if opciones["salida"]:
+            with open(opciones["salida"], "w", encoding="utf-8") as archivo:
+                archivo.write(texto)
+        self.stdout.write(texto)
+        fallas = [nombre for nombre, valor in verificacion.items() if nombre.startswith("error_") and valor]
+        if fallas:
+            raise CommandError(f"Inconsistencias: {', '.join(fallas)}")
+
+    def ejecutar(self, trabajos, opciones):
+        if opciones["modo"] == "procesos":
+            # Los procesos hijos no deben heredar conexiones abiertas.
+            connections.close_all()
+            arranque = time.time() + 2 + 0.02 * len(trabajos)
+            with ProcessPoolExecutor(len(trabajos), initializer=iniciar_proceso) as grupo:
+                futuros = [
+                    grupo.submit(pagar, sesion, ip, clave, opciones["host"], arranque)
+                    for sesion, ip, clave in trabajos
+                ]
+                return arranque, [futuro.result() for futuro in futuros]
+
+        arranque = time.time() + 0.5 + 0.005 * len(trabajos)
+        resultados = [None] * len(trabajos)
+
+        def hilo(posicion, sesion, ip, clave):
+            resultados[posicion] = pagar(sesion, ip, clave, opciones["host"], arranque)
+
+        hilos = [
+            threading.Thread(target=hilo, args=(posicion, *trabajo)) for posicion, trabajo in enumerate(trabajos)
+        ]
+        for trabajador in hilos:
+            trabajador.start()
+        for trabajador in hilos:
+            trabajador.join()
+        return arranque, resultados
+
+    def verificar(self, producto, usuarios, opciones):
+        pedidos = Pedido.objects.filter(id_usuario__in=usuarios)
+        vendidas = -(
+            MovimientoInventario.objects.filter(producto=producto, motivo="venta").aggregate(
+                total=Sum("cantidad")
+            )["total"]
+            or 0
+        )
+        existencias = inventario.existencias(producto)
+        total_pedidos = pedidos.count()
+        esperados = min(len(usuarios), opciones["stock"] // opciones["cantidad"])
+        return {
+            "pedidos": total_pedidos,
+            "pedidos_esperados": esperados,
+            "unidades_vendidas": vendidas,
+            "existencias_finales": existencias,
+            "error_stock_negativo": existencias < 0,
+            "error_inventario_descuadrado": opciones["stock"] - vendidas != existencias,
+            "error_pedidos_sin_movimiento": total_pedidos * opciones["cantidad"] != vendidas,
+            "error_pedidos_duplicados": pedidos.values("id_usuario")
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .count(),
+        }
+
+    def resumir(self, resultados, duracion, verificacion, opciones):
+        latencias = [resultado["latencia"] for resultado in resultados]
+        esperas = [resultado["espera"] for resultado in resultados]
+        conteo = Counter(resultado["resultado"] for resultado in resultados)
+        fallidas = sum(total for nombre, total in conteo.items() if nombre not in ("pedido", "sin_stock"))
+        return {
+            "motor": connection.vendor,
+            "modo": opciones["modo"],
+            "usuarios": opciones["usuarios"],
+            "solicitudes": len(resultados),
+            "stock_inicial": opciones["stock"],
+            "duracion_s": round(duracion, 3),
+            "solicitudes_por_s": round(len(resultados) / duracion, 2) if duracion else 0.0,
+            "pedidos_por_s": round(verificacion["pedidos"] / duracion, 2) if duracion else 0.0,
+            "latencia_p50_ms": round(percentil(latencias, 50) * 1000, 2),
+            "latencia_p99_ms": round(percentil(latencias, 99) * 1000, 2),
+            "espera_candado_p50_ms": round(percentil(esperas, 50) * 1000, 2),
+            "espera_candado_p99_ms": round(percentil(esperas, 99) * 1000, 2),
+            "espera_candado_max_ms": round(max(esperas, default=0) * 1000, 2),
+            "resultados": dict(conteo),
+            "tasa_fallas": round(fallidas / len(resultados), 4) if resultados else 0.0,
+            "verificacion": verificacion,
+        }
@@ -0,0 +1,37 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app_divine.inventario import TAMANO_LOTE, bloquear
+from app_divine.models import MovimientoInventario
+
+
+class Command(BaseCommand):
+    help = "Registra movimientos de inventario desde un CSV con columnas producto,cantidad."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument(
+            "--motivo",
+            default="importacion",
+            choices=[motivo for motivo, _ in MovimientoInventario.MOTIVOS if motivo != "venta"],
+        )
+
+    def handle(self, *args, **opciones):
+        with open(opciones["archivo"], newline="", encoding="utf-8") as archivo:
+            filas = [(int(fila["producto"]), int(fila["cantidad"])) for fila in csv.DictReader(archivo)]
+        productos = {pk for pk, _ in filas}
+        with transaction.atomic():
+            faltantes = productos - bloquear(productos)
+            if faltantes:
+                raise CommandError(f"Productos inexistentes: {sorted(faltantes)}")
+            MovimientoInventario.objects.bulk_create(
+                (
+                    MovimientoInventario(producto_id=pk, cantidad=cantidad, motivo=opciones["motivo"])
+                    for pk, cantidad in filas
+                    if cantidad
+                ),
+                batch_size=TAMANO_LOTE,
+            )
+        self.stdout.write(f"{len(filas)} movimientos registrados.")
@@ -0,0 +1,70 @@
+import json
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from app_divine.autocompletar import IndicePrefijos, leer_catalogo
+from app_divine.management.commands.sembrar import MARCAS, PRODUCTOS_BASE
+from app_divine.metricas import percentil
+from app_divine.views import ETIQUETAS_TIPO
+
+ADJETIVOS = ["Nutritivo", "Hidratante", "Mate", "Intenso", "Ligero", "Reparador", "Floral", "Cítrico"]
+
+
+class Command(BaseCommand):
+    help = "Mide memoria, tiempo de construcción y latencia del índice de autocompletado."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=100_000)
+        parser.add_argument("--consultas", type=int, default=5000)
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--bd", action="store_true", help="Usa el catálogo real en lugar de uno sintético.")
+
+    def handle(self, *args, **opciones):
+        rng = random.Random(opciones["semilla"])
+        filas = leer_catalogo() if opciones["bd"] else self.catalogo_sintetico(rng, opciones["productos"])
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        indice = IndicePrefijos(filas)
+        construccion = time.perf_counter() - inicio
+        memoria, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Prefijos de palabras reales del catálogo y pares de dos palabras.
+        palabras = [rng.choice(fila[1].split()) for fila in filas[:1000]]
+        consultas = [
+            palabra[: rng.randint(1, len(palabra))]
+            for palabra in rng.choices(palabras, k=opciones["consultas"])
+        ]
+        consultas += [f"{a[:3]} {b[:2]}" for a, b in zip(consultas, reversed(consultas))][:1000]
+        tiempos = []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            indice.buscar(consulta)
+            tiempos.append(time.perf_counter() - inicio)
+
+        resultado = {
+            "productos": len(filas),
+            "terminos": len(indice.terminos),
+            "prefijos_precalculados": len(indice.precalculadas),
+            "memoria_mb": round(memoria / 2**20, 1),
+            "pico_construccion_mb": round(pico / 2**20, 1),
+            "construccion_s": round(construccion, 2),
+            "consulta_p50_us": round(percentil(tiempos, 50) * 1e6, 1),
+            "consulta_p99_us": round(percentil(tiempos, 99) * 1e6, 1),
+            "consulta_max_us": round(max(tiempos) * 1e6, 1),
+        }
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    def catalogo_sintetico(self, rng, cantidad):
+        tipos = list(ETIQUETAS_TIPO)
+        filas = []
+        for pk in range(1, cantidad + 1):
+            tipo = rng.choice(tipos)
+            base = rng.choice(PRODUCTOS_BASE[tipo])
+            nombre = f"{rng.choice(MARCAS)} {base} {rng.choice(ADJETIVOS)} {rng.randint(1, 999)}"
+            filas.append((pk, nombre, base, tipo, int(rng.paretovariate(1.2))))
+        return filas
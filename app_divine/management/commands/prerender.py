@@ -0,0 +1,37 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_divine.prerender import prerenderizar
+
+
+class Command(BaseCommand):
+    help = "Genera HTML estático (con variantes comprimidas) de las páginas públicas del catálogo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directorio", default=settings.PRERENDER_DIRECTORIO)
+        parser.add_argument(
+            "--pendientes",
+            action="store_true",
+            help="Solo las páginas de productos guardados o borrados desde la última ejecución.",
+        )
+        parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--host", default=settings.PRERENDER_HOST)
+
+    def handle(self, *args, **opciones):
+        if not opciones["directorio"]:
+            raise CommandError("Indica --directorio o configura DIVINE_PRERENDER_DIR.")
+        inicio = time.perf_counter()
+        resultado = prerenderizar(
+            opciones["directorio"], opciones["host"], opciones["procesos"], opciones["pendientes"]
+        )
+        self.stdout.write(
+            f"{resultado['paginas']} páginas ({resultado['bytes'] / 2**20:.1f} MB), "
+            f"{resultado['borradas']} borradas en {time.perf_counter() - inicio:.1f} s"
+        )
+        for url in resultado["errores"]:
+            self.stderr.write(f"Error al generar {url}")
+        if resultado["errores"]:
+            raise CommandError(f"{len(resultado['errores'])} páginas con error; las marcas pendientes se conservan.")
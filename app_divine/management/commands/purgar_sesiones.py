@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_divine.sesiones import TAMANO_LOTE, purgar
+
+
+class Command(BaseCommand):
+    help = "Borra las sesiones vencidas por lotes y guarda los carritos que tenían."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=TAMANO_LOTE)
+        parser.add_argument("--pausa", type=float, default=0.05, help="Segundos entre lotes.")
+        parser.add_argument("--max-segundos", type=float, help="Tiempo máximo de la ejecución.")
+
+    def handle(self, *args, **opciones):
+        inicio = time.perf_counter()
+        resumen = purgar(opciones["lote"], opciones["pausa"], opciones["max_segundos"])
+        self.stdout.write(
+            f"{resumen['sesiones']} sesiones borradas en {resumen['lotes']} lotes, "
+            f"{resumen['carritos']} carritos guardados en {time.perf_counter() - inicio:.1f} s"
+            + ("" if resumen["completo"] else " (quedan sesiones vencidas)")
+        )
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_divine.recomendaciones import actualizar
+
+
+class Command(BaseCommand):
+    help = "Actualiza las recomendaciones \"quienes compraron esto también compraron\"."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--completo", action="store_true", help="Recalcula desde el primer pedido.")
+        parser.add_argument("--k", type=int, help="Recomendaciones por producto.")
+
+    def handle(self, *args, **opciones):
+        inicio = time.perf_counter()
+        resumen = actualizar(completo=opciones["completo"], k=opciones["k"])
+        self.stdout.write(
+            f"{resumen['pedidos']} pedidos nuevos, {resumen['pares']} pares, "
+            f"{resumen['productos']} productos recalculados en "
+            f"{(time.perf_counter() - inicio) * 1000:.1f} ms"
+        )
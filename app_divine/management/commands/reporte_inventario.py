@@ -0,0 +1,33 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app_divine.inventario import con_existencias, stock_en
+from app_divine.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el stock de cada producto en una fecha a partir del corte más cercano."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fecha", help="Fecha y hora ISO 8601; por defecto, ahora.")
+        parser.add_argument("--producto", type=int, action="append", help="Limita el reporte a estos ids.")
+
+    def handle(self, *args, **opciones):
+        momento = timezone.now()
+        if opciones["fecha"]:
+            momento = parse_datetime(opciones["fecha"])
+            if momento is None:
+                raise CommandError("Fecha inválida; usa por ejemplo 2025-06-01T12:00.")
+            if timezone.is_naive(momento):
+                momento = timezone.make_aware(momento)
+
+        consulta = con_existencias(Producto.objects.all())
+        if opciones["producto"]:
+            consulta = consulta.filter(pk__in=opciones["producto"])
+        escritor = csv.writer(self.stdout)
+        escritor.writerow(["id", "nombre", "stock_historico", "existencias_actuales"])
+        for producto in stock_en(momento, consulta).iterator():
+            escritor.writerow([producto.pk, producto.nombre, producto.stock_historico, producto.existencias])
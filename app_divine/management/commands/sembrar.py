@@ -0,0 +1,158 @@
+import random
+from datetime import date, datetime, timedelta, timezone as tz
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from app_divine.models import CorteInventario, LineaPedido, Pedido, Producto, Usuario
+from app_divine.views import COSTO_ENVIO, ETIQUETAS_TIPO, IMPUESTO_PORCENTAJE
+
+MARCAS = ["Garnier", "L'Oréal", "Maybelline", "NARS", "Nivea", "Dior", "Lancôme", "Revlon"]
+PRODUCTOS_BASE = {
+    "cabello": ["Shampoo", "Acondicionador", "Mascarilla capilar", "Aceite", "Sérum"],
+    "maquillaje": ["Labial", "Rímel", "Base", "Rubor", "Delineador"],
+    "cuidado": ["Crema hidratante", "Tónico", "Limpiador", "Protector solar", "Contorno de ojos"],
+    "perfumes": ["Eau de parfum", "Eau de toilette", "Body mist", "Colonia", "Extracto"],
+}
+NOMBRES = ["Ana", "Lucía", "María", "Sofía", "Valeria", "Camila", "Diego", "Luis"]
+APELLIDOS = ["García", "López", "Martínez", "Hernández", "Pérez", "Sánchez"]
+IMAGENES_POR_CATEGORIA = 6
+TAMANO_LOTE = 500
+CONTRASENA_SEMBRADO = "divine123"
+
+
+class Command(BaseCommand):
+    help = "Genera datos sintéticos deterministas para pruebas de carga."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=200)
+        parser.add_argument("--usuarios", type=int, default=50)
+        parser.add_argument("--pedidos", type=int, default=300)
+        parser.add_argument("--semilla", type=int, default=42)
+
+    def handle(self, *args, **opciones):
+        rng = random.Random(opciones["semilla"])
+        imagenes = self.generar_imagenes(rng)
+        with transaction.atomic():
+            productos = self.sembrar_productos(rng, opciones["productos"], imagenes)
+            usuarios = self.sembrar_usuarios(rng, opciones["usuarios"], opciones["semilla"])
+            pedidos = self.sembrar_pedidos(rng, opciones["pedidos"], usuarios, productos)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sembrados {len(productos)} productos, {len(usuarios)} usuarios "
+                f"y {pedidos} pedidos."
+            )
+        )
+
+    def generar_imagenes(self, rng):
+        imagenes = {}
+        for slug in ETIQUETAS_TIPO:
+            rutas = []
+            for numero in range(IMAGENES_POR_CATEGORIA):
+                color = (rng.randint(80, 255), rng.randint(80, 255), rng.randint(80, 255))
+                contenido = BytesIO()
+                Image.new("RGB", (400, 400), color).save(contenido, "JPEG", quality=70)
+                # El almacenamiento nombra por hash: una imagen ya guardada no se duplica.
+                ruta = default_storage.save(
+                    f"productos/sembrado/{slug}-{numero}.jpg", ContentFile(contenido.getvalue())
+                )
+                rutas.append(ruta)
+            imagenes[slug] = rutas
+        return imagenes
+
+    def sembrar_productos(self, rng, cantidad, imagenes):
+        productos = []
+        slugs = list(ETIQUETAS_TIPO)
+        for indice, slug in enumerate(slugs):
+            etiqueta = ETIQUETAS_TIPO[slug]
+            total = cantidad // len(slugs) + (1 if indice < cantidad % len(slugs) else 0)
+            for numero in range(total):
+                base = rng.choice(PRODUCTOS_BASE[slug])
+                marca = rng.choice(MARCAS)
+                productos.append(
+                    Producto(
+                        tipo=slug,
+                        nombre=f"{base} {marca} #{numero + 1}",
+                        descripcion=f"{base} de {marca} para la línea {etiqueta.lower()}. " * 3,
+                        precio=Decimal(rng.randint(5000, 250000)) / 100,
+                        stock=rng.randint(0, 150),
+                        categoria=base,
+                        foto=rng.choice(imagenes[slug]),
+                    )
+                )
+        productos = Producto.objects.bulk_create(productos, batch_size=TAMANO_LOTE)
+        CorteInventario.objects.bulk_create(
+            (CorteInventario(producto=producto, stock=producto.stock, hasta_movimiento=0) for producto in productos),
+            batch_size=TAMANO_LOTE,
+        )
+        return productos
+
+    def sembrar_usuarios(self, rng, cantidad, semilla):
+        contrasena = make_password(CONTRASENA_SEMBRADO, salt=f"sembrado{semilla}")
+        correos = [f"sembrado{semilla}-{numero}@divine.test" for numero in range(cantidad)]
+        Usuario.objects.bulk_create(
+            (
+                Usuario(
+                    nombre=rng.choice(NOMBRES),
+                    apellido=rng.choice(APELLIDOS),
+                    fecha_nacimiento=date(1970, 1, 1) + timedelta(days=rng.randint(0, 15000)),
+                    correo_electronico=correo,
+                    contrasena=contrasena,
+                    direccion=f"Calle {rng.randint(1, 300)} #{rng.randint(1, 999)}",
+                )
+                for correo in correos
+            ),
+            batch_size=TAMANO_LOTE,
+            ignore_conflicts=True,
+        )
+        return list(Usuario.objects.filter(correo_electronico__in=correos).order_by("id"))
+
+    def sembrar_pedidos(self, rng, cantidad, usuarios, productos):
+        if not usuarios or not productos:
+            return 0
+        inicio = datetime(2025, 1, 1, tzinfo=tz.utc)
+        pedidos = []
+        compras = []
+        for _ in range(cantidad):
+            usuario = rng.choice(usuarios)
+            subtotal = Decimal("0.00")
+            lineas = []
+            elegidos = []
+            for producto in rng.sample(productos, min(len(productos), rng.randint(1, 4))):
+                unidades = rng.randint(1, 3)
+                total_linea = producto.precio * unidades
+                subtotal += total_linea
+                lineas.append(f"{producto.nombre} x{unidades} - ${total_linea}")
+                elegidos.append((producto, unidades))
+            compras.append(elegidos)
+            impuestos = subtotal * IMPUESTO_PORCENTAJE
+            lineas.append(f"Impuestos: ${impuestos}")
+            lineas.append(f"Envío: ${COSTO_ENVIO}")
+            lineas.append(f"Total: ${subtotal + impuestos + COSTO_ENVIO}")
+            pedidos.append(
+                Pedido(
+                    id_usuario=usuario,
+                    subtotal=subtotal,
+                    formapago=rng.choice(["tarjeta", "paypal"]),
+                    envio=COSTO_ENVIO,
+                    domicilio=usuario.direccion,
+                    detalle="\n".join(lineas),
+                    fecha_creacion=inicio + timedelta(minutes=rng.randint(0, 525600)),
+                )
+            )
+        Pedido.objects.bulk_create(pedidos, batch_size=TAMANO_LOTE)
+        LineaPedido.objects.bulk_create(
+            (
+                LineaPedido(pedido=pedido, producto=producto, cantidad=unidades, precio=producto.precio)
+                for pedido, elegidos in zip(pedidos, compras)
+                for producto, unidades in elegidos
+            ),
+            batch_size=TAMANO_LOTE,
+        )
+        return len(pedidos)
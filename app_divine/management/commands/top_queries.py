@@ -0,0 +1,55 @@
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Agrupa el registro de consultas lentas por huella y muestra los totales."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--archivo", default=settings.CONSULTAS_LENTAS_ARCHIVO)
+        parser.add_argument("--limite", type=int, default=20)
+        parser.add_argument("--orden", choices=["total", "llamadas", "maximo"], default="total")
+
+    def handle(self, *args, **opciones):
+        principal = Path(opciones["archivo"])
+        archivos = sorted(principal.parent.glob(principal.name + "*"))
+        if not archivos:
+            raise CommandError(f"No existe el registro {principal}.")
+        grupos = {}
+        for archivo in archivos:
+            with archivo.open(encoding="utf-8") as lineas:
+                for linea in lineas:
+                    try:
+                        entrada = json.loads(linea)
+                    except ValueError:
+                        continue
+                    grupo = grupos.setdefault(
+                        entrada["huella"],
+                        {
+                            "sql": entrada["sql"],
+                            "llamadas": 0,
+                            "total": 0.0,
+                            "maximo": 0.0,
+                            "origenes": Counter(),
+                        },
+                    )
+                    grupo["llamadas"] += 1
+                    grupo["total"] += entrada["duracion_ms"]
+                    grupo["maximo"] = max(grupo["maximo"], entrada["duracion_ms"])
+                    grupo["origenes"][f"{entrada['vista']} @ {entrada['origen']}"] += 1
+
+        ordenados = sorted(grupos.items(), key=lambda par: par[1][opciones["orden"]], reverse=True)
+        self.stdout.write(f"{'huella':<16}  {'llamadas':>8}  {'total ms':>10}  {'prom ms':>8}  {'máx ms':>8}")
+        for clave, grupo in ordenados[: opciones["limite"]]:
+            promedio = grupo["total"] / grupo["llamadas"]
+            self.stdout.write(
+                f"{clave:<16}  {grupo['llamadas']:>8}  {grupo['total']:>10.1f}  "
+                f"{promedio:>8.1f}  {grupo['maximo']:>8.1f}"
+            )
+            self.stdout.write(f"    {grupo['sql'][:160]}")
+            origen, veces = grupo["origenes"].most_common(1)[0]
+            self.stdout.write(f"    {origen} ({veces}x)")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app_divine.calentamiento import calentar
+
+
+class Command(BaseCommand):
+    help = "Compila plantillas, resuelve todas las rutas y abre las conexiones a la base de datos."
+
+    def handle(self, *args, **opciones):
+        for etapa, (cantidad, duracion) in calentar().items():
+            self.stdout.write(f"{etapa}: {cantidad} en {duracion * 1000:.1f} ms")
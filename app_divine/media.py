@@ -0,0 +1,124 @@
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+NOMBRE_CON_HASH = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "public, max-age=3600"
+TAMANO_BLOQUE = 64 * 1024
+
+
+class AlmacenamientoConHash(FileSystemStorage):
+    # Guarda "foto.jpg" como "foto.<hash>.jpg": el nombre cambia si cambia el
+    # contenido, así la URL puede cachearse para siempre.
+    def _save(self, name, content):
+        resumen = hashlib.sha256()
+        for bloque in content.chunks():
+            resumen.update(bloque)
+        raiz, extension = os.path.splitext(name)
+        name = f"{raiz}.{resumen.hexdigest()[:12]}{extension}"
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def es_inmutable(nombre):
+    return bool(NOMBRE_CON_HASH.search(nombre))
+
+
+def etiqueta(estado):
+    return f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+
+
+def cabeceras_cache(respuesta, nombre, estado):
+    respuesta["Cache-Control"] = CACHE_INMUTABLE if es_inmutable(nombre) else CACHE_REVALIDAR
+    respuesta["ETag"] = etiqueta(estado)
+    respuesta["Last-Modified"] = http_date(estado.st_mtime)
+    respuesta["Accept-Ranges"] = "bytes"
+    return respuesta
+
+
+def rango_solicitado(request, tamano):
+    coincidencia = RANGO.match(request.headers.get("Range", ""))
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if inicio:
+        inicio = int(inicio)
+        fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    elif fin:
+        inicio, fin = max(tamano - int(fin), 0), tamano - 1
+    else:
+        return None
+    if inicio > fin or inicio >= tamano:
+        return False
+    return inicio, fin
+
+
+def leer_rango(archivo, inicio, longitud):
+    with archivo:
+        archivo.seek(inicio)
+        while longitud > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+            yield bloque
+
+
+def servir(request, ruta):
+    try:
+        absoluta = Path(safe_join(settings.MEDIA_ROOT, ruta))
+        estado = absoluta.stat()
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404
+    if not absoluta.is_file():
+        raise Http404
+    tipo = mimetypes.guess_type(absoluta.name)[0] or "application/octet-stream"
+
+    # El servidor frontal resuelve Range, ETag y envío con sendfile; el
+    # worker solo autoriza y nombra el archivo.
+    if settings.MEDIA_SERVIDOR == "nginx":
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta["X-Accel-Redirect"] = settings.MEDIA_URL_INTERNA + quote(ruta)
+        return cabeceras_cache(respuesta, ruta, estado)
+    if settings.MEDIA_SERVIDOR == "apache":
+        respuesta = HttpResponse(content_type=tipo)
+        respuesta["X-Sendfile"] = str(absoluta)
+        return cabeceras_cache(respuesta, ruta, estado)
+
+    condicional = get_conditional_response(
+        request, etag=etiqueta(estado), last_modified=int(estado.st_mtime)
+    )
+    if condicional is not None:
+        return cabeceras_cache(condicional, ruta, estado)
+
+    rango = rango_solicitado(request, estado.st_size)
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta["Content-Range"] = f"bytes */{estado.st_size}"
+        return respuesta
+    if rango:
+        inicio, fin = rango
+        respuesta = StreamingHttpResponse(
+            leer_rango(absoluta.open("rb"), inicio, fin - inicio + 1), status=206, content_type=tipo
+        )
+        respuesta["Content-Length"] = str(fin - inicio + 1)
+        respuesta["Content-Range"] = f"bytes {inicio}-{fin}/{estado.st_size}"
+        return cabeceras_cache(respuesta, ruta, estado)
+
+    # FileResponse expone el archivo a wsgi.file_wrapper (sendfile en gunicorn).
+    respuesta = FileResponse(absoluta.open("rb"), content_type=tipo)
+    return cabeceras_cache(respuesta, ruta, estado)
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from uuid import uuid4
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CAMPOS_SUMA = ("latencia", "consultas", "tiempo_bd", "tiempo_plantillas", "bytes")
+
+_medicion_actual = ContextVar("medicion_actual", default=None)
+_registros = {}
+_candado = threading.Lock()
+_ultimo_volcado = 0.0
+_proceso = None
+
+
+class Medicion:
+    __slots__ = ("consultas", "tiempo_bd", "tiempo_plantillas", "profundidad")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        self.tiempo_plantillas = 0.0
+        self.profundidad = 0
+
+
+def envolver_consulta(execute, sql, params, many, context):
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.tiempo_bd += time.perf_counter() - inicio
+        medicion.consultas += 1
+
+
+def envolver_conexion(sender, connection, **kwargs):
+    # Se instala en cada conexión nueva (no con connection.execute_wrapper() por
+    # solicitud) para que también cuente las consultas que el ORM asíncrono
+    # ejecuta en hilos de sync_to_async.
+    if envolver_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(envolver_consulta)
+
+
+def iniciar_medicion():
+    medicion = Medicion()
+    return medicion, _medicion_actual.set(medicion)
+
+
+def terminar_medicion(token):
+    _medicion_actual.reset(token)
+
+
+def instalar():
+    from django.template.backends.django import Template
+
+    connection_created.connect(envolver_conexion, dispatch_uid="metricas_envolver_conexion")
+    if getattr(Template.render, "medido", False):
+        return
+    render_original = Template.render
+
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        if medicion is None or medicion.profundidad:
+            return render_original(self, context, request)
+        medicion.profundidad += 1
+        inicio = time.perf_counter()
+        try:
+            return render_original(self, context, request)
+        finally:
+            medicion.tiempo_plantillas += time.perf_counter() - inicio
+            medicion.profundidad -= 1
+
+    render.medido = True
+    Template.render = render
+
+
+def registro_vacio():
+    return {
+        "solicitudes": 0,
+        "cubetas": [0] * (len(LIMITES_LATENCIA) + 1),
+        **{campo: 0 for campo in CAMPOS_SUMA},
+    }
+
+
+def registrar(vista, latencia, medicion, tamano):
+    cubeta = len(LIMITES_LATENCIA)
+    for indice, limite in enumerate(LIMITES_LATENCIA):
+        if latencia <= limite:
+            cubeta = indice
+            break
+    with _candado:
+        registro = _registros.get(vista)
+        if registro is None:
+            registro = _registros[vista] = registro_vacio()
+        registro["solicitudes"] += 1
+        registro["cubetas"][cubeta] += 1
+        registro["latencia"] += latencia
+        registro["consultas"] += medicion.consultas
+        registro["tiempo_bd"] += medicion.tiempo_bd
+        registro["tiempo_plantillas"] += medicion.tiempo_plantillas
+        registro["bytes"] += tamano
+    volcar_si_toca()
+
+
+def directorio_metricas():
+    directorio = getattr(settings, "METRICAS_DIR", None)
+    return Path(directorio) if directorio else None
+
+
+def nombre_proceso():
+    # pid y una marca al azar: un pid reciclado no pisa el volcado de otro
+    # proceso, y un hijo de fork genera la suya.
+    global _proceso
+    pid = os.getpid()
+    if _proceso is None or _proceso[0] != pid:
+        _proceso = (pid, f"{pid}-{uuid4().hex[:12]}")
+    return _proceso[1]
+
+
+def proceso_vivo(archivo):
+    pid = archivo.stem.split("-", 1)[0]
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def vencido(archivo):
+    try:
+        return time.time() - archivo.stat().st_mtime > settings.METRICAS_VENCE
+    except FileNotFoundError:
+        return True
+
+
+def volcar_si_toca(forzar=False):
+    global _ultimo_volcado
+    directorio = directorio_metricas()
+    ahora = time.monotonic()
+    if directorio is None or (not forzar and ahora - _ultimo_volcado < settings.METRICAS_INTERVALO):
+        return
+    _ultimo_volcado = ahora
+    with _candado:
+        contenido = json.dumps(_registros)
+    directorio.mkdir(parents=True, exist_ok=True)
+    nombre = nombre_proceso()
+    temporal = directorio / f".{nombre}.tmp"
+    temporal.write_text(contenido)
+    temporal.replace(directorio / f"{nombre}.json")
+
+
+def sumar(destino, origen):
+    for vista, registro in origen.items():
+        acumulado = destino.setdefault(vista, registro_vacio())
+        acumulado["solicitudes"] += registro["solicitudes"]
+        acumulado["cubetas"] = [a + b for a, b in zip(acumulado["cubetas"], registro["cubetas"])]
+        for campo in CAMPOS_SUMA:
+            acumulado[campo] += registro[campo]
+
+
+def agregado():
+    total = {}
+    directorio = directorio_metricas()
+    if directorio is not None and directorio.is_dir():
+        propio = f"{nombre_proceso()}.json"
+        for archivo in directorio.glob("*.json"):
+            if archivo.name == propio:
+                continue
+            if not proceso_vivo(archivo) or vencido(archivo):
+                archivo.unlink(missing_ok=True)
+                continue
+            try:
+                sumar(total, json.loads(archivo.read_text()))
+            except (OSError, ValueError):
+                continue
+    with _candado:
+        sumar(total, _registros)
+    return total
+
+
+def reiniciar():
+    with _candado:
+        _registros.clear()
+
+
+def percentil(valores, porcentaje):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicion = (len(ordenados) - 1) * porcentaje / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def formato_prometheus(registros):
+    lineas = []
+
+    def serie(nombre, tipo, ayuda, campo):
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for vista, registro in sorted(registros.items()):
+            lineas.append(f'{nombre}{{vista="{vista}"}} {registro[campo]}')
+
+    serie("divine_solicitudes_total", "counter", "Solicitudes atendidas por vista.", "solicitudes")
+    lineas.append("# HELP divine_latencia_segundos Latencia de la solicitud por vista.")
+    lineas.append("# TYPE divine_latencia_segundos histogram")
+    for vista, registro in sorted(registros.items()):
+        acumulado = 0
+        for limite, cantidad in zip((*LIMITES_LATENCIA, "+Inf"), registro["cubetas"]):
+            acumulado += cantidad
+            lineas.append(f'divine_latencia_segundos_bucket{{vista="{vista}",le="{limite}"}} {acumulado}')
+        lineas.append(f'divine_latencia_segundos_sum{{vista="{vista}"}} {registro["latencia"]}')
+        lineas.append(f'divine_latencia_segundos_count{{vista="{vista}"}} {registro["solicitudes"]}')
+    serie("divine_consultas_bd_total", "counter", "Consultas SQL ejecutadas por vista.", "consultas")
+    serie("divine_tiempo_bd_segundos_total", "counter", "Tiempo en la base de datos por vista.", "tiempo_bd")
+    serie(
+        "divine_tiempo_plantillas_segundos_total",
+        "counter",
+        "Tiempo de render de plantillas por vista.",
+        "tiempo_plantillas",
+    )
+    serie("divine_respuesta_bytes_total", "counter", "Bytes de respuesta por vista.", "bytes")
+    return "\n".join(lineas) + "\n"
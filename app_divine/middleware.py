@@ -0,0 +1,226 @@
+import asyncio
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+
+from . import (
+    cache_catalogo,
+    cache_paginas,
+    compresion,
+    consultas_lentas,
+    limites,
+    metricas,
+    perfilador,
+    routers,
+)
+
+
+class MiddlewareBase:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class MiddlewareMetricas(MiddlewareBase):
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion, token = metricas.iniciar_medicion()
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            metricas.terminar_medicion(token)
+        self.registrar(request, respuesta, medicion, inicio)
+        return respuesta
+
+    async def __acall__(self, request):
+        medicion, token = metricas.iniciar_medicion()
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            metricas.terminar_medicion(token)
+        self.registrar(request, respuesta, medicion, inicio)
+        return respuesta
+
+    def registrar(self, request, respuesta, medicion, inicio):
+        latencia = time.perf_counter() - inicio
+        coincidencia = getattr(request, "resolver_match", None)
+        vista = coincidencia.view_name if coincidencia else "sin_ruta"
+        tamano = 0 if respuesta.streaming else len(respuesta.content)
+        metricas.registrar(vista, latencia, medicion, tamano)
+
+
+class MiddlewareConsultasLentas(MiddlewareBase):
+    def __init__(self, get_response):
+        if settings.CONSULTAS_LENTAS_UMBRAL_MS is None:
+            raise MiddlewareNotUsed
+        Path(settings.CONSULTAS_LENTAS_ARCHIVO).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.consulta_lenta, token = consultas_lentas.iniciar_solicitud()
+        try:
+            return self.get_response(request)
+        finally:
+            consultas_lentas.terminar_solicitud(token)
+
+    async def __acall__(self, request):
+        # La vista asíncrona corre en esta misma tarea (ver primer_marco_proyecto).
+        request.consulta_lenta, token = consultas_lentas.iniciar_solicitud(asyncio.current_task())
+        try:
+            return await self.get_response(request)
+        finally:
+            consultas_lentas.terminar_solicitud(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.consulta_lenta["vista"] = request.resolver_match.view_name
+
+
+class MiddlewareReplica(MiddlewareBase):
+    def __init__(self, get_response):
+        if not routers.replica_configurada():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        modificado = cache.get(cache_catalogo.CLAVE_MODIFICADO) is not None
+        solicitud, token = routers.iniciar_solicitud(request, modificado)
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            routers.terminar_solicitud(token)
+        return self.marcar(respuesta, solicitud)
+
+    async def __acall__(self, request):
+        modificado = await cache.aget(cache_catalogo.CLAVE_MODIFICADO) is not None
+        solicitud, token = routers.iniciar_solicitud(request, modificado)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            routers.terminar_solicitud(token)
+        return self.marcar(respuesta, solicitud)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.url_name in settings.REPLICA_VISTAS_PRIMARIA:
+            routers.fijar_primaria()
+
+    def marcar(self, respuesta, solicitud):
+        if solicitud["escribio"]:
+            ventana = settings.REPLICA_VENTANA_PRIMARIA
+            respuesta.set_cookie(
+                routers.COOKIE_PRIMARIA,
+                str(int(time.time() + ventana)),
+                max_age=ventana,
+                httponly=True,
+                samesite="Lax",
+            )
+        return respuesta
+
+
+class MiddlewareCompresion(MiddlewareBase):
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return compresion.aplicar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return compresion.aplicar(request, await self.get_response(request))
+
+
+class MiddlewareLimites(MiddlewareBase):
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in settings.LIMITES_METODOS:
+            return None
+        nombre = request.resolver_match.url_name
+        reglas = settings.LIMITES_RUTAS.get(nombre, getattr(view_func, "limites", None))
+        if not reglas:
+            return None
+        return limites.comprobar(request, nombre, reglas)
+
+
+class MiddlewarePerfilador(MiddlewareBase):
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if "_profile=" not in request.META.get("QUERY_STRING", ""):
+            return None
+        modo = request.GET.get("_profile")
+        if not modo or not perfilador.es_admin(request):
+            return None
+        respuesta, nombre = perfilador.perfilar(request, view_func, view_args, view_kwargs, modo)
+        respuesta["X-Perfil"] = reverse("descargar_perfil", args=[nombre])
+        return respuesta
+
+
+class MiddlewareCachePaginas(MiddlewareBase):
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        respuesta, pendiente = self.consultar(request)
+        if respuesta is not None:
+            return respuesta
+        if pendiente is None:
+            return self.get_response(request)
+        try:
+            inicio = time.perf_counter()
+            respuesta = self.get_response(request)
+            self.almacenar(request, respuesta, pendiente, inicio)
+            return respuesta
+        finally:
+            cache.delete(pendiente[2])
+
+    async def __acall__(self, request):
+        respuesta, pendiente = await sync_to_async(self.consultar)(request)
+        if respuesta is not None:
+            return respuesta
+        if pendiente is None:
+            return await self.get_response(request)
+        try:
+            inicio = time.perf_counter()
+            respuesta = await self.get_response(request)
+            await sync_to_async(self.almacenar)(request, respuesta, pendiente, inicio)
+            return respuesta
+        finally:
+            await cache.adelete(pendiente[2])
+
+    def consultar(self, request):
+        if not cache_paginas.es_cacheable(request):
+            return None, None
+        clave, clave_ultima = cache_paginas.claves(request)
+        entrada = cache.get(clave)
+        if entrada and not cache_paginas.debe_refrescar(entrada, time.time()):
+            return cache_paginas.respuesta_desde(entrada, "HIT"), None
+
+        candado = f"{clave}:candado"
+        if not cache.add(candado, 1, settings.CACHE_PAGINAS_CANDADO):
+            obsoleta = entrada or cache.get(clave_ultima)
+            if obsoleta:
+                return cache_paginas.respuesta_desde(obsoleta, "STALE"), None
+            return None, None
+        return None, (clave, clave_ultima, candado)
+
+    def almacenar(self, request, respuesta, pendiente, inicio):
+        clave, clave_ultima, _ = pendiente
+        if cache_paginas.es_guardable(request, respuesta):
+            costo = time.perf_counter() - inicio
+            cache_paginas.guardar(clave, clave_ultima, respuesta, costo)
+            respuesta["X-Cache"] = "MISS"
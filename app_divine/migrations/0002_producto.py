@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Producto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('precio', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('categoria', models.CharField(max_length=80)),
+                ('foto', models.ImageField(blank=True, null=True, upload_to='productos/')),
+                ('nombre', models.CharField(max_length=120)),
+                ('descripcion', models.TextField()),
+                ('tipo', models.CharField(choices=[('cabello', 'Cabello'), ('maquillaje', 'Maquillaje'), ('cuidado', 'Cuidado de la piel'), ('perfumes', 'Perfumes')], max_length=20)),
+            ],
+            options={
+                'db_table': 'productos',
+                'indexes': [models.Index(fields=['tipo', 'id'], name='productos_tipo_id')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RedireccionProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=20)),
+                ('id_anterior', models.PositiveIntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_divine.producto')),
+            ],
+            options={
+                'db_table': 'productos_redirecciones',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'id_anterior'), name='redireccion_tipo_id_anterior')],
+            },
+        ),
+    ]
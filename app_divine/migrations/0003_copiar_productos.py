@@ -0,0 +1,69 @@
+from django.db import migrations
+
+TAMANO_LOTE = 1000
+MODELOS_ANTERIORES = {
+    "cabello": "Cabello",
+    "maquillaje": "Maquillaje",
+    "cuidado": "CuidadoPiel",
+    "perfumes": "Perfume",
+}
+CAMPOS = ("stock", "precio", "categoria", "foto", "nombre", "descripcion")
+
+
+def copiar_productos(apps, schema_editor):
+    Producto = apps.get_model("app_divine", "Producto")
+    RedireccionProducto = apps.get_model("app_divine", "RedireccionProducto")
+    base = schema_editor.connection.alias
+    for tipo, nombre_modelo in MODELOS_ANTERIORES.items():
+        anterior = apps.get_model("app_divine", nombre_modelo)
+        ultimo_id = 0
+        while True:
+            lote = list(
+                anterior.objects.using(base).filter(id__gt=ultimo_id).order_by("id")[:TAMANO_LOTE]
+            )
+            if not lote:
+                break
+            nuevos = Producto.objects.using(base).bulk_create(
+                Producto(tipo=tipo, **{campo: getattr(fila, campo) for campo in CAMPOS})
+                for fila in lote
+            )
+            RedireccionProducto.objects.using(base).bulk_create(
+                RedireccionProducto(tipo=tipo, id_anterior=fila.id, producto_id=nuevo.id)
+                for fila, nuevo in zip(lote, nuevos)
+            )
+            ultimo_id = lote[-1].id
+
+
+def restaurar_productos(apps, schema_editor):
+    Producto = apps.get_model("app_divine", "Producto")
+    RedireccionProducto = apps.get_model("app_divine", "RedireccionProducto")
+    base = schema_editor.connection.alias
+    anteriores = dict(
+        RedireccionProducto.objects.using(base).values_list("producto_id", "id_anterior")
+    )
+    for tipo, nombre_modelo in MODELOS_ANTERIORES.items():
+        anterior = apps.get_model("app_divine", nombre_modelo)
+        ultimo_id = 0
+        while True:
+            lote = list(
+                Producto.objects.using(base).filter(tipo=tipo, id__gt=ultimo_id).order_by("id")[:TAMANO_LOTE]
+            )
+            if not lote:
+                break
+            anterior.objects.using(base).bulk_create(
+                anterior(id=anteriores.get(fila.id), **{campo: getattr(fila, campo) for campo in CAMPOS})
+                for fila in lote
+            )
+            ultimo_id = lote[-1].id
+    Producto.objects.using(base).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0002_producto'),
+    ]
+
+    operations = [
+        migrations.RunPython(copiar_productos, restaurar_productos),
+    ]
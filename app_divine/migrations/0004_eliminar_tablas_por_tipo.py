@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0003_copiar_productos'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Cabello',
+        ),
+        migrations.DeleteModel(
+            name='CuidadoPiel',
+        ),
+        migrations.DeleteModel(
+            name='Maquillaje',
+        ),
+        migrations.DeleteModel(
+            name='Perfume',
+        ),
+        migrations.CreateModel(
+            name='Cabello',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('app_divine.producto',),
+        ),
+        migrations.CreateModel(
+            name='CuidadoPiel',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('app_divine.producto',),
+        ),
+        migrations.CreateModel(
+            name='Maquillaje',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('app_divine.producto',),
+        ),
+        migrations.CreateModel(
+            name='Perfume',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('app_divine.producto',),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0004_eliminar_tablas_por_tipo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuntoControl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=40, unique=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'puntos_control',
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='app_divine.pedido')),
+                ('producto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_divine.producto')),
+            ],
+            options={
+                'db_table': 'pedidos_lineas',
+            },
+        ),
+        migrations.CreateModel(
+            name='Coocurrencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('veces', models.PositiveIntegerField()),
+                ('producto_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_divine.producto')),
+                ('producto_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_divine.producto')),
+            ],
+            options={
+                'db_table': 'productos_coocurrencias',
+                'constraints': [models.UniqueConstraint(fields=('producto_a', 'producto_b'), name='coocurrencia_par')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Recomendacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('puntuacion', models.FloatField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_divine.producto')),
+                ('recomendado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_divine.producto')),
+            ],
+            options={
+                'db_table': 'productos_recomendaciones',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'posicion'), name='recomendacion_posicion')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+
+TAMANO_LOTE = 1000
+LINEA = re.compile(r"^(?P<nombre>.+) x(?P<cantidad>\d+) - \$(?P<total>[\d.]+)$")
+
+
+def reconstruir_lineas(apps, schema_editor):
+    # Los pedidos anteriores solo guardaban el texto de `detalle`; se
+    # recuperan sus líneas cuando el nombre identifica a un único producto.
+    Pedido = apps.get_model("app_divine", "Pedido")
+    Producto = apps.get_model("app_divine", "Producto")
+    LineaPedido = apps.get_model("app_divine", "LineaPedido")
+    base = schema_editor.connection.alias
+    por_nombre = {}
+    for pk, nombre in Producto.objects.using(base).values_list("id", "nombre"):
+        por_nombre[nombre] = None if nombre in por_nombre else pk
+    ultimo_id = 0
+    while True:
+        lote = list(
+            Pedido.objects.using(base)
+            .filter(id__gt=ultimo_id)
+            .order_by("id")
+            .values_list("id", "detalle")[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        lineas = []
+        for pedido_id, detalle in lote:
+            for texto in detalle.splitlines():
+                coincidencia = LINEA.match(texto.strip())
+                if not coincidencia or not por_nombre.get(coincidencia["nombre"]):
+                    continue
+                cantidad = int(coincidencia["cantidad"])
+                try:
+                    precio = Decimal(coincidencia["total"]) / max(cantidad, 1)
+                except InvalidOperation:
+                    continue
+                lineas.append(
+                    LineaPedido(
+                        pedido_id=pedido_id,
+                        producto_id=por_nombre[coincidencia["nombre"]],
+                        cantidad=cantidad,
+                        precio=precio.quantize(Decimal("0.01")),
+                    )
+                )
+        LineaPedido.objects.using(base).bulk_create(lineas)
+        ultimo_id = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0005_lineas_pedido_y_recomendaciones'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconstruir_lineas, migrations.RunPython.noop),
+    ]
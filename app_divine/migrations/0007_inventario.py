@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0006_reconstruir_lineas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='inventario_hasta',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CorteInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField()),
+                ('hasta_movimiento', models.BigIntegerField()),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_divine.producto')),
+            ],
+            options={
+                'db_table': 'inventario_cortes',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='cortes_producto_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField()),
+                ('motivo', models.CharField(choices=[('entrada', 'Entrada'), ('venta', 'Venta'), ('ajuste', 'Ajuste'), ('importacion', 'Importación')], max_length=20)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_divine.pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_divine.producto')),
+            ],
+            options={
+                'db_table': 'inventario_movimientos',
+                'indexes': [models.Index(fields=['producto', 'id'], name='movimientos_producto_id')],
+            },
+        ),
+    ]
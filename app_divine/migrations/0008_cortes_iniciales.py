@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.utils import timezone
+
+TAMANO_LOTE = 1000
+
+
+def crear_cortes(apps, schema_editor):
+    # El stock actual es el punto de partida del libro: sin este corte, el
+    # reporte histórico no tendría de dónde reconstruir.
+    Producto = apps.get_model("app_divine", "Producto")
+    CorteInventario = apps.get_model("app_divine", "CorteInventario")
+    base = schema_editor.connection.alias
+    ahora = timezone.now()
+    ultimo_id = 0
+    while True:
+        lote = list(
+            Producto.objects.using(base)
+            .filter(id__gt=ultimo_id)
+            .order_by("id")
+            .values_list("id", "stock")[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        CorteInventario.objects.using(base).bulk_create(
+            CorteInventario(producto_id=pk, stock=stock, hasta_movimiento=0, fecha=ahora)
+            for pk, stock in lote
+        )
+        ultimo_id = lote[-1][0]
+
+
+def borrar_cortes(apps, schema_editor):
+    apps.get_model("app_divine", "CorteInventario").objects.using(schema_editor.connection.alias).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0007_inventario'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_cortes, borrar_cortes),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0008_cortes_iniciales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaginaPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.BigIntegerField()),
+                ('tipo', models.CharField(max_length=20)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'prerender_pendientes',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0009_prerender_pendientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['actualizado', 'id'], name='productos_actualizado_id'),
+        ),
+        migrations.CreateModel(
+            name='ProductoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.BigIntegerField(unique=True)),
+                ('tipo', models.CharField(max_length=20)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'productos_eliminados',
+                'indexes': [models.Index(fields=['actualizado', 'producto_id'], name='eliminados_actualizado_id')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0010_sincronizacion_catalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarritoAbandonado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('productos', models.JSONField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unidades', models.PositiveIntegerField()),
+                ('vencio', models.DateTimeField()),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_divine.usuario')),
+            ],
+            options={
+                'db_table': 'carritos_abandonados',
+                'indexes': [models.Index(fields=['vencio'], name='carritos_abandonados_vencio')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0011_carritos_abandonados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='clave',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+    ]
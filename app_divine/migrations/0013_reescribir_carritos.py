@@ -0,0 +1,70 @@
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations
+
+TAMANO_LOTE = 500
+
+
+def reescribir_carrito(carrito, redirecciones):
+    # Antes de 0003 cada línea era "{tipo}-{pk}" con el pk de la tabla de su
+    # tipo; ahora la clave es el id en productos. Las líneas sin redirección
+    # se descartan: su id ya apunta a otro producto.
+    nuevo = {}
+    for clave, item in carrito.items():
+        if clave != f"{item.get('tipo')}-{item.get('producto_id')}":
+            nuevo[clave] = dict(item)
+            continue
+        producto_id = redirecciones.get((item.get("tipo"), item.get("producto_id")))
+        if producto_id is None:
+            continue
+        if str(producto_id) in nuevo:
+            nuevo[str(producto_id)]["cantidad"] += item["cantidad"]
+        else:
+            nuevo[str(producto_id)] = dict(item, producto_id=producto_id)
+    return nuevo
+
+
+def reescribir_carritos(apps, schema_editor):
+    Session = apps.get_model("sessions", "Session")
+    RedireccionProducto = apps.get_model("app_divine", "RedireccionProducto")
+    base = schema_editor.connection.alias
+    redirecciones = {
+        (tipo, id_anterior): producto_id
+        for tipo, id_anterior, producto_id in RedireccionProducto.objects.using(base).values_list(
+            "tipo", "id_anterior", "producto_id"
+        )
+    }
+    if not redirecciones:
+        return
+    almacen = SessionStore()
+    ultima = ""
+    while True:
+        lote = list(
+            Session.objects.using(base).filter(session_key__gt=ultima).order_by("session_key")[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        cambiadas = []
+        for sesion in lote:
+            datos = almacen.decode(sesion.session_data)
+            carrito = datos.get("carrito")
+            if not carrito:
+                continue
+            nuevo = reescribir_carrito(carrito, redirecciones)
+            if nuevo != carrito:
+                datos["carrito"] = nuevo
+                sesion.session_data = almacen.encode(datos)
+                cambiadas.append(sesion)
+        Session.objects.using(base).bulk_update(cambiadas, ["session_data"])
+        ultima = lote[-1].session_key
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0012_clave_pedido'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(reescribir_carritos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def marcar_procesados(apps, schema_editor):
+    # Hasta ahora todo lo que estaba bajo ultimo_id se dio por contado: la
+    # ventana arranca con esos pedidos para no sumarlos dos veces.
+    PuntoControl = apps.get_model("app_divine", "PuntoControl")
+    LineaPedido = apps.get_model("app_divine", "LineaPedido")
+    base = schema_editor.connection.alias
+    for punto in PuntoControl.objects.using(base).filter(nombre="recomendaciones", ultimo_id__gt=0):
+        punto.procesados = sorted(
+            LineaPedido.objects.using(base)
+            .filter(
+                pedido_id__gt=punto.ultimo_id - settings.PEDIDOS_VENTANA_TARDIOS,
+                pedido_id__lte=punto.ultimo_id,
+                producto__isnull=False,
+            )
+            .values_list("pedido_id", flat=True)
+            .distinct()
+        )
+        punto.save(update_fields=["procesados"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_divine', '0013_reescribir_carritos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='puntocontrol',
+            name='procesados',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(marcar_procesados, migrations.RunPython.noop),
+    ]
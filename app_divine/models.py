@@ -10,41 +10,107 @@ class ProductoBase(models.Model):
     foto = models.ImageField(upload_to='productos/', blank=True, null=True)
     nombre = models.CharField(max_length=120)
     descripcion = models.TextField()
+    actualizado = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
 
 
-class Cabello(ProductoBase):
+class Producto(ProductoBase):
+    TIPOS = [
+        ("cabello", "Cabello"),
+        ("maquillaje", "Maquillaje"),
+        ("cuidado", "Cuidado de la piel"),
+        ("perfumes", "Perfumes"),
+    ]
+    TIPO = None
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    # Último movimiento de inventario ya sumado en `stock`.
+    inventario_hasta = models.BigIntegerField(default=0)
+
     class Meta:
-        db_table = "cabello"
+        db_table = "productos"
+        indexes = [
+            models.Index(fields=["tipo", "id"], name="productos_tipo_id"),
+            models.Index(fields=["actualizado", "id"], name="productos_actualizado_id"),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.TIPO and not self.tipo:
+            self.tipo = self.TIPO
 
     def __str__(self):
         return self.nombre
 
 
-class Maquillaje(ProductoBase):
+class ProductosDelTipo(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(tipo=self.model.TIPO)
+
+
+class Cabello(Producto):
+    TIPO = "cabello"
+
+    objects = ProductosDelTipo()
+
     class Meta:
-        db_table = "maquillaje"
+        proxy = True
 
-    def __str__(self):
-        return self.nombre
 
+class Maquillaje(Producto):
+    TIPO = "maquillaje"
+
+    objects = ProductosDelTipo()
 
-class CuidadoPiel(ProductoBase):
     class Meta:
-        db_table = "cuidado_de_la_piel"
+        proxy = True
 
-    def __str__(self):
-        return self.nombre
 
+class CuidadoPiel(Producto):
+    TIPO = "cuidado"
+
+    objects = ProductosDelTipo()
 
-class Perfume(ProductoBase):
     class Meta:
-        db_table = "perfumes"
+        proxy = True
 
-    def __str__(self):
-        return self.nombre
+
+class Perfume(Producto):
+    TIPO = "perfumes"
+
+    objects = ProductosDelTipo()
+
+    class Meta:
+        proxy = True
+
+
+class ProductoEliminado(models.Model):
+    # Lápida de un producto borrado para que /api/catalogo/cambios avise a
+    # los clientes que sincronizan por cursor.
+    producto_id = models.BigIntegerField(unique=True)
+    tipo = models.CharField(max_length=20)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "productos_eliminados"
+        indexes = [
+            models.Index(fields=["actualizado", "producto_id"], name="eliminados_actualizado_id")
+        ]
+
+
+class RedireccionProducto(models.Model):
+    # Enlaces viejos /producto/<tipo>/<pk>/ de cuando cada tipo tenía su tabla.
+    tipo = models.CharField(max_length=20)
+    id_anterior = models.PositiveIntegerField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        db_table = "productos_redirecciones"
+        constraints = [
+            models.UniqueConstraint(fields=["tipo", "id_anterior"], name="redireccion_tipo_id_anterior")
+        ]
 
 
 class Usuario(models.Model):
@@ -73,9 +139,118 @@ class Pedido(models.Model):
     domicilio = models.TextField()
     detalle = models.TextField()
     fecha_creacion = models.DateTimeField(default=timezone.now)
+    # Viene oculta en el formulario de pago: un doble envío no crea otro pedido.
+    clave = models.CharField(max_length=32, unique=True, null=True, blank=True)
 
     class Meta:
         db_table = "pedidos"
 
     def __str__(self):
-        return f"Pedido #{self.pk} - {self.id_usuario}"
\ No newline at end of file
+        return f"Pedido #{self.pk} - {self.id_usuario}"
+
+
+class CarritoAbandonado(models.Model):
+    # Carrito de una sesión vencida (manage.py purgar_sesiones). `productos`
+    # es [[producto_id, cantidad, precio], ...].
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    productos = models.JSONField()
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    unidades = models.PositiveIntegerField()
+    vencio = models.DateTimeField()
+    creado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "carritos_abandonados"
+        indexes = [models.Index(fields=["vencio"], name="carritos_abandonados_vencio")]
+
+
+class LineaPedido(models.Model):
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name="lineas")
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, related_name="+")
+    cantidad = models.PositiveIntegerField()
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        db_table = "pedidos_lineas"
+
+
+class Coocurrencia(models.Model):
+    # Matriz dispersa producto x producto: cuántos pedidos contienen ambos.
+    # La diagonal (a == b) guarda cuántos pedidos contienen el producto.
+    producto_a = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    producto_b = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    veces = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "productos_coocurrencias"
+        constraints = [
+            models.UniqueConstraint(fields=["producto_a", "producto_b"], name="coocurrencia_par")
+        ]
+
+
+class Recomendacion(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    recomendado = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    posicion = models.PositiveSmallIntegerField()
+    puntuacion = models.FloatField()
+
+    class Meta:
+        db_table = "productos_recomendaciones"
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "posicion"], name="recomendacion_posicion")
+        ]
+
+
+class PuntoControl(models.Model):
+    # Hasta qué id procesó cada tarea incremental; `procesados` son los ids ya
+    # vistos dentro de la ventana de pedidos tardíos bajo ultimo_id.
+    nombre = models.CharField(max_length=40, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    procesados = models.JSONField(default=list)
+
+    class Meta:
+        db_table = "puntos_control"
+
+
+class MovimientoInventario(models.Model):
+    # Libro de inventario de solo inserción: el stock disponible es
+    # Producto.stock más los movimientos posteriores a inventario_hasta.
+    MOTIVOS = [
+        ("entrada", "Entrada"),
+        ("venta", "Venta"),
+        ("ajuste", "Ajuste"),
+        ("importacion", "Importación"),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    cantidad = models.IntegerField()
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    pedido = models.ForeignKey(Pedido, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    creado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "inventario_movimientos"
+        indexes = [models.Index(fields=["producto", "id"], name="movimientos_producto_id")]
+
+
+class CorteInventario(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    stock = models.PositiveIntegerField()
+    hasta_movimiento = models.BigIntegerField()
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "inventario_cortes"
+        indexes = [models.Index(fields=["producto", "fecha"], name="cortes_producto_fecha")]
+
+
+class PaginaPendiente(models.Model):
+    # Productos guardados o borrados cuyas páginas pre-renderizadas hay que
+    # regenerar (manage.py prerender --pendientes). El tipo se guarda porque
+    # el producto puede ya no existir.
+    producto_id = models.BigIntegerField()
+    tipo = models.CharField(max_length=20)
+    creado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "prerender_pendientes"
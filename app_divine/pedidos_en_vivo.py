@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db.models import Max
+from django.urls import reverse
+from django.utils import dateformat, timezone
+
+from .models import Pedido
+
+LIMITE_PENDIENTES = 100
+
+_candado = threading.Lock()
+_suscriptores = set()
+_sondeo = None
+
+
+def resumir(pedido):
+    usuario = pedido.id_usuario
+    return {
+        "id": pedido.pk,
+        "usuario": f"{usuario.nombre} {usuario.apellido}",
+        "url_usuario": reverse("admin_usuario_detalle", args=[usuario.pk]),
+        "subtotal": str(pedido.subtotal),
+        "formapago": pedido.formapago.title(),
+        "envio": str(pedido.envio),
+        "fecha": dateformat.format(timezone.localtime(pedido.fecha_creacion), "d/m/Y H:i"),
+    }
+
+
+def publicar(resumen):
+    # Se llama desde hilos de vistas síncronas: cada cola se alimenta dentro
+    # del bucle de eventos que la atiende.
+    with _candado:
+        destinos = list(_suscriptores)
+    for bucle, cola in destinos:
+        if not bucle.is_closed():
+            bucle.call_soon_threadsafe(cola.put_nowait, resumen)
+
+
+def publicar_pedido(pedido):
+    publicar(resumir(pedido))
+
+
+async def ultimo_pedido():
+    return (await Pedido.objects.aaggregate(ultimo=Max("id")))["ultimo"] or 0
+
+
+class Vistos:
+    # Ids ya repartidos. Un pedido puede confirmarse con un id menor al
+    # último visto (PEDIDOS_VENTANA_TARDIOS), así que se guardan los de la
+    # ventana bajo `ultimo` en vez de solo el máximo.
+    def __init__(self, ultimo_id):
+        self.ultimo = ultimo_id
+        self.ids = {ultimo_id}
+
+    def piso(self):
+        return self.ultimo - settings.PEDIDOS_VENTANA_TARDIOS
+
+    def nuevo(self, pk):
+        return pk > self.piso() and pk not in self.ids
+
+    def agregar(self, pk):
+        self.ids.add(pk)
+        if pk > self.ultimo:
+            self.ultimo = pk
+            piso = self.piso()
+            self.ids = {visto for visto in self.ids if visto > piso}
+
+
+async def pedidos_desde(vistos):
+    consulta = (
+        Pedido.objects.filter(id__gt=vistos.piso())
+        .exclude(id__in=vistos.ids)
+        .select_related("id_usuario")
+        .order_by("id")
+    )[:LIMITE_PENDIENTES]
+    return [resumir(pedido) async for pedido in consulta]
+
+
+async def sondear(ultimo_id):
+    # Respaldo para despliegues con varios procesos: los pedidos creados en
+    # otro proceso no pasan por publicar(), así que un único sondeo por
+    # proceso los busca y los reparte a los suscriptores locales.
+    vistos = Vistos(ultimo_id)
+    while True:
+        await asyncio.sleep(settings.PEDIDOS_VIVO_SONDEO)
+        for resumen in await pedidos_desde(vistos):
+            vistos.agregar(resumen["id"])
+            publicar(resumen)
+
+
+def suscribir(bucle, cola, ultimo_id):
+    global _sondeo
+    with _candado:
+        _suscriptores.add((bucle, cola))
+        if _sondeo is None or _sondeo.done():
+            _sondeo = bucle.create_task(sondear(ultimo_id))
+
+
+def desuscribir(bucle, cola):
+    global _sondeo
+    with _candado:
+        _suscriptores.discard((bucle, cola))
+        if not _suscriptores and _sondeo is not None:
+            _sondeo.cancel()
+            _sondeo = None
+
+
+def evento(resumen, ultimo_id):
+    # El id del evento es el mayor enviado: al reconectar, Last-Event-ID no
+    # retrocede aunque el último pedido haya llegado tarde.
+    return f"id: {ultimo_id}\nevent: pedido\ndata: {json.dumps(resumen)}\n\n"
+
+
+async def eventos(ultimo_id):
+    bucle = asyncio.get_running_loop()
+    cola = asyncio.Queue()
+    suscribir(bucle, cola, ultimo_id)
+    # Al reanudar se vuelven a mandar los pedidos de la ventana: el panel
+    # descarta los que ya muestra.
+    vistos = Vistos(ultimo_id)
+    try:
+        yield f"retry: {settings.PEDIDOS_VIVO_REINTENTO}\n\n"
+        for resumen in await pedidos_desde(vistos):
+            vistos.agregar(resumen["id"])
+            yield evento(resumen, vistos.ultimo)
+        # La conexión se cierra sola cada cierto tiempo; EventSource reconecta
+        # con Last-Event-ID y así se reparten las conexiones entre procesos.
+        vence = bucle.time() + settings.PEDIDOS_VIVO_DURACION
+        while (restante := vence - bucle.time()) > 0:
+            try:
+                resumen = await asyncio.wait_for(
+                    cola.get(), min(settings.PEDIDOS_VIVO_LATIDO, restante)
+                )
+            except asyncio.TimeoutError:
+                yield ": latido\n\n"
+                continue
+            if vistos.nuevo(resumen["id"]):
+                vistos.agregar(resumen["id"])
+                yield evento(resumen, vistos.ultimo)
+    finally:
+        desuscribir(bucle, cola)
@@ -0,0 +1,113 @@
+import cProfile
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Usuario
+
+NOMBRE_VALIDO = re.compile(r"^[\w.-]+\.(pstats|txt)$")
+INTERVALO_MUESTREO = 0.001
+
+
+def es_admin(request):
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        return False
+    return Usuario.objects.filter(pk=usuario_id, es_admin=True).exists()
+
+
+def directorio_perfiles():
+    directorio = Path(settings.PERFILES_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def nombre_archivo(request, extension):
+    vista = request.resolver_match.url_name or "vista"
+    marca = timezone.now().strftime("%Y%m%d-%H%M%S-%f")
+    return f"{marca}-{vista}.{extension}"
+
+
+def pila_colapsada(marco):
+    pila = []
+    while marco is not None:
+        codigo = marco.f_code
+        pila.append(f"{Path(codigo.co_filename).name}:{codigo.co_name}")
+        marco = marco.f_back
+    return ";".join(reversed(pila))
+
+
+class Muestreador(threading.Thread):
+    def __init__(self, hilo_objetivo):
+        super().__init__(daemon=True)
+        self.hilo_objetivo = hilo_objetivo
+        self.pilas = Counter()
+        self.detener = threading.Event()
+
+    def run(self):
+        while not self.detener.is_set():
+            marco = sys._current_frames().get(self.hilo_objetivo)
+            if marco is not None:
+                self.pilas[pila_colapsada(marco)] += 1
+            time.sleep(INTERVALO_MUESTREO)
+
+
+def guardar_muestras(request, muestreador):
+    nombre = nombre_archivo(request, "txt")
+    lineas = (f"{pila} {cantidad}" for pila, cantidad in muestreador.pilas.most_common())
+    (directorio_perfiles() / nombre).write_text("\n".join(lineas) + "\n")
+    return nombre
+
+
+def guardar_perfil(request, perfil):
+    nombre = nombre_archivo(request, "pstats")
+    perfil.dump_stats(directorio_perfiles() / nombre)
+    return nombre
+
+
+async def perfilar_corrutina(request, view_func, view_args, view_kwargs, modo):
+    # Corre en el hilo del bucle de eventos, que es donde se ejecutan los
+    # marcos de la vista. Bajo ASGI el bucle es compartido: otras solicitudes
+    # que avancen mientras la vista espera también quedan en el perfil.
+    if modo == "muestreo":
+        muestreador = Muestreador(threading.get_ident())
+        muestreador.start()
+        try:
+            respuesta = await view_func(request, *view_args, **view_kwargs)
+        finally:
+            muestreador.detener.set()
+            muestreador.join()
+        return respuesta, guardar_muestras(request, muestreador)
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        respuesta = await view_func(request, *view_args, **view_kwargs)
+    finally:
+        perfil.disable()
+    return respuesta, guardar_perfil(request, perfil)
+
+
+def perfilar(request, view_func, view_args, view_kwargs, modo):
+    if iscoroutinefunction(view_func):
+        # async_to_sync ejecuta la corrutina en otro hilo; medir desde aquí
+        # solo vería a este hilo esperando el resultado.
+        return async_to_sync(perfilar_corrutina)(request, view_func, view_args, view_kwargs, modo)
+    if modo == "muestreo":
+        muestreador = Muestreador(threading.get_ident())
+        muestreador.start()
+        try:
+            respuesta = view_func(request, *view_args, **view_kwargs)
+        finally:
+            muestreador.detener.set()
+            muestreador.join()
+        return respuesta, guardar_muestras(request, muestreador)
+    perfil = cProfile.Profile()
+    respuesta = perfil.runcall(view_func, request, *view_args, **view_kwargs)
+    return respuesta, guardar_perfil(request, perfil)
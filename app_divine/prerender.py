@@ -0,0 +1,157 @@
+import gzip
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+import django
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from .models import PaginaPendiente, Producto, Recomendacion
+
+try:
+    import brotli
+except ImportError:  # opcional: sin él solo se generan variantes .gz
+    brotli = None
+
+TRABAJOS_POR_PROCESO = 4
+
+
+def pagina(nombre, *args):
+    url = reverse(nombre, args=args)
+    return url, url.lstrip("/") + "index.html"
+
+
+def pagina_productos(categoria):
+    # nginx elige el archivo con $arg_categoria (deploy/nginx.conf).
+    return f"{reverse('productos')}?categoria={categoria}", f"productos/{categoria}.html"
+
+
+def paginas_portada():
+    return [pagina("inicio"), pagina("novedades"), pagina_productos("todos")]
+
+
+def paginas_completas():
+    paginas = paginas_portada()
+    paginas += [pagina_productos(tipo) for tipo, _ in Producto.TIPOS]
+    paginas += [
+        pagina("detalle_producto", pk)
+        for pk in Producto.objects.order_by("id").values_list("id", flat=True).iterator()
+    ]
+    return paginas
+
+
+def paginas_afectadas(pendientes):
+    # Un producto aparece en su ficha, en el listado de su tipo, en la portada
+    # y novedades, y como tarjeta en las fichas que lo recomiendan.
+    paginas = set(paginas_portada())
+    ids = {pk for pk, _ in pendientes}
+    paginas.update(pagina_productos(tipo) for _, tipo in pendientes)
+    recomendadores = Recomendacion.objects.filter(recomendado_id__in=ids).values_list("producto_id", flat=True)
+    paginas.update(pagina("detalle_producto", pk) for pk in ids.union(recomendadores))
+    return sorted(paginas)
+
+
+def escribir(destino, contenido):
+    # Se escribe a un temporal y se renombra: nginx nunca ve un archivo a medias.
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    variantes = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes[".br"] = brotli.compress(contenido, quality=11)
+    for extension, comprimido in variantes.items():
+        variante = destino.with_name(destino.name + extension)
+        if len(comprimido) < len(contenido):
+            temporal = variante.with_name(variante.name + ".tmp")
+            temporal.write_bytes(comprimido)
+            os.replace(temporal, variante)
+        else:
+            variante.unlink(missing_ok=True)
+    temporal = destino.with_name(destino.name + ".tmp")
+    temporal.write_bytes(contenido)
+    os.replace(temporal, destino)
+
+
+def borrar(destino):
+    for ruta in (destino, destino.with_name(destino.name + ".gz"), destino.with_name(destino.name + ".br")):
+        ruta.unlink(missing_ok=True)
+
+
+def renderizar(paginas, directorio, host):
+    # Se pasa por toda la pila de middlewares como un visitante anónimo, así
+    # el archivo es lo mismo que Django respondería.
+    cliente = Client(HTTP_HOST=host)
+    resultado = {"paginas": 0, "bytes": 0, "borradas": 0, "errores": []}
+    for url, relativo in paginas:
+        destino = Path(directorio) / relativo
+        respuesta = cliente.get(url)
+        if respuesta.status_code == 404:
+            borrar(destino)
+            resultado["borradas"] += 1
+        elif respuesta.status_code != 200 or respuesta.get("X-Cache") == "STALE":
+            resultado["errores"].append(url)
+        else:
+            escribir(destino, respuesta.content)
+            resultado["paginas"] += 1
+            resultado["bytes"] += len(respuesta.content)
+    return resultado
+
+
+def iniciar_proceso():
+    django.setup()
+
+
+def repartir(paginas, procesos):
+    tamano = max(1, -(-len(paginas) // (procesos * TRABAJOS_POR_PROCESO)))
+    return [paginas[inicio:inicio + tamano] for inicio in range(0, len(paginas), tamano)]
+
+
+def generar(paginas, directorio, host, procesos):
+    total = {"paginas": 0, "bytes": 0, "borradas": 0, "errores": []}
+    if procesos <= 1:
+        partes = [renderizar(paginas, directorio, host)]
+    else:
+        # Los procesos hijos no deben heredar conexiones abiertas.
+        connections.close_all()
+        with ProcessPoolExecutor(procesos, initializer=iniciar_proceso) as grupo:
+            partes = list(
+                grupo.map(renderizar, repartir(paginas, procesos), repeat(directorio), repeat(host))
+            )
+    for parte in partes:
+        for clave in ("paginas", "bytes", "borradas", "errores"):
+            total[clave] += parte[clave]
+    return total
+
+
+def limpiar_fichas(directorio, vigentes):
+    # Fichas de productos que ya no existen tras un render completo.
+    borradas = 0
+    raiz = Path(directorio) / Path(pagina("detalle_producto", 0)[1]).parent.parent
+    if raiz.is_dir():
+        for carpeta in raiz.iterdir():
+            if carpeta.is_dir() and carpeta.name.isdigit() and int(carpeta.name) not in vigentes:
+                shutil.rmtree(carpeta)
+                borradas += 1
+    return borradas
+
+
+def prerenderizar(directorio, host, procesos, solo_pendientes=False):
+    if solo_pendientes:
+        filas = list(PaginaPendiente.objects.order_by("id").values_list("id", "producto_id", "tipo"))
+        if not filas:
+            return {"paginas": 0, "bytes": 0, "borradas": 0, "errores": []}
+        resultado = generar(
+            paginas_afectadas({(pk, tipo) for _, pk, tipo in filas}), directorio, host, procesos
+        )
+        # Con errores las marcas se conservan para el siguiente intento.
+        if not resultado["errores"]:
+            PaginaPendiente.objects.filter(id__lte=filas[-1][0]).delete()
+        return resultado
+    ultimo = PaginaPendiente.objects.order_by("-id").values_list("id", flat=True).first()
+    resultado = generar(paginas_completas(), directorio, host, procesos)
+    resultado["borradas"] += limpiar_fichas(directorio, set(Producto.objects.values_list("id", flat=True)))
+    if ultimo is not None and not resultado["errores"]:
+        PaginaPendiente.objects.filter(id__lte=ultimo).delete()
+    return resultado
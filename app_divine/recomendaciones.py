@@ -0,0 +1,133 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .cache_catalogo import invalidar_catalogo
+from .models import Coocurrencia, LineaPedido, PuntoControl, Recomendacion
+
+PUNTO_CONTROL = "recomendaciones"
+TAMANO_LOTE = 500
+
+
+def trozos(valores):
+    valores = sorted(valores)
+    for inicio in range(0, len(valores), TAMANO_LOTE):
+        yield valores[inicio:inicio + TAMANO_LOTE]
+
+
+def contar_pares(lineas):
+    # `lineas` son (pedido_id, producto_id) ordenadas por pedido. Cada pedido
+    # suma 1 a cada par de productos distintos y a la diagonal de cada uno.
+    conteo = Counter()
+    pedidos = []
+    for pedido_id, grupo in groupby(lineas, key=itemgetter(0)):
+        productos = sorted({producto for _, producto in grupo})
+        for producto in productos:
+            conteo[producto, producto] += 1
+        for a, b in combinations(productos, 2):
+            conteo[a, b] += 1
+            conteo[b, a] += 1
+        pedidos.append(pedido_id)
+    return conteo, pedidos
+
+
+def acumular(conteo):
+    existentes = {}
+    for lote in trozos({a for a, _ in conteo}):
+        filas = Coocurrencia.objects.filter(producto_a__in=lote).values_list(
+            "producto_a", "producto_b", "veces"
+        )
+        existentes.update(((a, b), veces) for a, b, veces in filas)
+    Coocurrencia.objects.bulk_create(
+        (
+            Coocurrencia(producto_a_id=a, producto_b_id=b, veces=existentes.get((a, b), 0) + veces)
+            for (a, b), veces in conteo.items()
+        ),
+        batch_size=TAMANO_LOTE,
+        update_conflicts=True,
+        unique_fields=["producto_a", "producto_b"],
+        update_fields=["veces"],
+    )
+
+
+def vecinos(productos):
+    # La puntuación de (a, b) depende del total de b, así que al cambiar b
+    # hay que recalcular la lista de todos los productos que lo acompañan.
+    resultado = set(productos)
+    for lote in trozos(productos):
+        resultado.update(
+            Coocurrencia.objects.filter(producto_a__in=lote).values_list("producto_b", flat=True)
+        )
+    return resultado
+
+
+def recalcular(productos, k):
+    totales = dict(
+        Coocurrencia.objects.filter(producto_a=F("producto_b")).values_list("producto_a", "veces")
+    )
+    candidatos = defaultdict(list)
+    for lote in trozos(productos):
+        filas = (
+            Coocurrencia.objects.filter(producto_a__in=lote, veces__gte=settings.RECOMENDACIONES_MINIMO)
+            .exclude(producto_b=F("producto_a"))
+            .values_list("producto_a", "producto_b", "veces")
+        )
+        for a, b, veces in filas:
+            # Similitud coseno: un best seller no aparece en todas las listas
+            # solo por ser popular.
+            candidatos[a].append((veces / math.sqrt(totales[a] * totales[b]), veces, b))
+
+    nuevas = []
+    for a, opciones in candidatos.items():
+        mejores = heapq.nsmallest(k, opciones, key=lambda opcion: (-opcion[0], -opcion[1], opcion[2]))
+        nuevas.extend(
+            Recomendacion(producto_id=a, recomendado_id=b, posicion=posicion, puntuacion=puntuacion)
+            for posicion, (puntuacion, _, b) in enumerate(mejores)
+        )
+    for lote in trozos(productos):
+        Recomendacion.objects.filter(producto_id__in=lote).delete()
+    Recomendacion.objects.bulk_create(nuevas, batch_size=TAMANO_LOTE)
+    return len(productos)
+
+
+def actualizar(completo=False, k=None):
+    k = k or settings.RECOMENDACIONES_K
+    with transaction.atomic():
+        punto, _ = PuntoControl.objects.select_for_update().get_or_create(nombre=PUNTO_CONTROL)
+        if completo:
+            Coocurrencia.objects.all().delete()
+            Recomendacion.objects.all().delete()
+            punto.ultimo_id = 0
+            punto.procesados = []
+        # Se vuelve a leer la ventana bajo ultimo_id por los pedidos que
+        # confirmaron tarde; los que ya se contaron se saltan.
+        procesados = set(punto.procesados)
+        lineas = (
+            linea
+            for linea in LineaPedido.objects.filter(
+                pedido_id__gt=punto.ultimo_id - settings.PEDIDOS_VENTANA_TARDIOS, producto__isnull=False
+            )
+            .order_by("pedido_id")
+            .values_list("pedido_id", "producto_id")
+            .iterator(chunk_size=2000)
+            if linea[0] not in procesados
+        )
+        conteo, pedidos = contar_pares(lineas)
+        recalculados = 0
+        if conteo:
+            acumular(conteo)
+            recalculados = recalcular(vecinos({a for a, _ in conteo}), k)
+            punto.ultimo_id = max(punto.ultimo_id, pedidos[-1])
+        procesados.update(pedidos)
+        piso = punto.ultimo_id - settings.PEDIDOS_VENTANA_TARDIOS
+        punto.procesados = sorted(pk for pk in procesados if pk > piso)
+        punto.save(update_fields=["ultimo_id", "procesados"])
+    if recalculados:
+        invalidar_catalogo()
+    return {"pedidos": len(pedidos), "pares": len(conteo), "productos": recalculados}
@@ -0,0 +1,61 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .models import Pedido, ProductoBase, Recomendacion, RedireccionProducto
+
+REPLICA = "replica"
+PRIMARIA = "default"
+COOKIE_PRIMARIA = "divine_primaria"
+
+_solicitud_actual = ContextVar("solicitud_replica", default=None)
+
+
+def replica_configurada():
+    return REPLICA in settings.DATABASES
+
+
+def es_lectura_replicable(model):
+    return issubclass(model, (ProductoBase, RedireccionProducto, Recomendacion, Pedido))
+
+
+def iniciar_solicitud(request, catalogo_modificado):
+    # "primaria" fija las lecturas al primario durante toda la solicitud;
+    # "escribio" avisa al middleware que debe abrir la ventana pegajosa.
+    vence = request.COOKIES.get(COOKIE_PRIMARIA, "")
+    solicitud = {
+        "primaria": catalogo_modificado or (vence.isdigit() and int(vence) > time.time()),
+        "escribio": False,
+    }
+    return solicitud, _solicitud_actual.set(solicitud)
+
+
+def terminar_solicitud(token):
+    _solicitud_actual.reset(token)
+
+
+def fijar_primaria():
+    solicitud = _solicitud_actual.get()
+    if solicitud is not None:
+        solicitud["primaria"] = True
+
+
+class RouterReplica:
+    def db_for_read(self, model, **hints):
+        if not replica_configurada() or not es_lectura_replicable(model):
+            return None
+        solicitud = _solicitud_actual.get()
+        if solicitud is not None and solicitud["primaria"]:
+            return PRIMARIA
+        return settings.REPLICA_LECTURA
+
+    def db_for_write(self, model, **hints):
+        solicitud = _solicitud_actual.get()
+        if solicitud is not None and model._meta.app_label != "sessions":
+            solicitud["escribio"] = True
+            solicitud["primaria"] = True
+        return PRIMARIA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,99 @@
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CarritoAbandonado, Usuario
+
+TAMANO_LOTE = 500
+
+
+def resumir_carrito(carrito):
+    # [[producto_id, cantidad, precio], ...]: lo necesario para un correo de
+    # recuperación; nombre e imagen se leen del catálogo al enviarlo.
+    productos, total, unidades = [], Decimal("0.00"), 0
+    for item in carrito.values():
+        if not isinstance(item, dict):
+            continue
+        try:
+            cantidad = int(item["cantidad"])
+            precio = Decimal(item["precio"])
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            continue
+        productos.append([item.get("producto_id"), cantidad, str(precio)])
+        total += precio * cantidad
+        unidades += cantidad
+    return productos, total, unidades
+
+
+def leer_sesion(sesion):
+    # Una fila ilegible (otra SECRET_KEY, datos a medias) se borra igual que
+    # las demás: si fallara aquí, cada ejecución volvería a tropezar con ella.
+    datos = sesion.get_decoded()
+    if not isinstance(datos, dict):
+        return None, {}
+    usuario_id = datos.get("usuario_id")
+    carrito = datos.get("carrito")
+    return (
+        usuario_id if isinstance(usuario_id, int) else None,
+        carrito if isinstance(carrito, dict) else {},
+    )
+
+
+def purgar_lote(ahora, tamano_lote):
+    with transaction.atomic():
+        sesiones = list(
+            Session.objects.filter(expire_date__lt=ahora).order_by("expire_date")[:tamano_lote]
+        )
+        if not sesiones:
+            return 0, 0
+        carritos = []
+        for sesion in sesiones:
+            usuario_id, carrito = leer_sesion(sesion)
+            productos, total, unidades = resumir_carrito(carrito)
+            if productos:
+                carritos.append(
+                    CarritoAbandonado(
+                        usuario_id=usuario_id,
+                        productos=productos,
+                        total=total,
+                        unidades=unidades,
+                        vencio=sesion.expire_date,
+                    )
+                )
+        existentes = set(
+            Usuario.objects.filter(pk__in=[carrito.usuario_id for carrito in carritos]).values_list(
+                "pk", flat=True
+            )
+        )
+        for carrito in carritos:
+            if carrito.usuario_id not in existentes:
+                carrito.usuario_id = None
+        CarritoAbandonado.objects.bulk_create(carritos)
+        Session.objects.filter(pk__in=[sesion.pk for sesion in sesiones]).delete()
+    return len(sesiones), len(carritos)
+
+
+def purgar(tamano_lote=TAMANO_LOTE, pausa=0.05, limite_segundos=None):
+    # A diferencia de clearsessions, cada lote es una transacción corta y
+    # entre lotes se suelta el candado de escritura de SQLite para que las
+    # solicitudes sigan escribiendo. Si se acaba el tiempo, la siguiente
+    # ejecución continúa donde quedó.
+    ahora = timezone.now()
+    inicio = time.monotonic()
+    resumen = {"sesiones": 0, "carritos": 0, "lotes": 0, "completo": False}
+    while limite_segundos is None or time.monotonic() - inicio < limite_segundos:
+        sesiones, carritos = purgar_lote(ahora, tamano_lote)
+        if not sesiones:
+            resumen["completo"] = True
+            break
+        resumen["sesiones"] += sesiones
+        resumen["carritos"] += carritos
+        resumen["lotes"] += 1
+        if sesiones < tamano_lote:
+            resumen["completo"] = True
+            break
+        time.sleep(pausa)
+    return resumen
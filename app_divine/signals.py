@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache_catalogo import invalidar_catalogo
+from .models import PaginaPendiente, Producto, ProductoBase, ProductoEliminado, Recomendacion
+
+_lote = ContextVar("lote_productos", default=None)
+
+
+class LoteProductos:
+    # Dentro de un lote las señales no escriben fila por fila: acumulan
+    # lápidas y páginas pendientes para guardarlas juntas en cada tramo, y la
+    # versión del catálogo sube una sola vez al cerrar el lote.
+    def __init__(self):
+        self.invalidar = False
+        self.pendientes = []
+        self.eliminados = []
+
+    def marcar(self, filas):
+        self.invalidar = True
+        if settings.PRERENDER_DIRECTORIO:
+            self.pendientes.extend(PaginaPendiente(producto_id=pk, tipo=tipo) for pk, tipo in filas)
+
+    def marcar_recomendadores(self, ids):
+        self.marcar(
+            Recomendacion.objects.filter(recomendado__in=ids)
+            .values_list("producto_id", "producto__tipo")
+            .distinct()
+        )
+
+    def guardar(self):
+        PaginaPendiente.objects.bulk_create(self.pendientes)
+        ProductoEliminado.objects.bulk_create(self.eliminados)
+        self.pendientes, self.eliminados = [], []
+
+
+@contextmanager
+def lote_productos():
+    lote = LoteProductos()
+    token = _lote.set(lote)
+    try:
+        yield lote
+    finally:
+        _lote.reset(token)
+        if lote.invalidar:
+            invalidar_catalogo()
+
+
+@receiver([post_save, post_delete])
+def producto_modificado(sender, instance, **kwargs):
+    if not issubclass(sender, ProductoBase):
+        return
+    lote = _lote.get()
+    if lote is not None:
+        lote.marcar([(instance.pk, instance.tipo)])
+        return
+    invalidar_catalogo()
+    if settings.PRERENDER_DIRECTORIO:
+        PaginaPendiente.objects.create(producto_id=instance.pk, tipo=instance.tipo)
+
+
+@receiver(post_delete)
+def producto_eliminado(sender, instance, **kwargs):
+    if not issubclass(sender, Producto):
+        return
+    lote = _lote.get()
+    if lote is not None:
+        lote.eliminados.append(ProductoEliminado(producto_id=instance.pk, tipo=instance.tipo))
+        return
+    ProductoEliminado.objects.create(producto_id=instance.pk, tipo=instance.tipo)
+
+
+@receiver(pre_delete)
+def producto_por_borrar(sender, instance, **kwargs):
+    # Las fichas que lo recomiendan muestran su tarjeta; esas filas se borran
+    # en cascada antes de post_delete. En un lote se marcan antes de borrar
+    # con una sola consulta (LoteProductos.marcar_recomendadores).
+    if issubclass(sender, Producto) and settings.PRERENDER_DIRECTORIO and _lote.get() is None:
+        recomendadores = Recomendacion.objects.filter(recomendado=instance).values_list(
+            "producto_id", "producto__tipo"
+        )
+        PaginaPendiente.objects.bulk_create(
+            [PaginaPendiente(producto_id=pk, tipo=tipo) for pk, tipo in recomendadores]
+        )
@@ -0,0 +1,59 @@
+import heapq
+from datetime import datetime, timedelta, timezone as zona
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .inventario import con_existencias
+from .models import Producto, ProductoEliminado
+
+EPOCA = datetime(1970, 1, 1, tzinfo=zona.utc)
+MICROSEGUNDO = timedelta(microseconds=1)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar(momento, pk):
+    return f"{(momento - EPOCA) // MICROSEGUNDO}-{pk}"
+
+
+def decodificar(cursor):
+    # Vacío: desde el principio (la primera sincronización recorre todo).
+    if not cursor:
+        return EPOCA, 0
+    try:
+        microsegundos, pk = (int(parte) for parte in cursor.split("-"))
+    except ValueError:
+        raise CursorInvalido(cursor)
+    return EPOCA + microsegundos * MICROSEGUNDO, pk
+
+
+def cambios(cursor, limite):
+    # Productos y lápidas posteriores a (actualizado, id) del cursor, en ese
+    # orden; cada consulta recorre el índice desde el cursor, así el costo
+    # depende de los cambios y no del tamaño del catálogo. Se omite lo más
+    # reciente para no saltar filas de transacciones que aún no confirman.
+    momento, pk = decodificar(cursor)
+    tope = timezone.now() - timedelta(seconds=settings.CATALOGO_CAMBIOS_MARGEN)
+    productos = (
+        con_existencias(Producto.objects.filter(actualizado__gte=momento, actualizado__lte=tope))
+        .exclude(actualizado=momento, id__lte=pk)
+        .order_by("actualizado", "id")[:limite]
+    )
+    eliminados = (
+        ProductoEliminado.objects.filter(actualizado__gte=momento, actualizado__lte=tope)
+        .exclude(actualizado=momento, producto_id__lte=pk)
+        .order_by("actualizado", "producto_id")[:limite]
+    )
+    filas = heapq.merge(
+        ((producto.actualizado, producto.id, producto) for producto in productos),
+        ((lapida.actualizado, lapida.producto_id, lapida) for lapida in eliminados),
+        key=lambda fila: fila[:2],
+    )
+    pagina = list(islice(filas, limite))
+    if pagina:
+        cursor = codificar(*pagina[-1][:2])
+    return [fila[2] for fila in pagina], cursor
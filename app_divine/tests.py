@@ -1,3 +1,1614 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.templatetags.static import static
+from django.db import connection
+from django.utils import timezone
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from . import (
+    acciones_masivas,
+    autocompletar,
+    cache_paginas,
+    calentamiento,
+    compresion,
+    consultas_lentas,
+    inventario,
+    limites,
+    metricas,
+    pedidos_en_vivo,
+    prerender,
+    recomendaciones,
+    routers,
+    sesiones,
+    urls,
+    views,
+)
+from .forms import FormularioCabello
+from .models import (
+    Cabello,
+    CarritoAbandonado,
+    Coocurrencia,
+    CorteInventario,
+    CuidadoPiel,
+    LineaPedido,
+    Maquillaje,
+    MovimientoInventario,
+    PaginaPendiente,
+    Pedido,
+    Perfume,
+    Producto,
+    ProductoEliminado,
+    PuntoControl,
+    Recomendacion,
+    RedireccionProducto,
+    Usuario,
+)
+
+PRODUCTOS_POR_CATEGORIA = 25
+PEDIDOS_POR_CLIENTE = 6
+LATENCIA_MAXIMA = 0.5
+
+# Presupuesto por ruta y rol: (consultas, plantillas renderizadas).
+# Si una vista cambia a propósito, ajusta aquí su presupuesto en el mismo cambio.
+PRESUPUESTOS = {
+    "inicio": {"anonimo": (1, 2), "cliente": (3, 2), "admin": (3, 2)},
+    "novedades": {"anonimo": (1, 2), "cliente": (3, 2), "admin": (3, 2)},
+    "productos": {"anonimo": (1, 2), "cliente": (3, 2), "admin": (3, 2)},
+    "detalle_producto": {"anonimo": (2, 2), "cliente": (4, 2), "admin": (4, 2)},
+    "detalle_producto_anterior": {"anonimo": (1, 0), "cliente": (1, 0), "admin": (1, 0)},
+    "autocompletar": {"anonimo": (0, 0), "cliente": (0, 0), "admin": (0, 0)},
+    "api_catalogo_cambios": {"anonimo": (2, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "agregar_carrito": {"anonimo": (0, 0), "cliente": (1, 0), "admin": (1, 0)},
+    "carrito": {"anonimo": (0, 0), "cliente": (3, 2), "admin": (3, 2)},
+    "actualizar_carrito": {"anonimo": (0, 0), "cliente": (1, 0), "admin": (1, 0)},
+    "eliminar_item_carrito": {"anonimo": (0, 0), "cliente": (4, 0), "admin": (4, 0)},
+    "procesar_pago": {"anonimo": (0, 0), "cliente": (4, 31), "admin": (4, 31)},
+    "perfil_usuario": {"anonimo": (0, 0), "cliente": (4, 2), "admin": (4, 2)},
+    "contacto": {"anonimo": (0, 2), "cliente": (2, 2), "admin": (2, 2)},
+    "iniciar_sesion": {"anonimo": (0, 8), "cliente": (1, 0), "admin": (1, 0)},
+    "cerrar_sesion": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "registrarse": {"anonimo": (0, 22), "cliente": (1, 0), "admin": (1, 0)},
+    "panel_admin": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (7, 2)},
+    "admin_cabello_lista": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 2)},
+    "admin_cabello_crear": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (3, 21)},
+    "admin_cabello_acciones": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "admin_cabello_editar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 21)},
+    "admin_cabello_eliminar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 2)},
+    "admin_maquillaje_lista": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 2)},
+    "admin_maquillaje_crear": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (3, 19)},
+    "admin_maquillaje_acciones": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "admin_maquillaje_editar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 19)},
+    "admin_maquillaje_eliminar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 2)},
+    "admin_piel_lista": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 2)},
+    "admin_piel_crear": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (3, 19)},
+    "admin_piel_acciones": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "admin_piel_editar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 19)},
+    "admin_piel_eliminar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 2)},
+    "admin_perfumes_lista": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 2)},
+    "admin_perfumes_crear": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (3, 19)},
+    "admin_perfumes_acciones": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "admin_perfumes_editar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 19)},
+    "admin_perfumes_eliminar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 2)},
+    "admin_usuarios_lista": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 2)},
+    "admin_usuarios_crear": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (3, 22)},
+    "admin_usuarios_editar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 22)},
+    "admin_usuarios_eliminar": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 2)},
+    "admin_usuario_detalle": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (5, 2)},
+    "admin_pedidos_lista": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (4, 2)},
+    "admin_pedidos_vivo": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (3, 0)},
+    "metricas": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "descargar_perfil": {"anonimo": (0, 0), "cliente": (2, 0), "admin": (2, 0)},
+    "servir_media": {"anonimo": (0, 0), "cliente": (0, 0), "admin": (0, 0)},
+}
+
+ROLES = ("anonimo", "cliente", "admin")
+
+
+def sembrar_catalogo():
+    for modelo in (Cabello, Maquillaje, CuidadoPiel, Perfume):
+        modelo.objects.bulk_create(
+            modelo(
+                nombre=f"{modelo.__name__} {numero}",
+                descripcion="Descripción de prueba " * 10,
+                precio=Decimal("100.00") + numero,
+                stock=numero,
+                categoria=modelo.__name__,
+                foto=f"productos/{modelo.__name__.lower()}{numero}.jpg",
+            )
+            for numero in range(PRODUCTOS_POR_CATEGORIA)
+        )
+
+
+def crear_usuario(correo, es_admin=False):
+    return Usuario.objects.create(
+        nombre="Prueba",
+        apellido="Divine",
+        fecha_nacimiento=date(1995, 5, 17),
+        correo_electronico=correo,
+        contrasena=make_password("secreta123"),
+        direccion="Calle Falsa 123",
+        es_admin=es_admin,
+    )
+
+
+def crear_pedidos(usuario, cantidad):
+    Pedido.objects.bulk_create(
+        Pedido(
+            id_usuario=usuario,
+            subtotal=Decimal("250.00"),
+            formapago="tarjeta",
+            envio=Decimal("120.00"),
+            domicilio=usuario.direccion,
+            detalle="Producto x1 - $250.00",
+        )
+        for _ in range(cantidad)
+    )
+
+
+@override_settings(PERFILES_DIR=tempfile.mkdtemp())
+class PresupuestoRutasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+        (Path(settings.PERFILES_DIR) / "presupuesto.pstats").write_bytes(b"")
+        cls.cliente_registrado = crear_usuario("cliente@divine.test")
+        cls.administrador = crear_usuario("admin@divine.test", es_admin=True)
+        crear_pedidos(cls.cliente_registrado, PEDIDOS_POR_CLIENTE)
+        crear_pedidos(cls.administrador, PEDIDOS_POR_CLIENTE)
+        cls.cabello = Cabello.objects.first()
+        cls.maquillaje = Maquillaje.objects.first()
+        cls.piel = CuidadoPiel.objects.first()
+        cls.perfume = Perfume.objects.first()
+        RedireccionProducto.objects.create(tipo="cabello", id_anterior=7, producto=cls.cabello)
+
+    def setUp(self):
+        cache.clear()
+        autocompletar.descartar()
+        autocompletar.indice_actual()
+
+    def argumentos(self, nombre):
+        if nombre in ("detalle_producto", "agregar_carrito"):
+            return [self.cabello.pk]
+        if nombre == "detalle_producto_anterior":
+            return ["cabello", 7]
+        if nombre == "eliminar_item_carrito":
+            return [str(self.cabello.pk)]
+        if nombre == "descargar_perfil":
+            return ["presupuesto.pstats"]
+        if nombre == "servir_media":
+            return ["productos/a.jpg"]
+        if nombre == "autocompletar":
+            return []
+        por_modelo = {
+            "admin_cabello_": self.cabello,
+            "admin_maquillaje_": self.maquillaje,
+            "admin_piel_": self.piel,
+            "admin_perfumes_": self.perfume,
+            "admin_usuarios_": self.cliente_registrado,
+            "admin_usuario_detalle": self.cliente_registrado,
+        }
+        for prefijo, objeto in por_modelo.items():
+            if nombre.startswith(prefijo) and not nombre.endswith(("_lista", "_crear", "_acciones")):
+                return [objeto.pk]
+        return []
+
+    def iniciar_sesion_como(self, rol):
+        if rol == "anonimo":
+            return
+        usuario = self.administrador if rol == "admin" else self.cliente_registrado
+        sesion = self.client.session
+        sesion["usuario_id"] = usuario.pk
+        sesion["carrito"] = {
+            str(self.cabello.pk): {
+                "nombre": self.cabello.nombre,
+                "precio": str(self.cabello.precio),
+                "cantidad": 2,
+                "tipo": "cabello",
+                "producto_id": self.cabello.pk,
+                "imagen": self.cabello.foto.url,
+                "categoria": "Cabello",
+            }
+        }
+        sesion.save()
+
+    def medir(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = self.client.get(url)
+            duracion = time.perf_counter() - inicio
+        return respuesta, len(consultas), duracion
+
+    def test_todas_las_rutas_tienen_presupuesto(self):
+        nombres = {
+            patron.name
+            for patron in urls.urlpatterns
+            if isinstance(patron, URLPattern) and patron.name
+        }
+        self.assertEqual(nombres - set(PRESUPUESTOS), set())
+        self.assertEqual(set(PRESUPUESTOS) - nombres, set())
+
+    def test_presupuesto_por_ruta_y_rol(self):
+        for patron in urls.urlpatterns:
+            if not patron.name or patron.name not in PRESUPUESTOS:
+                continue
+            url = reverse(patron.name, args=self.argumentos(patron.name))
+            for rol in ROLES:
+                with self.subTest(ruta=patron.name, rol=rol):
+                    self.client = self.client_class()
+                    self.iniciar_sesion_como(rol)
+                    respuesta, consultas, duracion = self.medir(url)
+                    esperado_consultas, esperado_plantillas = PRESUPUESTOS[patron.name][rol]
+                    self.assertIn(respuesta.status_code, (200, 301, 302))
+                    self.assertEqual(
+                        consultas,
+                        esperado_consultas,
+                        f"{patron.name} ({rol}) hizo {consultas} consultas",
+                    )
+                    self.assertEqual(
+                        len(respuesta.templates),
+                        esperado_plantillas,
+                        f"{patron.name} ({rol}) renderizó {len(respuesta.templates)} plantillas",
+                    )
+                    self.assertLess(duracion, LATENCIA_MAXIMA)
+
+    def test_productos_no_crece_con_el_catalogo(self):
+        url = reverse("productos") + "?categoria=todos"
+        _, antes, _ = self.medir(url)
+        sembrar_catalogo()
+        cache.clear()
+        _, despues, _ = self.medir(url)
+        self.assertEqual(antes, despues)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class SembrarTests(TestCase):
+    def sembrar(self):
+        call_command("sembrar", productos=10, usuarios=4, pedidos=6, semilla=7, stdout=StringIO())
+        return (
+            list(Cabello.objects.values_list("nombre", "precio", "foto")),
+            list(Pedido.objects.values_list("subtotal", "fecha_creacion")),
+        )
+
+    def test_sembrar_llena_todos_los_modelos(self):
+        self.sembrar()
+        self.assertEqual(
+            sum(modelo.objects.count() for modelo in (Cabello, Maquillaje, CuidadoPiel, Perfume)),
+            10,
+        )
+        self.assertEqual(Producto.objects.count(), 10)
+        self.assertEqual(Usuario.objects.count(), 4)
+        self.assertEqual(Pedido.objects.count(), 6)
+        self.assertEqual(
+            LineaPedido.objects.filter(producto__isnull=False).values("pedido").distinct().count(), 6
+        )
+
+    def test_sembrar_es_determinista(self):
+        primera = self.sembrar()
+        for modelo in (Producto, Pedido, Usuario):
+            modelo.objects.all().delete()
+        self.assertEqual(self.sembrar(), primera)
+
+
+class MetricasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+        cls.administrador = crear_usuario("admin@divine.test", es_admin=True)
+
+    def setUp(self):
+        cache.clear()
+        metricas.reiniciar()
+
+    def entrar_como_admin(self):
+        sesion = self.client.session
+        sesion["usuario_id"] = self.administrador.pk
+        sesion.save()
+
+    def test_metrics_solo_para_admin(self):
+        respuesta = self.client.get(reverse("metricas"))
+        self.assertRedirects(respuesta, reverse("iniciar_sesion"))
+
+    def test_metrics_reporta_consultas_y_latencia_por_vista(self):
+        self.client.get(reverse("productos"))
+        self.entrar_como_admin()
+        respuesta = self.client.get(reverse("metricas"))
+        texto = respuesta.content.decode()
+        self.assertEqual(respuesta["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        self.assertIn('divine_solicitudes_total{vista="productos"} 1', texto)
+        self.assertIn('divine_consultas_bd_total{vista="productos"} 1', texto)
+        self.assertIn('divine_latencia_segundos_bucket{vista="productos",le="+Inf"} 1', texto)
+
+    def test_metrics_suma_otros_procesos(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            otro = {"productos": metricas.registro_vacio()}
+            otro["productos"]["solicitudes"] = 5
+            (Path(directorio) / f"{os.getppid()}-otro.json").write_text(json.dumps(otro))
+            with override_settings(METRICAS_DIR=directorio):
+                self.client.get(reverse("productos"))
+                total = metricas.agregado()
+        self.assertEqual(total["productos"]["solicitudes"], 6)
+
+    def test_metrics_descarta_procesos_terminados(self):
+        terminado = subprocess.Popen([sys.executable, "-c", ""])
+        terminado.wait()
+        otro = {"productos": metricas.registro_vacio()}
+        otro["productos"]["solicitudes"] = 5
+        with tempfile.TemporaryDirectory() as directorio:
+            muerto = Path(directorio) / f"{terminado.pid}-abc.json"
+            viejo = Path(directorio) / f"{os.getppid()}-viejo.json"
+            for archivo in (muerto, viejo):
+                archivo.write_text(json.dumps(otro))
+            hace_dos_horas = time.time() - 7200
+            os.utime(viejo, (hace_dos_horas, hace_dos_horas))
+            with override_settings(METRICAS_DIR=directorio):
+                self.client.get(reverse("productos"))
+                metricas.volcar_si_toca(forzar=True)
+                total = metricas.agregado()
+                archivos = [archivo.name for archivo in Path(directorio).glob("*.json")]
+        self.assertEqual(total["productos"]["solicitudes"], 1)
+        self.assertEqual(archivos, [f"{metricas.nombre_proceso()}.json"])
+        self.assertRegex(archivos[0], rf"^{os.getpid()}-[0-9a-f]{{12}}\.json$")
+
+    def test_costo_de_registro_acotado(self):
+        medicion = metricas.Medicion()
+        repeticiones = 10000
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            metricas.registrar("prueba", 0.01, medicion, 1024)
+        promedio = (time.perf_counter() - inicio) / repeticiones
+        self.assertLess(promedio, 50e-6)
+
+
+class ConsultasLentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+        cls.administrador = crear_usuario("admin@divine.test", es_admin=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_normalizar_agrupa_literales_y_listas(self):
+        self.assertEqual(
+            consultas_lentas.normalizar(
+                "SELECT * FROM  cabello WHERE id IN (%s, %s, %s) AND nombre = 'x' LIMIT 21"
+            ),
+            "SELECT * FROM cabello WHERE id IN (...) AND nombre = ? LIMIT ?",
+        )
+
+    def test_registra_vista_y_linea_de_origen(self):
+        directorio = tempfile.mkdtemp()
+        with override_settings(
+            CONSULTAS_LENTAS_UMBRAL_MS=0,
+            CONSULTAS_LENTAS_ARCHIVO=str(Path(directorio) / "lentas.jsonl"),
+        ):
+            sesion = self.client.session
+            sesion["usuario_id"] = self.administrador.pk
+            sesion.save()
+            with self.assertLogs("app_divine.consultas_lentas", "WARNING") as registro:
+                self.client.get(reverse("panel_admin"))
+        entradas = [json.loads(linea.split(":", 2)[2]) for linea in registro.output]
+        entrada = next(e for e in entradas if '"productos"' in e["sql"])
+        self.assertEqual(entrada["vista"], "panel_admin")
+        self.assertRegex(entrada["origen"], r"^app_divine/views\.py:\d+$")
+
+    async def test_vista_asincrona_registra_su_linea(self):
+        directorio = tempfile.mkdtemp()
+        with override_settings(
+            CONSULTAS_LENTAS_UMBRAL_MS=0,
+            CONSULTAS_LENTAS_ARCHIVO=str(Path(directorio) / "lentas.jsonl"),
+        ):
+            with self.assertLogs("app_divine.consultas_lentas", "WARNING") as registro:
+                await self.async_client.get(reverse("productos") + "?categoria=cabello")
+            # Sin la tarea de la solicitud (cliente síncrono) no se inventa un origen.
+            with self.assertLogs("app_divine.consultas_lentas", "WARNING") as sincrono:
+                await sync_to_async(self.client_class().get)(reverse("productos") + "?categoria=perfumes")
+        entradas = [json.loads(linea.split(":", 2)[2]) for linea in registro.output]
+        entrada = next(e for e in entradas if '"productos"' in e["sql"])
+        self.assertEqual(entrada["vista"], "productos")
+        numero = int(entrada["origen"].rsplit(":", 1)[1])
+        lineas = Path(settings.BASE_DIR, "app_divine", "views.py").read_text(encoding="utf-8").splitlines()
+        self.assertTrue(entrada["origen"].startswith("app_divine/views.py:"))
+        self.assertIn("async for", lineas[numero - 1])
+        entradas = [json.loads(linea.split(":", 2)[2]) for linea in sincrono.output]
+        entrada = next(e for e in entradas if '"productos"' in e["sql"])
+        self.assertIsNone(entrada["origen"])
+
+    def test_top_queries_agrupa_por_huella(self):
+        archivo = Path(tempfile.mkdtemp()) / "lentas.jsonl"
+        entradas = [
+            {"huella": "a", "sql": "SELECT ?", "duracion_ms": 5.0, "vista": "inicio", "origen": "x.py:1"},
+            {"huella": "a", "sql": "SELECT ?", "duracion_ms": 7.0, "vista": "inicio", "origen": "x.py:1"},
+            {"huella": "b", "sql": "SELECT 2", "duracion_ms": 1.0, "vista": "inicio", "origen": "x.py:2"},
+        ]
+        archivo.write_text("\n".join(json.dumps(e) for e in entradas))
+        salida = StringIO()
+        call_command("top_queries", archivo=str(archivo), stdout=salida)
+        primera = salida.getvalue().splitlines()[1].split()
+        self.assertEqual(primera[:3], ["a", "2", "12.0"])
+
+
+@override_settings(PERFILES_DIR=tempfile.mkdtemp())
+class PerfiladorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+        cls.cliente_registrado = crear_usuario("cliente@divine.test")
+        cls.administrador = crear_usuario("admin@divine.test", es_admin=True)
+
+    def entrar_como(self, usuario):
+        sesion = self.client.session
+        sesion["usuario_id"] = usuario.pk
+        sesion.save()
+
+    def test_admin_descarga_pstats(self):
+        self.entrar_como(self.administrador)
+        respuesta = self.client.get(reverse("productos") + "?categoria=todos&_profile=1")
+        self.assertEqual(respuesta.status_code, 200)
+        descarga = self.client.get(respuesta["X-Perfil"])
+        nombre = respuesta["X-Perfil"].rstrip("/").rsplit("/", 1)[1]
+        self.assertEqual(descarga.status_code, 200)
+        estadisticas = pstats.Stats(str(Path(settings.PERFILES_DIR) / nombre))
+        self.assertTrue(estadisticas.total_calls)
+
+    def test_muestreo_genera_pilas_colapsadas(self):
+        self.entrar_como(self.administrador)
+        respuesta = self.client.get(reverse("novedades") + "?_profile=muestreo")
+        nombre = respuesta["X-Perfil"].rstrip("/").rsplit("/", 1)[1]
+        self.assertTrue(nombre.endswith(".txt"))
+        for linea in (Path(settings.PERFILES_DIR) / nombre).read_text().splitlines():
+            self.assertRegex(linea, r"^\S+ \d+$")
+
+    def test_vista_asincrona_aparece_en_el_perfil(self):
+        # Cada producto tarda un poco para que el muestreo alcance a la vista.
+        construir = views.construir_producto
+
+        def lento(articulo):
+            time.sleep(0.005)
+            return construir(articulo)
+
+        self.entrar_como(self.administrador)
+        with mock.patch("app_divine.views.construir_producto", lento):
+            muestreo = self.client.get(reverse("novedades") + "?_profile=muestreo")
+            perfil = self.client.get(reverse("novedades") + "?_profile=1")
+        pilas = (Path(settings.PERFILES_DIR) / muestreo["X-Perfil"].rstrip("/").rsplit("/", 1)[1]).read_text()
+        self.assertIn("views.py:novedades;", pilas)
+        estadisticas = pstats.Stats(str(Path(settings.PERFILES_DIR) / perfil["X-Perfil"].rstrip("/").rsplit("/", 1)[1]))
+        self.assertIn("novedades", {funcion for _, _, funcion in estadisticas.stats})
+
+    def test_no_admin_no_perfila(self):
+        self.entrar_como(self.cliente_registrado)
+        antes = len(list(Path(settings.PERFILES_DIR).iterdir()))
+        respuesta = self.client.get(reverse("productos") + "?_profile=1")
+        self.assertNotIn("X-Perfil", respuesta)
+        self.assertEqual(len(list(Path(settings.PERFILES_DIR).iterdir())), antes)
+
+
+class CachePaginasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+        cls.cliente_registrado = crear_usuario("cliente@divine.test")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonimo_reutiliza_la_pagina(self):
+        url = reverse("productos") + "?categoria=cabello"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta["X-Cache"], "HIT")
+
+    def test_detalle_anonimo_se_cachea(self):
+        url = reverse("detalle_producto", args=[Cabello.objects.first().pk])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+    def test_usuario_con_sesion_no_usa_cache(self):
+        url = reverse("novedades")
+        self.client.get(url)
+        sesion = self.client.session
+        sesion["usuario_id"] = self.cliente_registrado.pk
+        sesion.save()
+        respuesta = self.client.get(url)
+        self.assertNotIn("X-Cache", respuesta)
+        self.assertContains(respuesta, "Hola Prueba")
+
+    def test_editar_producto_invalida_la_pagina(self):
+        url = reverse("productos") + "?categoria=cabello"
+        self.client.get(url)
+        producto = Cabello.objects.first()
+        producto.nombre = "Nombre renovado"
+        producto.save()
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta["X-Cache"], "MISS")
+        self.assertContains(respuesta, "Nombre renovado")
+
+    def test_sirve_copia_obsoleta_mientras_otro_regenera(self):
+        url = reverse("productos") + "?categoria=cabello"
+        self.client.get(url)
+        Cabello.objects.first().save()
+        clave, _ = cache_paginas.claves(self.client.get(url).wsgi_request)
+        cache.delete(clave)
+        cache.add(f"{clave}:candado", 1)
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta["X-Cache"], "STALE")
+
+    def test_refresco_anticipado_cerca_de_expirar(self):
+        ahora = 1000.0
+        lejana = {"costo": 0.05, "expira": ahora + 300}
+        inminente = {"costo": 0.05, "expira": ahora + 0.0001}
+        self.assertFalse(any(cache_paginas.debe_refrescar(lejana, ahora) for _ in range(200)))
+        self.assertTrue(any(cache_paginas.debe_refrescar(inminente, ahora) for _ in range(200)))
+
+
+class FragmentosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+        cls.cliente_registrado = crear_usuario("cliente@divine.test")
+
+    def setUp(self):
+        cache.clear()
+        sesion = self.client.session
+        sesion["usuario_id"] = self.cliente_registrado.pk
+        sesion.save()
+
+    def test_tarjeta_se_reutiliza_hasta_cambiar_el_catalogo(self):
+        url = reverse("productos") + "?categoria=cabello"
+        producto = Cabello.objects.first()
+        self.client.get(url)
+        Cabello.objects.filter(pk=producto.pk).update(nombre="Sin invalidar")
+        self.assertNotContains(self.client.get(url), "Sin invalidar")
+        producto.refresh_from_db()
+        producto.save()
+        self.assertContains(self.client.get(url), "Sin invalidar")
+
+    def test_encabezado_sigue_siendo_por_usuario(self):
+        url = reverse("novedades")
+        self.assertContains(self.client.get(url), "Hola Prueba")
+        self.assertContains(self.client_class().get(url), "Hola invitado")
+
+
+class CalentamientoTests(TestCase):
+    # Abre una conexión por alias, también la réplica si está configurada.
+    databases = "__all__"
+
+    def test_calentar_recorre_plantillas_rutas_y_conexiones(self):
+        resultados = calentamiento.calentar()
+        plantillas = list((Path(__file__).parent / "templates").rglob("*.html"))
+        nombres = [patron.name for patron in urls.urlpatterns if patron.name]
+        self.assertEqual(resultados["plantillas"][0], len(plantillas))
+        self.assertGreaterEqual(resultados["rutas"][0], len(nombres))
+        self.assertEqual(resultados["conexiones"][0], len(settings.DATABASES))
+
+
+class VistasAsincronasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_catalogo_por_asgi(self):
+        respuesta = await self.async_client.get(reverse("productos"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context["productos"]), 100)
+        respuesta = await self.async_client.get(reverse("inicio"))
+        self.assertEqual(len(respuesta.context["destacados"]), 4)
+
+    async def test_detalle_inexistente_por_asgi(self):
+        respuesta = await self.async_client.get(reverse("detalle_producto", args=[999999]))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class BaseDatosTests(TestCase):
+    @unittest.skipUnless(connection.vendor == "sqlite", "perfil SQLite")
+    def test_pragmas_sqlite_al_conectar(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "perfil PostgreSQL")
+    def test_conexiones_postgres_reutilizables(self):
+        ajustes = connection.settings_dict
+        self.assertTrue(ajustes["CONN_HEALTH_CHECKS"])
+        self.assertTrue(ajustes["CONN_MAX_AGE"] or ajustes["OPTIONS"].get("pool"))
+
+
+@unittest.skipUnless(
+    routers.REPLICA in settings.DATABASES,
+    "usar --settings=backend_divine.settings_pruebas_replica",
+)
+@override_settings(REPLICA_LECTURA=routers.REPLICA)
+class ReplicaTests(TestCase):
+    databases = "__all__"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = crear_usuario("admin@divine.test", es_admin=True)
+        cls.cliente_registrado = crear_usuario("cliente@divine.test")
+
+    def setUp(self):
+        cache.clear()
+
+    def crear_cabello(self, base, nombre, pk=None):
+        return Cabello.objects.using(base).create(
+            pk=pk, nombre=nombre, descripcion="Réplica", precio=Decimal("10.00"), stock=5, categoria="Cabello"
+        )
+
+    def iniciar_sesion(self, usuario):
+        sesion = self.client.session
+        sesion["usuario_id"] = usuario.pk
+        sesion.save()
+
+    def test_catalogo_se_lee_de_la_replica(self):
+        self.crear_cabello("replica", "Solo en réplica")
+        cache.clear()
+        respuesta = self.client.get(reverse("productos") + "?categoria=cabello")
+        self.assertEqual([p["nombre"] for p in respuesta.context["productos"]], ["Solo en réplica"])
+
+    def test_flujo_de_carrito_lee_del_primario(self):
+        producto = self.crear_cabello("default", "Solo en primario")
+        cache.clear()
+        self.iniciar_sesion(self.cliente_registrado)
+        respuesta = self.client.post(reverse("agregar_carrito", args=[producto.pk]), {"cantidad": 1})
+        self.assertRedirects(respuesta, reverse("carrito"), fetch_redirect_response=False)
+        self.assertIn(str(producto.pk), self.client.session["carrito"])
+
+    def test_escritura_fija_el_primario_unos_segundos(self):
+        producto = self.crear_cabello("default", "Nombre nuevo", pk=500)
+        self.crear_cabello("replica", "Nombre viejo", pk=500)
+        self.iniciar_sesion(self.admin)
+        cache.clear()
+        lista = reverse("admin_cabello_lista")
+        self.assertEqual(self.client.get(lista).context["articulos"][0].nombre, "Nombre viejo")
+
+        respuesta = self.client.post(reverse("admin_cabello_eliminar", args=[producto.pk]))
+        self.assertIn(routers.COOKIE_PRIMARIA, respuesta.cookies)
+        cache.clear()
+        self.assertEqual(list(self.client.get(lista).context["articulos"]), [])
+
+        self.client.cookies.pop(routers.COOKIE_PRIMARIA)
+        self.assertEqual(len(self.client.get(lista).context["articulos"]), 1)
+
+    def test_compactar_lee_del_primario(self):
+        producto = self.crear_cabello("default", "Con movimientos", pk=600)
+        # La réplica va atrasada: el producto existe pero sin sus movimientos.
+        self.crear_cabello("replica", "Con movimientos", pk=600)
+        ultimo = inventario.registrar(producto, -3, "venta")
+        self.assertEqual(inventario.compactar(), 1)
+        producto = Cabello.objects.using("default").get(pk=600)
+        self.assertEqual((producto.stock, producto.inventario_hasta), (2, ultimo.pk))
+        self.assertEqual(Cabello.objects.using("replica").get(pk=600).stock, 5)
+
+
+class ProductoUnicoTests(TransactionTestCase):
+    antes = [("app_divine", "0001_initial")]
+
+    def migrar(self, destino=None):
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.loader.build_graph()
+        destino = destino or ejecutor.loader.graph.leaf_nodes()
+        ejecutor.migrate(destino)
+        return ejecutor.loader.project_state(destino).apps
+
+    def test_migracion_copia_filas_y_guarda_redirecciones(self):
+        anteriores = self.migrar(self.antes)
+        CabelloAnterior = anteriores.get_model("app_divine", "Cabello")
+        PerfumeAnterior = anteriores.get_model("app_divine", "Perfume")
+        CabelloAnterior.objects.create(id=3, nombre="Shampoo", descripcion="x", categoria="Shampoo")
+        PerfumeAnterior.objects.create(id=3, nombre="Colonia", descripcion="x", categoria="Colonia")
+
+        self.migrar()
+        self.assertEqual(
+            sorted(Producto.objects.values_list("tipo", "nombre")),
+            [("cabello", "Shampoo"), ("perfumes", "Colonia")],
+        )
+        self.assertEqual(Perfume.objects.get().nombre, "Colonia")
+
+        respuesta = self.client.get(reverse("detalle_producto_anterior", args=["perfumes", 3]))
+        self.assertRedirects(
+            respuesta,
+            reverse("detalle_producto", args=[Perfume.objects.get().pk]),
+            status_code=301,
+        )
+        respuesta = self.client.get(reverse("detalle_producto_anterior", args=["maquillaje", 3]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_migracion_reescribe_carritos_de_sesiones(self):
+        anteriores = self.migrar(self.antes)
+        anteriores.get_model("app_divine", "Cabello").objects.create(
+            id=3, nombre="Shampoo", descripcion="x", categoria="Shampoo"
+        )
+        anteriores.get_model("app_divine", "Perfume").objects.create(
+            id=3, nombre="Colonia", descripcion="x", categoria="Colonia"
+        )
+        sesion = SessionStore()
+        linea = {"nombre": "Colonia", "precio": "10.00", "cantidad": 2, "tipo": "perfumes", "producto_id": 3}
+        # cabello-9 no tiene redirección: su id ya no corresponde a ningún producto anterior.
+        sesion["carrito"] = {"perfumes-3": linea, "cabello-9": dict(linea, tipo="cabello", producto_id=9)}
+        sesion.create()
+
+        self.migrar()
+        colonia = Perfume.objects.get()
+        self.assertEqual(
+            SessionStore(session_key=sesion.session_key).load()["carrito"],
+            {str(colonia.pk): dict(linea, producto_id=colonia.pk)},
+        )
+
+    def test_carrito_descarta_lineas_de_otro_tipo(self):
+        self.migrar()
+        shampoo = Cabello.objects.create(nombre="Shampoo", descripcion="x", categoria="Shampoo", stock=5)
+        sesion = self.client.session
+        sesion["usuario_id"] = crear_usuario("a@b.mx").pk
+        # Id de un perfume en la tabla anterior que ahora es un producto de cabello.
+        sesion["carrito"] = {
+            str(shampoo.pk): {
+                "nombre": "Colonia", "precio": "10.00", "cantidad": 1, "tipo": "perfumes", "producto_id": shampoo.pk
+            }
+        }
+        sesion.save()
+        respuesta = self.client.get(reverse("carrito"))
+        self.assertEqual(respuesta.context["items"], [])
+        self.assertEqual(self.client.session["carrito"], {})
+
+    def test_migracion_reconstruye_lineas_de_pedidos(self):
+        anteriores = self.migrar([("app_divine", "0005_lineas_pedido_y_recomendaciones")])
+        ProductoAnterior = anteriores.get_model("app_divine", "Producto")
+        PedidoAnterior = anteriores.get_model("app_divine", "Pedido")
+        shampoo = ProductoAnterior.objects.create(tipo="cabello", nombre="Shampoo", descripcion="x")
+        ProductoAnterior.objects.create(tipo="cabello", nombre="Aceite", descripcion="x")
+        ProductoAnterior.objects.create(tipo="perfumes", nombre="Aceite", descripcion="x")
+        usuario = anteriores.get_model("app_divine", "Usuario").objects.create(
+            nombre="a", apellido="b", fecha_nacimiento=date(1990, 1, 1), correo_electronico="a@b.mx"
+        )
+        PedidoAnterior.objects.create(
+            id_usuario=usuario,
+            subtotal=Decimal("0"),
+            envio=Decimal("0"),
+            detalle="Shampoo x2 - $300.00\nAceite x1 - $50.00\nTotal: $470.00",
+        )
+
+        self.migrar()
+        self.assertEqual(
+            list(LineaPedido.objects.values_list("producto_id", "cantidad", "precio")),
+            [(shampoo.pk, 2, Decimal("150.00"))],
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_SERVIDOR=None)
+class MediaTests(TestCase):
+    def setUp(self):
+        self.nombre = default_storage.save("productos/foto.jpg", ContentFile(b"0123456789"))
+        self.url = reverse("servir_media", args=[self.nombre])
+
+    def test_nombre_con_hash_es_inmutable(self):
+        self.assertRegex(self.nombre, r"^productos/foto\.[0-9a-f]{12}\.jpg$")
+        self.assertEqual(default_storage.save("productos/foto.jpg", ContentFile(b"0123456789")), self.nombre)
+        respuesta = self.client.get(self.url)
+        self.assertEqual(b"".join(respuesta.streaming_content), b"0123456789")
+        self.assertEqual(respuesta["Cache-Control"], "public, max-age=31536000, immutable")
+        respuesta = self.client.get(self.url, headers={"if-none-match": respuesta["ETag"]})
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_rango(self):
+        respuesta = self.client.get(self.url, headers={"range": "bytes=2-5"})
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(respuesta["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(respuesta.streaming_content), b"2345")
+        respuesta = self.client.get(self.url, headers={"range": "bytes=20-"})
+        self.assertEqual(respuesta.status_code, 416)
+
+    def test_delega_en_nginx(self):
+        with override_settings(MEDIA_SERVIDOR="nginx"):
+            respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta["X-Accel-Redirect"], f"/media-interna/{self.nombre}")
+        self.assertEqual(respuesta.content, b"")
+
+    def test_no_sale_de_media_root(self):
+        self.assertEqual(self.client.get(reverse("servir_media", args=["../manage.py"])).status_code, 404)
+
+
+class EstaticosTests(TestCase):
+    def test_collectstatic_genera_hash_gzip_y_webp(self):
+        destino = Path(tempfile.mkdtemp())
+        almacenamiento = {
+            **settings.STORAGES,
+            "staticfiles": {"BACKEND": "app_divine.estaticos.AlmacenamientoEstaticoComprimido"},
+        }
+        with override_settings(STATIC_ROOT=destino, STORAGES=almacenamiento):
+            call_command("collectstatic", interactive=False, verbosity=0, ignore_patterns=["admin"])
+            estilos = static("styles.css")
+            imagen = static("imagenes/cabello.jpg")
+        self.assertRegex(estilos, r"styles\.[0-9a-f]{12}\.css$")
+        self.assertTrue((destino / f"{estilos.removeprefix(settings.STATIC_URL)}.gz").is_file())
+        self.assertRegex(imagen, r"imagenes/cabello\.[0-9a-f]{12}\.webp$")
+        self.assertTrue((destino / imagen.removeprefix(settings.STATIC_URL)).is_file())
+
+
+class CompresionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_comprime_paginas_grandes(self):
+        url = reverse("productos") + "?categoria=todos"
+        plano = self.client.get(url)
+        respuesta = self.client.get(url, headers={"accept-encoding": "gzip, deflate"})
+        self.assertEqual(respuesta["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", respuesta["Vary"])
+        self.assertEqual(gzip.decompress(respuesta.content), plano.content)
+        self.assertLess(len(respuesta.content), len(plano.content) // 4)
+
+    def test_respeta_umbrales_y_tipos(self):
+        factory = RequestFactory(headers={"accept-encoding": "gzip"})
+        pequena = compresion.aplicar(factory.get("/"), HttpResponse("x" * 100))
+        self.assertFalse(pequena.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", pequena["Vary"])
+        imagen = compresion.aplicar(factory.get("/"), HttpResponse(b"x" * 5000, content_type="image/png"))
+        self.assertFalse(imagen.has_header("Content-Encoding"))
+        sin_aceptar = compresion.aplicar(RequestFactory().get("/"), HttpResponse("x" * 5000))
+        self.assertFalse(sin_aceptar.has_header("Content-Encoding"))
+
+    def test_paginas_con_token_csrf_varian_su_longitud(self):
+        longitudes = set()
+        for _ in range(5):
+            self.client = self.client_class()
+            respuesta = self.client.get(reverse("iniciar_sesion"), headers={"accept-encoding": "br, zstd, gzip"})
+            self.assertEqual(respuesta["Content-Encoding"], "gzip")
+            longitudes.add(len(respuesta.content))
+        self.assertGreater(len(longitudes), 1)
+
+    def test_streaming(self):
+        respuesta = StreamingHttpResponse((b"fila,%d\n" % numero for numero in range(500)), content_type="text/csv")
+        respuesta["Content-Length"] = "1"
+        respuesta = compresion.aplicar(RequestFactory(headers={"accept-encoding": "gzip"}).get("/"), respuesta)
+        self.assertEqual(respuesta["Content-Encoding"], "gzip")
+        self.assertFalse(respuesta.has_header("Content-Length"))
+        contenido = gzip.decompress(b"".join(respuesta.streaming_content))
+        self.assertTrue(contenido.endswith(b"fila,499\n"))
+
+    def test_elegir_codificacion(self):
+        self.assertEqual(compresion.elegir_codificacion("gzip;q=0.5, br", ["br", "gzip"]), "br")
+        self.assertEqual(compresion.elegir_codificacion("br;q=0, gzip;q=0.2", ["br", "gzip"]), "gzip")
+        self.assertEqual(compresion.elegir_codificacion("*", ["zstd", "gzip"]), "zstd")
+        self.assertIsNone(compresion.elegir_codificacion("identity", ["gzip"]))
+        self.assertIsNone(compresion.elegir_codificacion("gzip;q=0", ["gzip"]))
+
+
+@override_settings(RECOMENDACIONES_MINIMO=1)
+class RecomendacionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_catalogo()
+        cls.cliente_registrado = crear_usuario("cliente@divine.test")
+        cls.productos = list(Producto.objects.order_by("id")[:5])
+
+    def comprar(self, *indices, pk=None):
+        pedido = Pedido.objects.create(
+            pk=pk,
+            id_usuario=self.cliente_registrado,
+            subtotal=Decimal("100.00"),
+            formapago="tarjeta",
+            envio=Decimal("120.00"),
+            domicilio="Calle Falsa 123",
+            detalle="",
+        )
+        LineaPedido.objects.bulk_create(
+            LineaPedido(pedido=pedido, producto=self.productos[indice], cantidad=1, precio=Decimal("1.00"))
+            for indice in indices
+        )
+
+    def recomendados(self, indice):
+        return list(
+            Recomendacion.objects.filter(producto=self.productos[indice])
+            .order_by("posicion")
+            .values_list("recomendado_id", flat=True)
+        )
+
+    def test_top_k_por_coocurrencia(self):
+        self.comprar(0, 1)
+        self.comprar(0, 1)
+        self.comprar(0, 2)
+        self.comprar(3)
+        recomendaciones.actualizar(k=1)
+        self.assertEqual(self.recomendados(0), [self.productos[1].pk])
+        self.assertEqual(self.recomendados(2), [self.productos[0].pk])
+        self.assertEqual(self.recomendados(3), [])
+
+    def test_incremental_igual_a_completo(self):
+        self.comprar(0, 1, 2)
+        self.comprar(1, 2)
+        self.assertEqual(recomendaciones.actualizar()["pedidos"], 2)
+        self.comprar(2, 3)
+        self.comprar(0, 3, 4)
+        self.assertEqual(recomendaciones.actualizar()["pedidos"], 2)
+        self.assertEqual(recomendaciones.actualizar()["pedidos"], 0)
+        incremental = {indice: self.recomendados(indice) for indice in range(5)}
+        recomendaciones.actualizar(completo=True)
+        self.assertEqual({indice: self.recomendados(indice) for indice in range(5)}, incremental)
+
+    def test_pedido_que_confirma_tarde_se_cuenta_una_vez(self):
+        self.comprar(0, 1, pk=500)
+        self.comprar(1, 2, pk=510)
+        self.assertEqual(recomendaciones.actualizar()["pedidos"], 2)
+        # Su id se repartió antes que el de 510, pero confirmó después.
+        self.comprar(0, 2, pk=505)
+        self.comprar(0, 1, pk=520)
+        self.assertEqual(recomendaciones.actualizar()["pedidos"], 2)
+        self.assertEqual(recomendaciones.actualizar()["pedidos"], 0)
+        self.assertEqual(PuntoControl.objects.get().procesados, [500, 505, 510, 520])
+        incremental = set(Coocurrencia.objects.values_list("producto_a", "producto_b", "veces"))
+        recomendaciones.actualizar(completo=True)
+        self.assertEqual(set(Coocurrencia.objects.values_list("producto_a", "producto_b", "veces")), incremental)
+
+        with self.settings(PEDIDOS_VENTANA_TARDIOS=10):
+            self.comprar(3, 4, pk=600)
+            recomendaciones.actualizar()
+        self.assertEqual(PuntoControl.objects.get().procesados, [600])
+
+    def test_detalle_muestra_recomendaciones(self):
+        self.comprar(0, 1)
+        recomendaciones.actualizar()
+        respuesta = self.client.get(reverse("detalle_producto", args=[self.productos[0].pk]))
+        self.assertEqual([producto["id"] for producto in respuesta.context["recomendados"]], [self.productos[1].pk])
+        self.assertContains(respuesta, reverse("detalle_producto", args=[self.productos[1].pk]))
+
+    def test_el_pago_guarda_las_lineas(self):
+        producto = self.productos[2]
+        sesion = self.client.session
+        sesion["usuario_id"] = self.cliente_registrado.pk
+        sesion["carrito"] = {
+            str(producto.pk): {
+                "nombre": producto.nombre,
+                "precio": str(producto.precio),
+                "cantidad": 2,
+                "tipo": producto.tipo,
+                "producto_id": producto.pk,
+            }
+        }
+        sesion.save()
+        self.client.post(
+            reverse("procesar_pago"),
+            {"metodo": "paypal", "correo_paypal": "a@b.mx", "domicilio": "Calle Falsa 123", "clave": "c" * 32},
+        )
+        self.assertEqual(
+            list(LineaPedido.objects.values_list("producto_id", "cantidad", "precio")),
+            [(producto.pk, 2, producto.precio)],
+        )
+        self.assertEqual(
+            list(MovimientoInventario.objects.values_list("producto_id", "cantidad", "motivo")),
+            [(producto.pk, -2, "venta")],
+        )
+
+
+class AutocompletarTests(TestCase):
+    def setUp(self):
+        autocompletar.descartar()
+
+    def test_prefijos_por_popularidad(self):
+        indice = autocompletar.IndicePrefijos(
+            [
+                (1, "Shampoo Nutritivo", "Shampoo", "cabello", 3),
+                (2, "Shampoo Ligero", "Shampoo", "cabello", 9),
+                (3, "Sérum Reparador", "Sérum", "cabello", 0),
+                (4, "Labial Mate", "Labial", "maquillaje", 5),
+            ]
+        )
+        self.assertEqual([fila[0] for fila in indice.buscar("sh")], [2, 1])
+        self.assertEqual([fila[0] for fila in indice.buscar("s")], [2, 1, 3])
+        self.assertEqual([fila[0] for fila in indice.buscar("SERU")], [3])
+        self.assertEqual([fila[0] for fila in indice.buscar("nutri sha")], [1])
+        self.assertEqual([fila[0] for fila in indice.buscar("sha", limite=1)], [2])
+        self.assertEqual(indice.buscar("sha mate"), [])
+        self.assertEqual(indice.buscar("   "), [])
+
+    def test_vista_sin_consultas(self):
+        Producto.objects.create(tipo="perfumes", nombre="Colonia Cítrica", descripcion="x", categoria="Colonia")
+        autocompletar.indice_actual()
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse("autocompletar"), {"q": "citr"})
+        self.assertEqual(len(consultas), 0)
+        self.assertEqual(
+            respuesta.json()["resultados"][0]["url"],
+            reverse("detalle_producto", args=[Producto.objects.get().pk]),
+        )
+
+
+class AutocompletarSegundoPlanoTests(TransactionTestCase):
+    def tearDown(self):
+        autocompletar.descartar()
+
+    def test_reconstruye_en_segundo_plano(self):
+        Producto.objects.create(tipo="cabello", nombre="Aceite de Argán", descripcion="x", categoria="Aceite")
+        autocompletar.descartar()
+        autocompletar.indice_actual()
+        Producto.objects.create(tipo="cabello", nombre="Aceite de Coco", descripcion="x", categoria="Aceite")
+
+        respuesta = self.client.get(reverse("autocompletar"), {"q": "aceite"})
+        self.assertEqual(len(respuesta.json()["resultados"]), 1)
+        hilo = autocompletar._hilo
+        if hilo is not None:
+            hilo.join()
+        respuesta = self.client.get(reverse("autocompletar"), {"q": "aceite"})
+        self.assertEqual(len(respuesta.json()["resultados"]), 2)
+
+
+@override_settings(PEDIDOS_VIVO_SONDEO=60, PEDIDOS_VIVO_DURACION=10)
+class PedidosEnVivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.administrador = crear_usuario("admin@divine.test", es_admin=True)
+        cls.cliente_registrado = crear_usuario("cliente@divine.test")
+
+    async def iniciar_sesion_como(self, usuario):
+        sesion = SessionStore()
+        sesion["usuario_id"] = usuario.pk
+        await sesion.acreate()
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = sesion.session_key
+
+    async def abrir(self, **cabeceras):
+        respuesta = await self.async_client.get(reverse("admin_pedidos_vivo"), headers=cabeceras)
+        self.assertEqual(respuesta["Content-Type"], "text/event-stream")
+        flujo = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(flujo), b"retry: 3000\n\n")
+        return flujo
+
+    async def siguiente_pedido(self, flujo):
+        while True:
+            bloque = await asyncio.wait_for(anext(flujo), 2)
+            if not bloque.startswith(b":"):
+                return json.loads(bloque.split(b"data: ", 1)[1])
+
+    def crear_pedido(self):
+        crear_pedidos(self.cliente_registrado, 1)
+        return Pedido.objects.select_related("id_usuario").latest("id")
+
+    async def test_recibe_pedidos_publicados(self):
+        await self.iniciar_sesion_como(self.administrador)
+        flujo = await self.abrir()
+        espera = asyncio.ensure_future(self.siguiente_pedido(flujo))
+        await asyncio.sleep(0.05)
+        pedido = await sync_to_async(self.crear_pedido)()
+        pedidos_en_vivo.publicar_pedido(pedido)
+        resumen = await espera
+        self.assertEqual(resumen["id"], pedido.pk)
+        self.assertEqual(resumen["usuario"], "Prueba Divine")
+
+    async def test_sondeo_para_pedidos_de_otros_procesos(self):
+        await self.iniciar_sesion_como(self.administrador)
+        with self.settings(PEDIDOS_VIVO_SONDEO=0.05):
+            flujo = await self.abrir()
+            espera = asyncio.ensure_future(self.siguiente_pedido(flujo))
+            await asyncio.sleep(0.01)
+            pedido = await sync_to_async(self.crear_pedido)()
+            self.assertEqual((await espera)["id"], pedido.pk)
+
+    async def test_sondeo_recoge_pedidos_que_confirman_tarde(self):
+        await self.iniciar_sesion_como(self.administrador)
+        datos = {
+            "id_usuario": self.cliente_registrado, "subtotal": Decimal("1.00"), "formapago": "tarjeta",
+            "envio": Decimal("1.00"), "domicilio": "x", "detalle": "",
+        }
+        await Pedido.objects.acreate(pk=100, **datos)
+        with self.settings(PEDIDOS_VIVO_SONDEO=0.05):
+            flujo = await self.abrir(last_event_id="100")
+            espera = asyncio.ensure_future(self.siguiente_pedido(flujo))
+            await asyncio.sleep(0.01)
+            # Un id menor al último enviado: el pago empezó antes pero confirmó después.
+            tardio = await Pedido.objects.acreate(pk=99, **datos)
+            self.assertEqual((await espera)["id"], tardio.pk)
+            pedidos_en_vivo.publicar_pedido(await Pedido.objects.select_related("id_usuario").aget(pk=tardio.pk))
+            nuevo = await sync_to_async(self.crear_pedido)()
+            self.assertEqual((await self.siguiente_pedido(flujo))["id"], nuevo.pk)
+
+    async def test_reanuda_desde_last_event_id(self):
+        await self.iniciar_sesion_como(self.administrador)
+        anterior = await sync_to_async(self.crear_pedido)()
+        nuevo = await sync_to_async(self.crear_pedido)()
+        flujo = await self.abrir(last_event_id=str(anterior.pk))
+        self.assertEqual((await self.siguiente_pedido(flujo))["id"], nuevo.pk)
+
+    async def test_solo_administradores(self):
+        await self.iniciar_sesion_como(self.cliente_registrado)
+        respuesta = await self.async_client.get(reverse("admin_pedidos_vivo"))
+        self.assertEqual(respuesta.status_code, 302)
+
+
+class InventarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.administrador = crear_usuario("admin@divine.test", es_admin=True)
+        cls.shampoo = Cabello.objects.create(nombre="Shampoo", descripcion="x", categoria="Shampoo", stock=10)
+        cls.aceite = Cabello.objects.create(nombre="Aceite", descripcion="x", categoria="Aceite", stock=4)
+
+    def existencias(self, producto):
+        producto.refresh_from_db()
+        return inventario.existencias(producto)
+
+    def test_editar_stock_registra_ajuste(self):
+        sesion = self.client.session
+        sesion["usuario_id"] = self.administrador.pk
+        sesion.save()
+        inventario.registrar(self.shampoo, -3, "venta")
+        respuesta = self.client.get(reverse("admin_cabello_editar", args=[self.shampoo.pk]))
+        self.assertEqual(respuesta.context["formulario"].initial["stock"], 7)
+        self.client.post(
+            reverse("admin_cabello_editar", args=[self.shampoo.pk]),
+            {"nombre": "Shampoo", "descripcion": "x", "precio": "10.00", "stock": 12, "categoria": "Shampoo"},
+        )
+        self.assertEqual(self.existencias(self.shampoo), 12)
+        self.assertEqual(self.shampoo.stock, 10)
+        self.assertEqual(
+            list(MovimientoInventario.objects.values_list("motivo", "cantidad").order_by("id")),
+            [("venta", -3), ("ajuste", 5)],
+        )
+        lista = self.client.get(reverse("admin_cabello_lista"))
+        self.assertContains(lista, "<td>12</td>", html=True)
+
+    def test_crear_producto_abre_el_libro(self):
+        formulario = FormularioCabello(
+            {"nombre": "Sérum", "descripcion": "x", "precio": "10.00", "stock": 8, "categoria": "Sérum"}
+        )
+        producto = formulario.save()
+        self.assertEqual((producto.stock, inventario.existencias(producto)), (0, 8))
+        self.assertEqual(inventario.stock_en(timezone.now()).get(pk=producto.pk).stock_historico, 8)
+        self.assertIsNone(inventario.stock_en(timezone.now()).get(pk=self.aceite.pk).stock_historico)
+
+    def test_compactar_por_lotes(self):
+        inventario.registrar(self.shampoo, -3, "venta")
+        inventario.registrar(self.aceite, 6, "entrada")
+        self.assertEqual(inventario.compactar(tamano_lote=1), 2)
+        self.assertEqual(self.existencias(self.shampoo), 7)
+        self.aceite.refresh_from_db()
+        self.assertEqual((self.shampoo.stock, self.aceite.stock), (7, 10))
+        self.assertEqual(CorteInventario.objects.count(), 2)
+        self.assertEqual(inventario.compactar(), 0)
+        inventario.registrar(self.shampoo, -1, "venta")
+        self.assertEqual(self.existencias(self.shampoo), 6)
+
+    def test_compactar_usa_el_ultimo_movimiento_de_cada_producto(self):
+        MovimientoInventario.objects.create(id=10, producto=self.shampoo, cantidad=-1, motivo="venta")
+        MovimientoInventario.objects.create(id=20, producto=self.aceite, cantidad=2, motivo="entrada")
+        inventario.compactar()
+        self.shampoo.refresh_from_db()
+        self.assertEqual(self.shampoo.inventario_hasta, 10)
+        # Un id repartido antes de compactar pero confirmado después no se pierde.
+        MovimientoInventario.objects.create(id=15, producto=self.shampoo, cantidad=-2, motivo="venta")
+        self.assertEqual(self.existencias(self.shampoo), 7)
+        inventario.compactar()
+        self.assertEqual(self.existencias(self.shampoo), 7)
+        self.assertEqual(
+            list(
+                CorteInventario.objects.filter(producto=self.shampoo)
+                .order_by("id")
+                .values_list("hasta_movimiento", flat=True)
+            ),
+            [10, 15],
+        )
+
+    def test_reconstruye_stock_historico(self):
+        inicio = timezone.now() - timedelta(days=10)
+        CorteInventario.objects.create(producto=self.shampoo, stock=10, hasta_movimiento=0, fecha=inicio)
+        for dias, cantidad in ((1, -2), (3, 5), (5, -4)):
+            MovimientoInventario.objects.create(
+                producto=self.shampoo, cantidad=cantidad, motivo="ajuste", creado=inicio + timedelta(days=dias)
+            )
+
+        def historico(dias):
+            momento = inicio + timedelta(days=dias)
+            return inventario.stock_en(momento).get(pk=self.shampoo.pk).stock_historico
+
+        antes = [historico(dias) for dias in (0, 2, 4, 6)]
+        self.assertEqual(antes, [10, 8, 13, 9])
+        inventario.compactar()
+        self.assertEqual([historico(dias) for dias in (0, 2, 4, 6)], antes)
+        self.assertEqual(historico(11), 9)
+
+        salida = StringIO()
+        fecha = (inicio + timedelta(days=2)).isoformat()
+        call_command("reporte_inventario", producto=[self.shampoo.pk], fecha=fecha, stdout=salida)
+        self.assertIn(f"{self.shampoo.pk},Shampoo,8,9", salida.getvalue())
+
+    def test_importar_inventario(self):
+        archivo = Path(tempfile.mkdtemp()) / "entradas.csv"
+        archivo.write_text(f"producto,cantidad\n{self.shampoo.pk},5\n{self.aceite.pk},-1\n", encoding="utf-8")
+        call_command("importar_inventario", str(archivo), motivo="entrada", stdout=StringIO())
+        self.assertEqual((self.existencias(self.shampoo), self.existencias(self.aceite)), (15, 3))
+
+
+class LimitesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        limites.descartar()
+        self.addCleanup(limites.descartar)
+
+    def intentar(self, correo, **extra):
+        return self.client.post(
+            reverse("iniciar_sesion"),
+            {"correo_electronico": correo, "contrasena": "incorrecta"},
+            **extra,
+        )
+
+    def test_bloquea_por_correo_con_retry_after(self):
+        for _ in range(5):
+            self.assertEqual(self.intentar("victima@divine.test").status_code, 200)
+        respuesta = self.intentar("Victima@divine.test")
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertTrue(1 <= int(respuesta["Retry-After"]) <= 600)
+        self.assertEqual(self.intentar("otra@divine.test").status_code, 200)
+        self.assertEqual(self.client.get(reverse("iniciar_sesion")).status_code, 200)
+
+    @override_settings(LIMITES_RUTAS={"iniciar_sesion": {"ip": (2, 60)}})
+    def test_limites_por_ruta_y_backend_compartido(self):
+        for backend in ("local", "cache"):
+            with self.subTest(backend=backend), self.settings(LIMITES_BACKEND=backend):
+                for correo in ("a@divine.test", "b@divine.test"):
+                    self.assertEqual(self.intentar(correo, REMOTE_ADDR="10.0.0.1").status_code, 200)
+                self.assertEqual(self.intentar("c@divine.test", REMOTE_ADDR="10.0.0.1").status_code, 429)
+                self.assertEqual(self.intentar("c@divine.test", REMOTE_ADDR="10.0.0.2").status_code, 200)
+
+    @override_settings(LIMITES_PROXIES=1)
+    def test_ip_desde_proxy(self):
+        request = RequestFactory().post("/", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2", REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(limites.direccion_cliente(request), "2.2.2.2")
+
+    def test_ventana_deslizante(self):
+        memoria = limites.MemoriaLocal(capacidad=2)
+        for _ in range(4):
+            memoria.registrar("x", 60, 100.0)
+        self.assertEqual(memoria.registrar("x", 60, 130.0), (1, 4))
+        self.assertEqual(limites.estimar(1, 4, 10, 60), 1 + 4 * 50 / 60)
+        self.assertEqual(limites.espera(1, 4, 10, 60, 2), 35)
+        memoria.registrar("y", 60, 130.0)
+        memoria.registrar("z", 60, 130.0)
+        self.assertNotIn("x", memoria.contadores)
+
+
+class PrerenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shampoo = Cabello.objects.create(nombre="Shampoo", descripcion="x", categoria="Shampoo", stock=5)
+        cls.labial = Maquillaje.objects.create(nombre="Labial", descripcion="x", categoria="Labial", stock=5)
+        Recomendacion.objects.create(producto=cls.labial, recomendado=cls.shampoo, posicion=1, puntuacion=0.5)
+
+    def setUp(self):
+        cache.clear()
+        self.directorio = Path(tempfile.mkdtemp())
+
+    def generar(self, **opciones):
+        call_command(
+            "prerender", directorio=str(self.directorio), procesos=1, host="testserver", stdout=StringIO(),
+            **opciones,
+        )
+
+    def test_genera_paginas_y_variantes(self):
+        self.generar()
+        ficha = self.directorio / "producto" / str(self.shampoo.pk) / "index.html"
+        for relativo in ("index.html", "novedades/index.html", "productos/todos.html", "productos/cabello.html"):
+            self.assertTrue((self.directorio / relativo).exists(), relativo)
+        self.assertEqual(
+            ficha.read_bytes(), self.client.get(reverse("detalle_producto", args=[self.shampoo.pk])).content
+        )
+        self.assertEqual(gzip.decompress(Path(f"{ficha}.gz").read_bytes()), ficha.read_bytes())
+
+    def test_regenera_solo_lo_afectado(self):
+        self.generar()
+        borrado = self.shampoo.pk
+        with self.settings(PRERENDER_DIRECTORIO=str(self.directorio)):
+            self.shampoo.delete()
+        self.assertEqual(
+            sorted(PaginaPendiente.objects.values_list("producto_id", "tipo")),
+            sorted([(self.labial.pk, "maquillaje"), (borrado, "cabello")]),
+        )
+        paginas = {url for url, _ in prerender.paginas_afectadas({(borrado, "cabello")})}
+        self.assertNotIn(f"{reverse('productos')}?categoria=perfumes", paginas)
+
+        self.generar(pendientes=True)
+        self.assertFalse((self.directorio / "producto" / str(borrado) / "index.html").exists())
+        self.assertNotIn(b"Shampoo", (self.directorio / "productos" / "cabello.html").read_bytes())
+        self.assertNotIn(
+            b"Shampoo", (self.directorio / "producto" / str(self.labial.pk) / "index.html").read_bytes()
+        )
+        self.assertFalse(PaginaPendiente.objects.exists())
+
+
+@override_settings(CATALOGO_CAMBIOS_MARGEN=0)
+class SincronizacionTests(TestCase):
+    def pagina(self, desde="", limite=2):
+        respuesta = self.client.get(reverse("api_catalogo_cambios"), {"desde": desde, "limite": limite})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_recorre_cambios_por_cursor(self):
+        productos = [
+            Cabello.objects.create(nombre=f"Shampoo {numero}", descripcion="x", categoria="Shampoo", stock=3)
+            for numero in range(3)
+        ]
+        primera = self.pagina()
+        segunda = self.pagina(primera["siguiente"])
+        self.assertEqual(
+            [cambio["id"] for cambio in primera["cambios"] + segunda["cambios"]],
+            [producto.pk for producto in productos],
+        )
+        self.assertTrue(primera["hay_mas"])
+        self.assertFalse(segunda["hay_mas"])
+
+        cursor = segunda["siguiente"]
+        self.assertEqual(self.pagina(cursor)["cambios"], [])
+        productos[0].precio = Decimal("9.50")
+        productos[0].save()
+        borrado = productos[1].pk
+        productos[1].delete()
+        with CaptureQueriesContext(connection) as consultas:
+            cambios = self.pagina(cursor, limite=10)["cambios"]
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual(
+            [(cambio["id"], cambio["eliminado"]) for cambio in cambios],
+            [(productos[0].pk, False), (borrado, True)],
+        )
+        self.assertEqual(cambios[0]["precio"], "9.50")
+        self.assertTrue(ProductoEliminado.objects.filter(producto_id=borrado).exists())
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.get(reverse("api_catalogo_cambios"), {"desde": "abc"})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class PurgaSesionesTests(TestCase):
+    def crear_sesion(self, vencida, **datos):
+        sesion = SessionStore()
+        sesion.update(datos)
+        sesion.create()
+        if vencida:
+            sesion.model.objects.filter(pk=sesion.session_key).update(
+                expire_date=timezone.now() - timedelta(days=1)
+            )
+        return sesion.session_key
+
+    def test_purga_por_lotes_y_guarda_carritos(self):
+        usuario = crear_usuario("cliente@divine.test")
+        carrito = {
+            "1": {"producto_id": 1, "cantidad": 2, "precio": "10.50"},
+            "2": {"producto_id": 2, "cantidad": 1, "precio": "3.00"},
+        }
+        self.crear_sesion(True, usuario_id=usuario.pk, carrito=carrito)
+        self.crear_sesion(True, usuario_id=999, carrito={"1": {"producto_id": 1, "cantidad": 1, "precio": "1"}})
+        self.crear_sesion(True, carrito={})
+        vigente = self.crear_sesion(False, usuario_id=usuario.pk, carrito=carrito)
+
+        resumen = sesiones.purgar(tamano_lote=2, pausa=0)
+        self.assertEqual(resumen, {"sesiones": 3, "carritos": 2, "lotes": 2, "completo": True})
+        self.assertEqual(list(SessionStore.get_model_class().objects.values_list("pk", flat=True)), [vigente])
+        guardado = CarritoAbandonado.objects.get(usuario=usuario)
+        self.assertEqual(guardado.productos, [[1, 2, "10.50"], [2, 1, "3.00"]])
+        self.assertEqual((guardado.total, guardado.unidades), (Decimal("24.00"), 3))
+        self.assertIsNone(CarritoAbandonado.objects.exclude(pk=guardado.pk).get().usuario_id)
+
+    def test_sesion_corrupta_se_borra(self):
+        modelo = SessionStore.get_model_class()
+        vencida = timezone.now() - timedelta(days=1)
+        modelo.objects.create(session_key="corrupta", session_data="no-es-una-sesion", expire_date=vencida)
+        modelo.objects.create(
+            session_key="ajena", session_data=SessionStore().encode(["no", "es", "dict"]), expire_date=vencida
+        )
+        self.crear_sesion(True, usuario_id="999", carrito="x")
+        self.crear_sesion(True, usuario_id=None, carrito={"1": 5, "2": {"cantidad": 1, "precio": "2.00"}})
+        resumen = sesiones.purgar(tamano_lote=10, pausa=0)
+        self.assertEqual((resumen["sesiones"], resumen["carritos"], resumen["completo"]), (4, 1, True))
+        self.assertFalse(modelo.objects.exists())
+        self.assertEqual(CarritoAbandonado.objects.get().productos, [[None, 1, "2.00"]])
+        self.assertEqual(sesiones.purgar(tamano_lote=10, pausa=0)["sesiones"], 0)
+
+    def test_limite_de_tiempo(self):
+        for _ in range(3):
+            self.crear_sesion(True)
+        resumen = sesiones.purgar(tamano_lote=1, pausa=0, limite_segundos=0)
+        self.assertEqual((resumen["sesiones"], resumen["completo"]), (0, False))
+        salida = StringIO()
+        call_command("purgar_sesiones", lote=1, pausa=0, stdout=salida)
+        self.assertIn("3 sesiones borradas en 3 lotes", salida.getvalue())
+
+
+class PagoConcurrenteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = Cabello.objects.create(
+            nombre="Shampoo", descripcion="x", categoria="Shampoo", precio=Decimal("10.00"), stock=1
+        )
+
+    def pagar(self, usuario, clave):
+        cliente = self.client_class()
+        sesion = cliente.session
+        sesion["usuario_id"] = usuario.pk
+        sesion["carrito"] = {
+            str(self.producto.pk): {
+                "nombre": "Shampoo", "precio": "10.00", "cantidad": 1, "tipo": "cabello",
+                "producto_id": self.producto.pk,
+            }
+        }
+        sesion.save()
+        datos = {"metodo": "paypal", "correo_paypal": "a@b.mx", "domicilio": "Calle Falsa 123"}
+        if clave is not None:
+            datos["clave"] = clave
+        return cliente.post(reverse("procesar_pago"), datos)
+
+    def test_no_vende_de_mas_ni_duplica(self):
+        uno, dos = crear_usuario("uno@divine.test"), crear_usuario("dos@divine.test")
+        for usuario, clave, destino in (
+            (uno, "a" * 32, "perfil_usuario"),
+            (uno, "a" * 32, "perfil_usuario"),
+            (dos, "b" * 32, "carrito"),
+        ):
+            respuesta = self.pagar(usuario, clave)
+            self.assertRedirects(respuesta, reverse(destino), fetch_redirect_response=False)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertEqual(inventario.existencias(self.producto), 0)
+
+    def test_sin_clave_no_crea_pedido(self):
+        respuesta = self.pagar(crear_usuario("uno@divine.test"), None)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("clave", respuesta.context["formulario"].errors)
+        self.assertFalse(Pedido.objects.exists())
+        self.assertEqual(inventario.existencias(self.producto), 1)
+
+    def test_formulario_lleva_clave(self):
+        sesion = self.client.session
+        sesion["usuario_id"] = crear_usuario("uno@divine.test").pk
+        sesion["carrito"] = {
+            str(self.producto.pk): {
+                "nombre": "Shampoo", "precio": "10.00", "cantidad": 1, "tipo": "cabello",
+                "producto_id": self.producto.pk,
+            }
+        }
+        sesion.save()
+        respuesta = self.client.get(reverse("procesar_pago"))
+        self.assertEqual(len(respuesta.context["formulario"].initial["clave"]), 32)
+        self.assertContains(respuesta, 'name="clave"')
+
+
+class EstresPagoTests(TransactionTestCase):
+    def test_estres_en_hilos(self):
+        salida = StringIO()
+        call_command("estres_pago", usuarios=4, stock=2, duplicados=True, host="testserver", stdout=salida)
+        # La base en memoria de las pruebas puede rechazar escrituras
+        # simultáneas ("table is locked"); lo que se comprueba es que ningún
+        # resultado rompa el stock ni duplique pedidos (el comando falla si pasa).
+        verificacion = json.loads(salida.getvalue())["verificacion"]
+        self.assertLessEqual(verificacion["pedidos"], 2)
+        self.assertEqual(verificacion["existencias_finales"], 2 - verificacion["pedidos"])
+        self.assertFalse(Usuario.objects.exists())
+
+
+class AccionesMasivasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.administrador = crear_usuario("admin@divine.test", es_admin=True)
+        cls.shampoos = [
+            Cabello.objects.create(
+                nombre=f"Shampoo {numero}", descripcion="x", categoria="Shampoo", precio=Decimal("100.00"), stock=5
+            )
+            for numero in range(5)
+        ]
+        cls.tinte = Cabello.objects.create(
+            nombre="Tinte", descripcion="x", categoria="Tinte", precio=Decimal("80.00"), stock=5
+        )
+        cls.labial = Maquillaje.objects.create(
+            nombre="Labial", descripcion="x", categoria="Shampoo", precio=Decimal("50.00"), stock=5
+        )
+
+    def setUp(self):
+        sesion = self.client.session
+        sesion["usuario_id"] = self.administrador.pk
+        sesion.save()
+
+    def aplicar(self, **datos):
+        return self.client.post(reverse("admin_cabello_acciones"), datos)
+
+    def test_precio_por_filtro_en_tramos_invalida_una_vez(self):
+        with mock.patch("app_divine.signals.invalidar_catalogo") as invalidar:
+            afectados = acciones_masivas.aplicar(
+                Cabello.objects.filter(categoria="Shampoo"), "precio_porcentaje", Decimal("12.5"), tamano_lote=2
+            )
+        self.assertEqual(afectados, 5)
+        invalidar.assert_called_once_with()
+        self.assertEqual(
+            set(Producto.objects.filter(categoria="Shampoo").values_list("tipo", "precio")),
+            {("cabello", Decimal("112.50")), ("maquillaje", Decimal("50.00"))},
+        )
+
+    def test_sumar_al_precio_no_lo_fija(self):
+        shampoos = Cabello.objects.filter(categoria="Shampoo")
+        Cabello.objects.filter(pk=self.shampoos[0].pk).update(precio=Decimal("5.00"))
+        acciones_masivas.aplicar(shampoos, "precio_sumar", Decimal("-7.50"))
+        self.assertEqual(Cabello.objects.get(pk=self.shampoos[0].pk).precio, Decimal("0.00"))
+        self.assertEqual(Cabello.objects.get(pk=self.shampoos[1].pk).precio, Decimal("92.50"))
+        acciones_masivas.aplicar(shampoos, "precio_sumar", Decimal("2"))
+        self.assertEqual(Cabello.objects.get(pk=self.shampoos[1].pk).precio, Decimal("94.50"))
+        self.assertIn(("precio_sumar", "Sumar al precio ($)"), acciones_masivas.ACCIONES)
+
+    def test_vista_aplica_al_filtro_y_a_la_seleccion(self):
+        respuesta = self.aplicar(accion="precio_sumar", valor="-90", alcance="filtro", filtro_categoria="Shampoo")
+        self.assertRedirects(
+            respuesta, reverse("admin_cabello_lista") + "?categoria=Shampoo", fetch_redirect_response=False
+        )
+        self.assertEqual(Cabello.objects.get(pk=self.tinte.pk).precio, Decimal("80.00"))
+        self.assertEqual(set(Cabello.objects.filter(categoria="Shampoo").values_list("precio", flat=True)), {10})
+
+        self.aplicar(
+            accion="categoria", categoria_nueva="Acondicionador", alcance="seleccionados",
+            seleccionados=[self.shampoos[0].pk, self.labial.pk],
+        )
+        # Solo cambia productos del tipo de la lista.
+        self.assertEqual(Cabello.objects.filter(categoria="Acondicionador").count(), 1)
+        self.assertEqual(Maquillaje.objects.get(pk=self.labial.pk).categoria, "Shampoo")
+
+        lista = self.client.get(reverse("admin_cabello_lista") + "?categoria=Acondicionador")
+        self.assertEqual([articulo.pk for articulo in lista.context["articulos"]], [self.shampoos[0].pk])
+
+    def test_stock_se_registra_en_el_libro(self):
+        inventario.registrar(self.shampoos[0], -2, "venta")
+        seleccion = [self.shampoos[0].pk, self.shampoos[1].pk]
+        self.aplicar(accion="stock_fijar", valor="10", alcance="seleccionados", seleccionados=seleccion)
+        self.aplicar(accion="stock_sumar", valor="-12", alcance="seleccionados", seleccionados=[self.shampoos[1].pk])
+        existencias = dict(inventario.con_existencias(Cabello.objects.all()).values_list("id", "existencias"))
+        self.assertEqual([existencias[pk] for pk in seleccion], [10, 0])
+        self.assertEqual(existencias[self.shampoos[2].pk], 5)
+        self.assertEqual(
+            list(MovimientoInventario.objects.filter(motivo="ajuste").values_list("cantidad", flat=True).order_by("id")),
+            [7, 5, -10],
+        )
+
+    def test_eliminar_deja_lapidas_y_paginas_pendientes(self):
+        Recomendacion.objects.create(producto=self.labial, recomendado=self.shampoos[0], posicion=1, puntuacion=0.5)
+        seleccion = [self.shampoos[0].pk, self.shampoos[1].pk]
+        with self.settings(PRERENDER_DIRECTORIO=tempfile.mkdtemp()):
+            self.aplicar(accion="eliminar", alcance="seleccionados", seleccionados=seleccion)
+        self.assertFalse(Producto.objects.filter(pk__in=seleccion).exists())
+        self.assertEqual(set(ProductoEliminado.objects.values_list("producto_id", flat=True)), set(seleccion))
+        self.assertEqual(
+            set(PaginaPendiente.objects.values_list("producto_id", flat=True)), {*seleccion, self.labial.pk}
+        )
+
+    def test_valor_invalido_no_cambia_nada(self):
+        respuesta = self.aplicar(accion="stock_fijar", valor="2.5", alcance="filtro")
+        self.assertRedirects(respuesta, reverse("admin_cabello_lista"), fetch_redirect_response=False)
+        self.aplicar(accion="precio_porcentaje", alcance="seleccionados")
+        self.assertFalse(MovimientoInventario.objects.exists())
+        self.assertEqual(set(Cabello.objects.values_list("precio", flat=True)), {Decimal("100.00"), Decimal("80.00")})
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -5,8 +6,11 @@ urlpatterns = [
     path("", views.inicio, name="inicio"),
     path("novedades/", views.novedades, name="novedades"),
     path("productos/", views.productos, name="productos"),
-    path("producto/<str:tipo>/<int:pk>/", views.detalle_producto, name="detalle_producto"),
-    path("agregar-carrito/<str:tipo>/<int:pk>/", views.agregar_carrito, name="agregar_carrito"),
+    path("producto/<int:pk>/", views.detalle_producto, name="detalle_producto"),
+    path("producto/<str:tipo>/<int:pk>/", views.detalle_producto_anterior, name="detalle_producto_anterior"),
+    path("autocompletar/", views.autocompletar, name="autocompletar"),
+    path("api/catalogo/cambios", views.api_catalogo_cambios, name="api_catalogo_cambios"),
+    path("agregar-carrito/<int:pk>/", views.agregar_carrito, name="agregar_carrito"),
     path("carrito/", views.ver_carrito, name="carrito"),
     path("carrito/actualizar/", views.actualizar_carrito, name="actualizar_carrito"),
     path("carrito/eliminar/<str:clave>/", views.eliminar_item_carrito, name="eliminar_item_carrito"),
@@ -19,18 +23,22 @@ urlpatterns = [
     path("panel/", views.panel_admin, name="panel_admin"),
     path("cabello/", views.admin_cabello_lista, name="admin_cabello_lista"),
     path("cabello/nuevo/", views.admin_cabello_crear, name="admin_cabello_crear"),
+    path("cabello/acciones/", views.admin_cabello_acciones, name="admin_cabello_acciones"),
     path("cabello/<int:pk>/editar/", views.admin_cabello_editar, name="admin_cabello_editar"),
     path("cabello/<int:pk>/eliminar/", views.admin_cabello_eliminar, name="admin_cabello_eliminar"),
     path("maquillaje/", views.admin_maquillaje_lista, name="admin_maquillaje_lista"),
     path("maquillaje/nuevo/", views.admin_maquillaje_crear, name="admin_maquillaje_crear"),
+    path("maquillaje/acciones/", views.admin_maquillaje_acciones, name="admin_maquillaje_acciones"),
     path("maquillaje/<int:pk>/editar/", views.admin_maquillaje_editar, name="admin_maquillaje_editar"),
     path("maquillaje/<int:pk>/eliminar/", views.admin_maquillaje_eliminar, name="admin_maquillaje_eliminar"),
     path("piel/", views.admin_piel_lista, name="admin_piel_lista"),
     path("piel/nuevo/", views.admin_piel_crear, name="admin_piel_crear"),
+    path("piel/acciones/", views.admin_piel_acciones, name="admin_piel_acciones"),
     path("piel/<int:pk>/editar/", views.admin_piel_editar, name="admin_piel_editar"),
     path("piel/<int:pk>/eliminar/", views.admin_piel_eliminar, name="admin_piel_eliminar"),
     path("perfumes/", views.admin_perfumes_lista, name="admin_perfumes_lista"),
     path("perfumes/nuevo/", views.admin_perfumes_crear, name="admin_perfumes_crear"),
+    path("perfumes/acciones/", views.admin_perfumes_acciones, name="admin_perfumes_acciones"),
     path("perfumes/<int:pk>/editar/", views.admin_perfumes_editar, name="admin_perfumes_editar"),
     path("perfumes/<int:pk>/eliminar/", views.admin_perfumes_eliminar, name="admin_perfumes_eliminar"),
     path("usuarios/", views.admin_usuarios_lista, name="admin_usuarios_lista"),
@@ -39,4 +47,8 @@ urlpatterns = [
     path("usuarios/<int:pk>/eliminar/", views.admin_usuarios_eliminar, name="admin_usuarios_eliminar"),
     path("usuarios/<int:pk>/detalle/", views.admin_usuario_detalle, name="admin_usuario_detalle"),
     path("pedidos/", views.admin_pedidos_lista, name="admin_pedidos_lista"),
-]
\ No newline at end of file
+    path("pedidos/vivo/", views.admin_pedidos_vivo, name="admin_pedidos_vivo"),
+    path("metrics", views.metricas, name="metricas"),
+    path("perfiles/<str:nombre>/", views.descargar_perfil, name="descargar_perfil"),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:ruta>", views.servir_media, name="servir_media"),
+]
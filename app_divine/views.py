@@ -1,9 +1,15 @@
 from decimal import Decimal
 from functools import wraps
+from urllib.parse import urlencode
+from uuid import uuid4
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.hashers import check_password
-from django.db.models import Sum
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Sum
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import (
     get_object_or_404,
     redirect,
@@ -13,6 +19,7 @@ from django.templatetags.static import static
 from django.urls import reverse
 
 from .forms import (
+    FormularioAccionMasiva,
     FormularioCabello,
     FormularioCuidadoPiel,
     FormularioInicioSesion,
@@ -22,17 +29,33 @@ from .forms import (
     FormularioRegistro,
     FormularioUsuarioAdmin,
 )
-from .models import Cabello, CuidadoPiel, Maquillaje, Pedido, Perfume, Usuario
+from . import acciones_masivas
+from . import autocompletar as indice_autocompletar
+from . import inventario
+from .limites import limitar
+from . import media
+from . import metricas as registro_metricas
+from . import pedidos_en_vivo
+from . import perfilador
+from . import sincronizacion
+from .models import (
+    Cabello,
+    CuidadoPiel,
+    LineaPedido,
+    Maquillaje,
+    Pedido,
+    Perfume,
+    Producto,
+    ProductoEliminado,
+    Recomendacion,
+    RedireccionProducto,
+    Usuario,
+)
 
 IMPUESTO_PORCENTAJE = Decimal("0.16")
 COSTO_ENVIO = Decimal("120.00")
 
-MAPA_MODELOS = {
-    "cabello": (Cabello, "Cabello"),
-    "maquillaje": (Maquillaje, "Maquillaje"),
-    "cuidado": (CuidadoPiel, "Cuidado de la piel"),
-    "perfumes": (Perfume, "Perfumes"),
-}
+ETIQUETAS_TIPO = dict(Producto.TIPOS)
 
 
 def resolver_imagen(ruta):
@@ -41,7 +64,7 @@ def resolver_imagen(ruta):
     return static(ruta)
 
 
-def construir_producto(instancia, tipo_slug, etiqueta):
+def construir_producto(instancia):
     # Obtener la URL de la imagen si existe
     imagen_url = None
     if instancia.foto and hasattr(instancia.foto, 'url'):
@@ -51,33 +74,30 @@ def construir_producto(instancia, tipo_slug, etiqueta):
         imagen_url = instancia.foto
     else:
         # Imagen por defecto si no hay foto
-        imagen_url = "/static/imagenes/placeholder.png"
+        imagen_url = resolver_imagen(None)
 
     return {
         "id": instancia.id,
         "nombre": instancia.nombre,
         "descripcion": instancia.descripcion,
         "precio": str(instancia.precio),  # Convertir a string para el carrito
-        "stock": instancia.stock,
-        "categoria": etiqueta,
-        "tipo_slug": tipo_slug,
+        "stock": getattr(instancia, "existencias", instancia.stock),
+        "categoria": ETIQUETAS_TIPO[instancia.tipo],
+        "tipo_slug": instancia.tipo,
         "imagen": imagen_url,
     }
 
 
-def recolectar_productos(categoria_slug="todos"):
-    productos = []
-    if categoria_slug == "todos":
-        for slug, (modelo, etiqueta) in MAPA_MODELOS.items():
-            for articulo in modelo.objects.all():
-                productos.append(construir_producto(articulo, slug, etiqueta))
-    else:
-        datos = MAPA_MODELOS.get(categoria_slug)
-        if datos:
-            modelo, etiqueta = datos
-            for articulo in modelo.objects.all():
-                productos.append(construir_producto(articulo, categoria_slug, etiqueta))
-    return productos
+async def recolectar_productos(categoria_slug="todos"):
+    consulta = Producto.objects.all()
+    if categoria_slug != "todos":
+        consulta = consulta.filter(tipo=categoria_slug)
+    return [construir_producto(articulo) async for articulo in consulta.order_by("tipo", "id")]
+
+
+async def render_async(request, plantilla, contexto=None):
+    # La sesión y el procesador de contexto usuario_en_sesion usan el ORM síncrono.
+    return await sync_to_async(render)(request, plantilla, contexto)
 
 
 def traer_carrito(request):
@@ -89,6 +109,30 @@ def guardar_carrito(request, carrito):
     request.session.modified = True
 
 
+def depurar_carrito(request, carrito):
+    # Un carrito guardado antes de unir las tablas de productos puede traer el
+    # id de la tabla anterior, que ahora es otro producto (la migración 0013
+    # los reescribe). Si la clave o el tipo no coinciden se quita la línea en
+    # vez de vender otro producto; los productos borrados se conservan.
+    if not carrito:
+        return carrito
+    tipos = dict(
+        Producto.objects.filter(pk__in=[item.get("producto_id") for item in carrito.values()]).values_list(
+            "id", "tipo"
+        )
+    )
+    vigentes = {
+        clave: item
+        for clave, item in carrito.items()
+        if clave == str(item.get("producto_id"))
+        and tipos.get(item.get("producto_id"), item.get("tipo")) == item.get("tipo")
+    }
+    if len(vigentes) != len(carrito):
+        guardar_carrito(request, vigentes)
+        messages.warning(request, "Quitamos de tu carrito productos que ya no están disponibles.")
+    return vigentes
+
+
 def requiere_login(funcion):
     @wraps(funcion)
     def envoltura(request, *args, **kwargs):
@@ -100,21 +144,38 @@ def requiere_login(funcion):
     return envoltura
 
 
+def rechazo_admin(request):
+    usuario_id = request.session.get("usuario_id")
+    if not usuario_id:
+        messages.warning(request, "Debes iniciar sesión para continuar.")
+        return redirect("iniciar_sesion")
+    try:
+        usuario = Usuario.objects.get(pk=usuario_id)
+    except Usuario.DoesNotExist:
+        request.session.flush()
+        return redirect("iniciar_sesion")
+    if not usuario.es_admin:
+        messages.error(request, "No tienes permisos para entrar al panel.")
+        return redirect("inicio")
+    return None
+
+
 def requiere_admin(funcion):
+    if iscoroutinefunction(funcion):
+        @wraps(funcion)
+        async def envoltura_async(request, *args, **kwargs):
+            rechazo = await sync_to_async(rechazo_admin)(request)
+            if rechazo is not None:
+                return rechazo
+            return await funcion(request, *args, **kwargs)
+
+        return envoltura_async
+
     @wraps(funcion)
     def envoltura(request, *args, **kwargs):
-        usuario_id = request.session.get("usuario_id")
-        if not usuario_id:
-            messages.warning(request, "Debes iniciar sesión para continuar.")
-            return redirect("iniciar_sesion")
-        try:
-            usuario = Usuario.objects.get(pk=usuario_id)
-        except Usuario.DoesNotExist:
-            request.session.flush()
-            return redirect("iniciar_sesion")
-        if not usuario.es_admin:
-            messages.error(request, "No tienes permisos para entrar al panel.")
-            return redirect("inicio")
+        rechazo = rechazo_admin(request)
+        if rechazo is not None:
+            return rechazo
         return funcion(request, *args, **kwargs)
 
     return envoltura
@@ -131,7 +192,7 @@ def obtener_usuario(request):
         return None
 
 
-def inicio(request):
+async def inicio(request):
     carrusel = [
         {
             "titulo": "Cabello radiante",
@@ -154,34 +215,33 @@ def inicio(request):
             "imagen": resolver_imagen("imagenes/perfume.jpg"),
         },
     ]
-    destacados = []
-    for slug, (modelo, etiqueta) in MAPA_MODELOS.items():
-        articulo = modelo.objects.order_by("-id").first()
-        if articulo:
-            destacados.append(construir_producto(articulo, slug, etiqueta))
+    ultimos = Producto.objects.values("tipo").annotate(ultimo=Max("id")).values("ultimo")
+    destacados = [
+        construir_producto(articulo)
+        async for articulo in Producto.objects.filter(pk__in=ultimos).order_by("tipo")
+    ]
     contexto = {
         "carrusel": carrusel,
         "destacados": destacados,
         "novedades_banner": resolver_imagen("imagenes/novedades.jpg"),
     }
-    return render(request, "usuario/index.html", contexto)
+    return await render_async(request, "usuario/index.html", contexto)
 
 
-def novedades(request):
-    productos = recolectar_productos("todos")
-    productos = sorted(productos, key=lambda x: x["id"], reverse=True)[:12]
-    return render(
+async def novedades(request):
+    productos = [construir_producto(articulo) async for articulo in Producto.objects.order_by("-id")[:12]]
+    return await render_async(
         request,
         "usuario/novedades.html",
         {"productos": productos, "categoria_legible": "Novedades"},
     )
 
 
-def productos(request):
+async def productos(request):
     categoria = request.GET.get("categoria", "todos")
-    if categoria not in MAPA_MODELOS and categoria != "todos":
+    if categoria not in ETIQUETAS_TIPO:
         categoria = "todos"
-    listado = recolectar_productos(categoria)
+    listado = await recolectar_productos(categoria)
     mapa_legible = {
         "todos": "Todos los productos",
         "cabello": "Cabello",
@@ -194,32 +254,80 @@ def productos(request):
         "categoria_actual": categoria,
         "categoria_legible": mapa_legible.get(categoria, "Todos los productos"),
     }
-    return render(request, "usuario/productos.html", contexto)
+    return await render_async(request, "usuario/productos.html", contexto)
 
 
-def detalle_producto(request, tipo, pk):
-    datos = MAPA_MODELOS.get(tipo)
-    if not datos:
-        messages.error(request, "Producto no encontrado.")
-        return redirect("productos")
-    modelo, etiqueta = datos
-    producto = get_object_or_404(modelo, pk=pk)
+async def detalle_producto(request, pk):
+    try:
+        producto = await inventario.con_existencias(Producto.objects).aget(pk=pk)
+    except Producto.DoesNotExist:
+        raise Http404("Producto no encontrado.")
+    recomendaciones = (
+        Recomendacion.objects.filter(producto_id=pk).select_related("recomendado").order_by("posicion")
+    )
     contexto = {
-        "producto": construir_producto(producto, tipo, etiqueta),
+        "producto": construir_producto(producto),
+        "recomendados": [construir_producto(fila.recomendado) async for fila in recomendaciones],
     }
-    return render(request, "usuario/detalle_producto.html", contexto)
+    return await render_async(request, "usuario/detalle_producto.html", contexto)
+
+
+def autocompletar(request):
+    consulta = request.GET.get("q", "")[:80]
+    coincidencias = indice_autocompletar.indice_actual().buscar(consulta) if consulta.strip() else []
+    respuesta = JsonResponse(
+        {
+            "resultados": [
+                {
+                    "id": pk,
+                    "nombre": nombre,
+                    "categoria": ETIQUETAS_TIPO[tipo],
+                    "url": reverse("detalle_producto", args=[pk]),
+                }
+                for pk, nombre, _, tipo in coincidencias
+            ]
+        }
+    )
+    respuesta["Cache-Control"] = "public, max-age=60"
+    return respuesta
+
+
+def api_catalogo_cambios(request):
+    try:
+        limite = int(request.GET.get("limite", settings.CATALOGO_CAMBIOS_LIMITE))
+    except ValueError:
+        limite = settings.CATALOGO_CAMBIOS_LIMITE
+    limite = min(max(limite, 1), settings.CATALOGO_CAMBIOS_LIMITE)
+    try:
+        filas, cursor = sincronizacion.cambios(request.GET.get("desde", ""), limite)
+    except sincronizacion.CursorInvalido:
+        return JsonResponse({"error": "Cursor no válido."}, status=400)
+    resultados = []
+    for fila in filas:
+        if isinstance(fila, ProductoEliminado):
+            resultados.append({"id": fila.producto_id, "tipo_slug": fila.tipo, "eliminado": True})
+        else:
+            datos = construir_producto(fila)
+            datos["eliminado"] = False
+            resultados.append(datos)
+    return JsonResponse(
+        {"cambios": resultados, "siguiente": cursor, "hay_mas": len(filas) == limite}
+    )
+
+
+async def detalle_producto_anterior(request, tipo, pk):
+    try:
+        redireccion = await RedireccionProducto.objects.aget(tipo=tipo, id_anterior=pk)
+    except RedireccionProducto.DoesNotExist:
+        raise Http404("Producto no encontrado.")
+    return redirect("detalle_producto", pk=redireccion.producto_id, permanent=True)
 
 
 @requiere_login
-def agregar_carrito(request, tipo, pk):
+def agregar_carrito(request, pk):
     if request.method != "POST":
-        return redirect("detalle_producto", tipo=tipo, pk=pk)
-    datos = MAPA_MODELOS.get(tipo)
-    if not datos:
-        messages.error(request, "Producto no disponible.")
-        return redirect("productos")
-    modelo, etiqueta = datos
-    producto = get_object_or_404(modelo, pk=pk)
+        return redirect("detalle_producto", pk=pk)
+    producto = get_object_or_404(Producto, pk=pk)
     cantidad = request.POST.get("cantidad", "1")
     try:
         cantidad = int(cantidad)
@@ -228,10 +336,10 @@ def agregar_carrito(request, tipo, pk):
     except ValueError:
         cantidad = 1
     carrito = traer_carrito(request)
-    clave = f"{tipo}-{pk}"
+    clave = str(pk)
     
     # Construir el producto con todos los datos incluyendo la imagen
-    producto_data = construir_producto(producto, tipo, etiqueta)
+    producto_data = construir_producto(producto)
     
     if clave in carrito:
         carrito[clave]["cantidad"] += cantidad
@@ -240,7 +348,7 @@ def agregar_carrito(request, tipo, pk):
             "nombre": producto_data["nombre"],
             "precio": producto_data["precio"],
             "cantidad": cantidad,
-            "tipo": tipo,
+            "tipo": producto.tipo,
             "producto_id": producto.id,
             "imagen": producto_data["imagen"],  # Asegurar que la imagen se guarda
             "categoria": producto_data["categoria"],
@@ -252,7 +360,7 @@ def agregar_carrito(request, tipo, pk):
 
 @requiere_login
 def ver_carrito(request):
-    carrito = traer_carrito(request)
+    carrito = depurar_carrito(request, traer_carrito(request))
     items = []
     subtotal = Decimal("0.00")
     for clave, item in carrito.items():
@@ -313,9 +421,10 @@ def eliminar_item_carrito(request, clave):
     return redirect("carrito")
 
 
+@limitar(ip=(30, 60))
 @requiere_login
 def procesar_pago(request):
-    carrito = traer_carrito(request)
+    carrito = depurar_carrito(request, traer_carrito(request))
     if not carrito:
         messages.warning(request, "Tu carrito está vacío.")
         return redirect("productos")
@@ -364,14 +473,46 @@ def procesar_pago(request):
             detalle_lineas.append(f"Envío: ${COSTO_ENVIO}")
             detalle_lineas.append(f"Total: ${total}")
             detalle = "\n".join(detalle_lineas)
-            Pedido.objects.create(
-                id_usuario=usuario,
-                subtotal=subtotal,
-                formapago=metodo,
-                envio=COSTO_ENVIO,
-                domicilio=domicilio,
-                detalle=detalle,
-            )
+            cantidades = {}
+            for item in carrito.values():
+                if item.get("producto_id") is not None:
+                    cantidades[item["producto_id"]] = cantidades.get(item["producto_id"], 0) + item["cantidad"]
+            clave = formulario.cleaned_data["clave"]
+            try:
+                with transaction.atomic():
+                    pedido = Pedido.objects.create(
+                        id_usuario=usuario,
+                        subtotal=subtotal,
+                        formapago=metodo,
+                        envio=COSTO_ENVIO,
+                        domicilio=domicilio,
+                        detalle=detalle,
+                        clave=clave,
+                    )
+                    existentes = inventario.vender(cantidades, pedido)
+                    LineaPedido.objects.bulk_create(
+                        LineaPedido(
+                            pedido=pedido,
+                            producto_id=item.get("producto_id") if item.get("producto_id") in existentes else None,
+                            cantidad=item["cantidad"],
+                            precio=Decimal(item["precio"]),
+                        )
+                        for item in carrito.values()
+                    )
+                    transaction.on_commit(lambda: pedidos_en_vivo.publicar_pedido(pedido))
+            except inventario.StockInsuficiente as error:
+                nombres = ", ".join(
+                    item["nombre"] for item in carrito.values() if item.get("producto_id") in error.productos
+                )
+                messages.error(request, f"No hay stock suficiente de: {nombres}.")
+                return redirect("carrito")
+            except IntegrityError:
+                # Doble envío del mismo formulario: el primero ya creó el pedido.
+                if not Pedido.objects.filter(clave=clave).exists():
+                    raise
+                guardar_carrito(request, {})
+                messages.info(request, "Tu compra ya estaba registrada.")
+                return redirect("perfil_usuario")
             guardar_carrito(request, {})
             messages.success(
                 request,
@@ -379,7 +520,7 @@ def procesar_pago(request):
             )
             return redirect("perfil_usuario")
     else:
-        formulario = FormularioPago()
+        formulario = FormularioPago(initial={"clave": uuid4().hex})
     contexto = {
         "formulario": formulario,
         "subtotal": subtotal,
@@ -405,6 +546,7 @@ def contacto(request):
     return render(request, "usuario/contacto.html")
 
 
+@limitar(ip=(20, 60), correo=(5, 300))
 def iniciar_sesion(request):
     if request.session.get("usuario_id"):
         return redirect("inicio")
@@ -438,6 +580,7 @@ def cerrar_sesion(request):
     return redirect("inicio")
 
 
+@limitar(ip=(5, 600))
 def registrarse(request):
     if request.session.get("usuario_id"):
         return redirect("inicio")
@@ -459,11 +602,12 @@ def registrarse(request):
 
 @requiere_admin
 def panel_admin(request):
+    totales = dict(Producto.objects.values_list("tipo").annotate(total=Count("id")).order_by())
     contexto = {
-        "total_cabello": Cabello.objects.count(),
-        "total_maquillaje": Maquillaje.objects.count(),
-        "total_piel": CuidadoPiel.objects.count(),
-        "total_perfumes": Perfume.objects.count(),
+        "total_cabello": totales.get(Cabello.TIPO, 0),
+        "total_maquillaje": totales.get(Maquillaje.TIPO, 0),
+        "total_piel": totales.get(CuidadoPiel.TIPO, 0),
+        "total_perfumes": totales.get(Perfume.TIPO, 0),
         "total_usuarios": Usuario.objects.count(),
         "total_pedidos": Pedido.objects.count(),
         "ingresos": Pedido.objects.aggregate(total=Sum("subtotal"))["total"]
@@ -472,16 +616,62 @@ def panel_admin(request):
     return render(request, "admin/panel.html", contexto)
 
 
+def contexto_lista(request, modelo):
+    categoria = request.GET.get("categoria", "")
+    articulos = modelo.objects.all()
+    if categoria:
+        articulos = articulos.filter(categoria=categoria)
+    return {
+        "articulos": inventario.con_existencias(articulos),
+        "categorias": modelo.objects.order_by("categoria").values_list("categoria", flat=True).distinct(),
+        "categoria": categoria,
+        "acciones": acciones_masivas.ACCIONES,
+        "alcances": FormularioAccionMasiva.ALCANCES,
+    }
+
+
+def aplicar_accion_masiva(request, modelo, lista):
+    if request.method != "POST":
+        return redirect(lista)
+    formulario = FormularioAccionMasiva(request.POST)
+    destino = reverse(lista)
+    if request.POST.get("filtro_categoria"):
+        destino += "?" + urlencode({"categoria": request.POST["filtro_categoria"]})
+    if not formulario.is_valid():
+        for errores in formulario.errors.values():
+            for error in errores:
+                messages.error(request, error)
+        return redirect(destino)
+    datos = formulario.cleaned_data
+    consulta = modelo.objects.all()
+    if datos["alcance"] == "seleccionados":
+        consulta = consulta.filter(pk__in=datos["seleccionados"])
+    elif datos["filtro_categoria"]:
+        consulta = consulta.filter(categoria=datos["filtro_categoria"])
+    afectados = acciones_masivas.aplicar(
+        consulta, datos["accion"], datos["valor"], datos["categoria_nueva"]
+    )
+    if datos["accion"] == "eliminar":
+        messages.success(request, f"{afectados} productos eliminados.")
+    else:
+        messages.success(request, f"{afectados} productos actualizados.")
+    return redirect(destino)
+
+
 @requiere_admin
 def admin_cabello_lista(request):
-    articulos = Cabello.objects.all()
     return render(
         request,
         "admin/cabello_lista.html",
-        {"articulos": articulos},
+        contexto_lista(request, Cabello),
     )
 
 
+@requiere_admin
+def admin_cabello_acciones(request):
+    return aplicar_accion_masiva(request, Cabello, "admin_cabello_lista")
+
+
 @requiere_admin
 def admin_cabello_crear(request):
     if request.method == "POST":
@@ -537,14 +727,18 @@ def admin_cabello_eliminar(request, pk):
 
 @requiere_admin
 def admin_maquillaje_lista(request):
-    articulos = Maquillaje.objects.all()
     return render(
         request,
         "admin/maquillaje_lista.html",
-        {"articulos": articulos},
+        contexto_lista(request, Maquillaje),
     )
 
 
+@requiere_admin
+def admin_maquillaje_acciones(request):
+    return aplicar_accion_masiva(request, Maquillaje, "admin_maquillaje_lista")
+
+
 @requiere_admin
 def admin_maquillaje_crear(request):
     if request.method == "POST":
@@ -600,14 +794,18 @@ def admin_maquillaje_eliminar(request, pk):
 
 @requiere_admin
 def admin_piel_lista(request):
-    articulos = CuidadoPiel.objects.all()
     return render(
         request,
         "admin/piel_lista.html",
-        {"articulos": articulos},
+        contexto_lista(request, CuidadoPiel),
     )
 
 
+@requiere_admin
+def admin_piel_acciones(request):
+    return aplicar_accion_masiva(request, CuidadoPiel, "admin_piel_lista")
+
+
 @requiere_admin
 def admin_piel_crear(request):
     if request.method == "POST":
@@ -663,14 +861,18 @@ def admin_piel_eliminar(request, pk):
 
 @requiere_admin
 def admin_perfumes_lista(request):
-    articulos = Perfume.objects.all()
     return render(
         request,
         "admin/perfumes_lista.html",
-        {"articulos": articulos},
+        contexto_lista(request, Perfume),
     )
 
 
+@requiere_admin
+def admin_perfumes_acciones(request):
+    return aplicar_accion_masiva(request, Perfume, "admin_perfumes_lista")
+
+
 @requiere_admin
 def admin_perfumes_crear(request):
     if request.method == "POST":
@@ -805,4 +1007,38 @@ def admin_pedidos_lista(request):
         request,
         "admin/pedidos_lista.html",
         {"pedidos": pedidos},
-    )
\ No newline at end of file
+    )
+
+
+@requiere_admin
+async def admin_pedidos_vivo(request):
+    ultimo = request.headers.get("Last-Event-ID") or request.GET.get("desde", "")
+    ultimo_id = int(ultimo) if ultimo.isdigit() else await pedidos_en_vivo.ultimo_pedido()
+    respuesta = StreamingHttpResponse(
+        pedidos_en_vivo.eventos(ultimo_id), content_type="text/event-stream"
+    )
+    respuesta["Cache-Control"] = "no-cache"
+    respuesta["X-Accel-Buffering"] = "no"
+    return respuesta
+
+
+@requiere_admin
+def metricas(request):
+    return HttpResponse(
+        registro_metricas.formato_prometheus(registro_metricas.agregado()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@requiere_admin
+def descargar_perfil(request, nombre):
+    if not perfilador.NOMBRE_VALIDO.match(nombre):
+        raise Http404
+    ruta = perfilador.directorio_perfiles() / nombre
+    if not ruta.is_file():
+        raise Http404
+    return FileResponse(open(ruta, "rb"), as_attachment=True, filename=nombre)
+
+
+def servir_media(request, ruta):
+    return media.servir(request, ruta)
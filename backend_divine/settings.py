@@ -42,13 +42,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app_divine.middleware.MiddlewareMetricas',
+    'app_divine.middleware.MiddlewareConsultasLentas',
+    'app_divine.middleware.MiddlewareReplica',
+    'app_divine.middleware.MiddlewareCompresion',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'app_divine.middleware.MiddlewareLimites',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app_divine.middleware.MiddlewareCachePaginas',
+    'app_divine.middleware.MiddlewarePerfilador',
 ]
 
 ROOT_URLCONF = 'backend_divine.urls'
@@ -64,6 +71,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 "app_divine.context_processors.usuario_en_sesion",
+                "app_divine.context_processors.version_catalogo",
             ],
         },
     },
@@ -75,12 +83,189 @@ WSGI_APPLICATION = 'backend_divine.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DIVINE_DB elige el perfil: "sqlite" (por defecto) o "postgres". Ambos
+# comparten migraciones y suite de pruebas; con réplica se usa el módulo
+# settings_pruebas_replica:
+#
+#     python manage.py test
+#     DIVINE_DB=postgres python manage.py test
+#     python manage.py test --settings=backend_divine.settings_pruebas_replica
+#     DIVINE_DB=postgres python manage.py test --settings=backend_divine.settings_pruebas_replica
+
+DIVINE_DB = os.environ.get("DIVINE_DB", "sqlite")
+
+if DIVINE_DB == "postgres":
+    # DIVINE_PG_POOL: "psycopg" usa el pool de psycopg dentro de cada worker
+    # (requiere psycopg[pool]); "pgbouncer" asume PgBouncer en modo transacción
+    # delante del servidor; "no" deja solo conexiones persistentes.
+    DIVINE_PG_POOL = os.environ.get("DIVINE_PG_POOL", "no")
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("DIVINE_PG_NOMBRE", "divine"),
+            'USER': os.environ.get("DIVINE_PG_USUARIO", "divine"),
+            'PASSWORD': os.environ.get("DIVINE_PG_CONTRASENA", ""),
+            'HOST': os.environ.get("DIVINE_PG_HOST", "localhost"),
+            'PORT': os.environ.get("DIVINE_PG_PUERTO", "5432"),
+            'CONN_MAX_AGE': int(os.environ.get("DIVINE_PG_CONN_MAX_AGE", "600")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'application_name': 'divine',
+            },
+        }
+    }
+    if DIVINE_PG_POOL == "psycopg":
+        # El pool reemplaza a las conexiones persistentes: Django exige
+        # CONN_MAX_AGE = 0 cuando "pool" está activo.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get("DIVINE_PG_POOL_MIN", "2")),
+            'max_size': int(os.environ.get("DIVINE_PG_POOL_MAX", "10")),
+            'timeout': 10,
+        }
+    elif DIVINE_PG_POOL == "pgbouncer":
+        # En modo transacción los cursores con nombre no sobreviven entre
+        # transacciones del pooler.
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    if os.environ.get("DIVINE_PG_REPLICA_HOST"):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ["DIVINE_PG_REPLICA_HOST"],
+            'PORT': os.environ.get("DIVINE_PG_REPLICA_PUERTO", DATABASES['default']['PORT']),
+            'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        }
+else:
+    # WAL deja leer mientras otro proceso escribe; BEGIN IMMEDIATE toma el
+    # candado de escritura al iniciar la transacción, así busy_timeout espera
+    # en lugar de fallar con "database is locked" al promover un lector.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("DIVINE_SQLITE_NOMBRE", BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get("DIVINE_SQLITE_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+    if os.environ.get("DIVINE_SQLITE_REPLICA"):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'NAME': os.environ["DIVINE_SQLITE_REPLICA"],
+        }
+
+# Con un alias "replica" configurado, el catálogo y los reportes de pedidos se
+# leen de la réplica; escrituras y flujos de lectura-tras-escritura van al
+# primario, y tras escribir el cliente queda fijado al primario unos segundos.
+DATABASE_ROUTERS = ['app_divine.routers.RouterReplica']
+# Alias del que el router lee cuando elige la réplica.
+REPLICA_LECTURA = 'replica'
+REPLICA_VENTANA_PRIMARIA = int(os.environ.get("DIVINE_REPLICA_VENTANA", "5"))
+REPLICA_VISTAS_PRIMARIA = (
+    "agregar_carrito",
+    "carrito",
+    "actualizar_carrito",
+    "eliminar_item_carrito",
+    "procesar_pago",
+    "perfil_usuario",
+)
+
+
+# Cache
+# Memoria local por defecto; con DIVINE_REDIS_URL todos los workers comparten
+# la versión del catálogo y las páginas cacheadas.
+
+if os.environ.get("DIVINE_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["DIVINE_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "divine",
+        }
     }
-}
+
+# Cache de página completa para visitantes anónimos del catálogo.
+CACHE_PAGINAS_VISTAS = ("inicio", "novedades", "productos", "detalle_producto")
+CACHE_PAGINAS_TTL = 300
+CACHE_PAGINAS_OBSOLETA = 600
+CACHE_PAGINAS_CANDADO = 30
+CACHE_PAGINAS_BETA = 1.0
+
+
+# Recomendaciones precalculadas (manage.py recomendaciones, p. ej. desde cron).
+RECOMENDACIONES_K = 8
+RECOMENDACIONES_MINIMO = 2
+
+# Los ids de pedido se reparten antes del commit: un pago lento puede
+# confirmarse con un id menor al último ya visto. Las recomendaciones y el
+# panel en vivo vuelven a revisar estos ids por debajo y omiten los ya vistos.
+PEDIDOS_VENTANA_TARDIOS = 100
+
+
+# Páginas del catálogo pre-renderizadas a HTML (manage.py prerender) para que
+# nginx las sirva a visitantes anónimos. Con un directorio configurado, cada
+# producto guardado o borrado queda pendiente para `prerender --pendientes`.
+PRERENDER_DIRECTORIO = os.environ.get("DIVINE_PRERENDER_DIR")
+PRERENDER_HOST = "localhost"
+
+
+# Feed de cambios del catálogo (/api/catalogo/cambios). Se omiten los
+# últimos CATALOGO_CAMBIOS_MARGEN segundos para no saltar transacciones que
+# aún no confirman.
+CATALOGO_CAMBIOS_LIMITE = 200
+CATALOGO_CAMBIOS_MARGEN = 5
+
+
+# Pedidos en vivo para el panel (SSE). Cada proceso sondea la tabla cada
+# PEDIDOS_VIVO_SONDEO segundos para ver pedidos creados en otros procesos.
+PEDIDOS_VIVO_SONDEO = 5
+PEDIDOS_VIVO_LATIDO = 15
+PEDIDOS_VIVO_DURACION = 300
+PEDIDOS_VIVO_REINTENTO = 3000
+
+
+# Límite de intentos en inicio de sesión, registro y pago. Los límites de
+# cada vista están en @limitar; LIMITES_RUTAS los reemplaza por nombre de
+# ruta, p. ej. {"iniciar_sesion": {"ip": (20, 60), "correo": (5, 300)}}.
+# Con Redis los contadores se comparten entre workers.
+LIMITES_BACKEND = "cache" if os.environ.get("DIVINE_REDIS_URL") else "local"
+LIMITES_RUTAS = {}
+LIMITES_METODOS = ("POST",)
+LIMITES_CAPACIDAD = 100_000
+LIMITES_PROXIES = 0
+
+
+# Compresión dinámica de respuestas (br/zstd si están instalados, si no gzip).
+COMPRESION_TAMANO_MINIMO = 1024
+COMPRESION_TIPOS = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+COMPRESION_NIVEL_BROTLI = 5
+COMPRESION_NIVEL_ZSTD = 3
 
 
 # Password validation
@@ -119,10 +304,68 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
+STATIC_ROOT = os.environ.get("DIVINE_STATIC_ROOT", BASE_DIR / "staticfiles")
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Las fotos se guardan con el hash del contenido en el nombre y se sirven con
+# cache inmutable. DIVINE_MEDIA_SERVIDOR: "nginx" (X-Accel-Redirect hacia
+# MEDIA_URL_INTERNA), "apache" (X-Sendfile) o vacío para FileResponse.
+STORAGES = {
+    "default": {"BACKEND": "app_divine.media.AlmacenamientoConHash"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+MEDIA_SERVIDOR = os.environ.get("DIVINE_MEDIA_SERVIDOR") or None
+MEDIA_URL_INTERNA = "/media-interna/"
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Métricas por vista expuestas en /metrics (formato Prometheus).
+# Cada proceso vuelca sus contadores en METRICAS_DIR para que /metrics sume
+# todos los workers; sin directorio solo se reporta el proceso actual.
+# Los volcados de procesos que ya terminaron, o sin cambios en
+# METRICAS_VENCE segundos, se borran al agregar.
+# Costo medido del middleware: < 50 µs por solicitud (ver tests).
+METRICAS_DIR = os.environ.get("DIVINE_METRICAS_DIR")
+METRICAS_INTERVALO = float(os.environ.get("DIVINE_METRICAS_INTERVALO", "5"))
+METRICAS_VENCE = float(os.environ.get("DIVINE_METRICAS_VENCE", "3600"))
+
+
+# Registro de consultas lentas (opcional). Se activa al definir el umbral en ms.
+_umbral_consultas_lentas = os.environ.get("DIVINE_CONSULTAS_LENTAS_MS")
+CONSULTAS_LENTAS_UMBRAL_MS = float(_umbral_consultas_lentas) if _umbral_consultas_lentas else None
+CONSULTAS_LENTAS_ARCHIVO = os.environ.get(
+    "DIVINE_CONSULTAS_LENTAS_ARCHIVO", str(BASE_DIR / "logs" / "consultas_lentas.jsonl")
+)
+
+# Perfiles generados con ?_profile=1 (cProfile) o ?_profile=muestreo (pilas colapsadas).
+PERFILES_DIR = os.environ.get("DIVINE_PERFILES_DIR", str(BASE_DIR / "perfiles"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "jsonl": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "consultas_lentas": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": CONSULTAS_LENTAS_ARCHIVO,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "delay": True,
+            "formatter": "jsonl",
+        },
+    },
+    "loggers": {
+        "app_divine.consultas_lentas": {
+            "handlers": ["consultas_lentas"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
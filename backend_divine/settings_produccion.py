@@ -0,0 +1,34 @@
+"""
+Perfil de producción: usar con DJANGO_SETTINGS_MODULE=backend_divine.settings_produccion.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import STORAGES, TEMPLATES, os
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", SECRET_KEY)  # noqa: F405
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get("DIVINE_ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
+
+# Plantillas compiladas una sola vez por proceso.
+TEMPLATES[0]["APP_DIRS"] = False
+TEMPLATES[0]["OPTIONS"]["loaders"] = [
+    (
+        "django.template.loaders.cached.Loader",
+        [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ],
+    ),
+]
+
+# Los workers nunca transmiten fotos: nginx las envía desde la ubicación interna.
+MEDIA_SERVIDOR = os.environ.get("DIVINE_MEDIA_SERVIDOR", "nginx")
+
+# collectstatic genera nombres con hash, variantes .gz/.br y WebP para
+# imagenes/; nginx los sirve con Cache-Control immutable (deploy/nginx.conf).
+STORAGES["staticfiles"] = {"BACKEND": "app_divine.estaticos.AlmacenamientoEstaticoComprimido"}
+
+# nginx añade la IP del cliente a X-Forwarded-For.
+LIMITES_PROXIES = 1
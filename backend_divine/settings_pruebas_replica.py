@@ -0,0 +1,35 @@
+"""
+Pruebas con réplica: toda la suite corre con el router y el middleware de
+réplica activos (con cualquiera de los dos perfiles de DIVINE_DB):
+
+    python manage.py test --settings=backend_divine.settings_pruebas_replica
+
+Las lecturas que el router manda a la réplica se leen del primario
+(REPLICA_LECTURA), como una réplica sin retraso: una conexión aparte, aunque
+sea espejo (TEST MIRROR), no ve los datos que cada TestCase deja sin confirmar
+en su transacción. El alias "replica" es una segunda base sin replicación;
+ReplicaTests lee de ella (override_settings) para comprobar a dónde va cada
+lectura.
+"""
+
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+REPLICA_LECTURA = "default"
+
+if DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+    _DIRECTORIO = Path(tempfile.gettempdir())
+    DATABASES["default"]["TEST"] = {"NAME": str(_DIRECTORIO / "divine_prueba_primario.sqlite3")}
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": str(_DIRECTORIO / "divine_replica.sqlite3"),
+        "TEST": {"NAME": str(_DIRECTORIO / "divine_prueba_replica.sqlite3")},
+    }
+else:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "TEST": {"NAME": f"test_{DATABASES['default']['NAME']}_replica"},
+    }
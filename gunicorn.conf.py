@@ -0,0 +1,12 @@
+wsgi_app = "backend_divine.wsgi:application"
+raw_env = ["DJANGO_SETTINGS_MODULE=backend_divine.settings_produccion"]
+
+
+def post_worker_init(worker):
+    # Cada worker recién creado compila plantillas, puebla el resolver de URLs y
+    # abre su conexión antes de aceptar tráfico, en lugar de pagarlo en sus
+    # primeras solicitudes.
+    from app_divine.calentamiento import calentar
+
+    for etapa, (cantidad, duracion) in calentar().items():
+        worker.log.info("calentamiento %s: %s en %.1f ms", etapa, cantidad, duracion * 1000)